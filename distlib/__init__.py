@@ -31,3 +31,22 @@ except ImportError:  # pragma: no cover
 
 logger = logging.getLogger(__name__)
 logger.addHandler(NullHandler())
+
+# Submodules which can be accessed as attributes of the package without
+# importing them explicitly, e.g. ``distlib.wheel`` after ``import distlib``.
+# They're only imported when first accessed, so that importing distlib (or
+# one of its submodules) doesn't import the others unnecessarily.
+_SUBMODULES = ('compat', 'database', 'index', 'locators', 'manifest', 'markers', 'metadata', 'resources',
+               'scripts', 'util', 'version', 'wheel')
+
+
+def __getattr__(name):  # PEP 562, Python 3.7 and later
+    if name in _SUBMODULES:
+        import importlib
+
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES))
@@ -46,6 +46,11 @@ if sys.version_info[0] < 3:  # pragma: no cover
     from itertools import ifilter as filter
     from itertools import ifilterfalse as filterfalse
 
+    # The three-argument form of raise is a syntax error in Python 3.
+    exec('''def reraise(tp, value, tb=None):
+    raise tp, value, tb
+''')
+
     # Leaving this around for now, in case it needs resurrecting in some way
     # _userprog = None
     # def splituser(host):
@@ -82,6 +87,11 @@ else:  # pragma: no cover
     from itertools import filterfalse
     filter = filter
 
+    def reraise(tp, value, tb=None):
+        if value.__traceback__ is not tb:
+            raise value.with_traceback(tb)
+        raise value
+
 try:
     from ssl import match_hostname, CertificateError
 except ImportError:  # pragma: no cover
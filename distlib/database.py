@@ -11,18 +11,22 @@ import base64
 import codecs
 import contextlib
 import hashlib
+import json
 import logging
 import os
 import posixpath
+import stat
 import sys
+import tempfile
+import time
 import zipimport
 
 from . import DistlibException, resources
-from .compat import StringIO
+from .compat import StringIO, OrderedDict
 from .version import get_scheme, UnsupportedVersionError
-from .metadata import (Metadata, METADATA_FILENAME, WHEEL_METADATA_FILENAME, LEGACY_METADATA_FILENAME)
+from .metadata import (Metadata, LegacyMetadata, METADATA_FILENAME, WHEEL_METADATA_FILENAME, LEGACY_METADATA_FILENAME)
 from .util import (parse_requirement, cached_property, parse_name_and_version, read_exports, write_exports, CSVReader,
-                   CSVWriter)
+                   CSVWriter, get_cache_base, path_to_cache_dir, thread_map, normalize_name, ExportEntry)
 
 __all__ = [
     'Distribution', 'BaseInstalledDistribution', 'InstalledDistribution', 'EggInfoDistribution', 'DistributionPath'
@@ -37,18 +41,24 @@ DIST_FILES = ('INSTALLER', METADATA_FILENAME, 'RECORD', 'REQUESTED', 'RESOURCES'
 
 DISTINFO_EXT = '.dist-info'
 
+CHUNK_SIZE = 64 * 1024
+
 
 class _Cache(object):
     """
     A simple cache mapping names and .dist-info paths to distributions
     """
 
-    def __init__(self):
+    def __init__(self, scheme=None):
         """
         Initialise an instance. There is normally one for each DistributionPath.
+        :param scheme: The version scheme used to parse provided versions.
         """
         self.name = {}
         self.path = {}
+        self.normalized = {}
+        self.provided = None  # built when needed
+        self.scheme = scheme or get_scheme('default')
         self.generated = False
 
     def clear(self):
@@ -57,6 +67,8 @@ class _Cache(object):
         """
         self.name.clear()
         self.path.clear()
+        self.normalized.clear()
+        self.provided = None
         self.generated = False
 
     def add(self, dist):
@@ -67,6 +79,186 @@ class _Cache(object):
         if dist.path not in self.path:
             self.path[dist.path] = dist
             self.name.setdefault(dist.key, []).append(dist)
+            self.normalized.setdefault(normalize_name(dist.name), []).append(dist)
+            if self.provided is not None:
+                self._add_provided(self.provided, dist)
+
+    def _add_provided(self, provided, dist):
+        # We hit a problem on Travis where enum34 was installed and doesn't
+        # have a provides attribute ...
+        if not hasattr(dist, 'provides'):
+            logger.debug('No "provides": %s', dist)
+        else:
+            for p in dist.provides:
+                p_name, p_ver = parse_name_and_version(p)
+                try:
+                    version = self.scheme.matcher.version_class(p_ver)
+                except UnsupportedVersionError:
+                    version = p_ver  # let the matcher complain, if it's used
+                provided.setdefault(normalize_name(p_name), []).append((dist, version))
+
+    def get_provided(self, name):
+        """
+        Get the distributions which provide a name.
+        :param name: The name to look for, which is normalized.
+        :return: A list of (distribution, version) tuples, in the order the
+                 distributions were added, where version is parsed using the
+                 cache's version scheme, where possible.
+        """
+        if self.provided is None:
+            provided = {}
+            for dist in list(self.path.values()):
+                self._add_provided(provided, dist)
+            self.provided = provided
+        return self.provided.get(normalize_name(name), [])
+
+
+def _get_stamp(path):
+    """
+    Return the (mtime, inode) of a directory, or ``None`` if it can't be
+    determined.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime, st.st_ino]
+
+
+def _dump_metadata(metadata):
+    """
+    Return a JSON-serializable form of some metadata, from which it can be
+    recreated without parsing using :func:`_load_metadata`.
+    """
+    if metadata._legacy is None:
+        result = {'data': metadata._data}
+    else:
+        result = {'fields': metadata._legacy._fields}
+    return result
+
+
+def _load_metadata(data):
+    """
+    Recreate metadata from the output of :func:`_dump_metadata`.
+    """
+    result = Metadata(scheme='legacy')
+    if 'data' in data:
+        result._data = data['data']
+    else:
+        legacy = LegacyMetadata(scheme='legacy')
+        fields = dict(data['fields'])
+        if 'Project-URL' in fields:  # JSON turns these tuples into lists
+            fields['Project-URL'] = [tuple(v) for v in fields['Project-URL']]
+        legacy._fields = fields
+        result._legacy = legacy
+        result._data = None
+    return result
+
+
+class _PathIndex(object):
+    """
+    An on-disk index of the ``.dist-info`` directories in a single path entry,
+    holding some data for each. The ``dists.json`` index holds the name,
+    version, path and metadata (including dependency fields) of each, so that
+    distributions can be created without reading and parsing their metadata
+    files, and the ``exports.json`` index holds their exports.
+
+    If the path entry's mtime and inode are unchanged since the index was
+    written, all of it is used as is. Otherwise, each ``.dist-info`` directory
+    is checked against its own mtime and inode, and only those which have
+    changed get re-read.
+    """
+
+    version = 1
+
+    # Stamps this recent aren't trusted, as a directory could change again
+    # within the same mtime tick after the index is written.
+    settle_time = 2
+
+    def __init__(self, path, filename):
+        """
+        Initialise an instance, loading any existing index.
+
+        :param path: The path entry's directory.
+        :param filename: The file in which the index is stored.
+        """
+        self.path = path
+        self.filename = filename
+        self.stamp = _get_stamp(path)
+        self.names = None
+        self.entries = {}
+        self.current = {}
+        self.valid = False
+        self.dirty = False
+        try:
+            with codecs.open(filename, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            data = None
+        if isinstance(data, dict) and data.get('version') == self.version and data.get('path') == path:
+            self.entries = data.get('dists') or {}
+            if self.stamp is not None and data.get('stamp') == self.stamp:
+                self.names = data.get('names')
+                self.valid = self.names is not None
+
+    def _is_settled(self, stamp):
+        return stamp is not None and time.time() - stamp[0] >= self.settle_time
+
+    def get(self, entry):
+        """
+        Return the index data for a ``.dist-info`` entry, or ``None`` if it's
+        not indexed or has changed since it was.
+        """
+        result = self.entries.get(entry)
+        if result is not None and not self.valid:
+            if _get_stamp(os.path.join(self.path, entry)) != result['stamp']:
+                result = None
+        if result is not None:
+            self.current[entry] = result
+        return result
+
+    def put(self, entry, data):
+        """
+        Add the index data for a ``.dist-info`` entry which has been read.
+        """
+        stamp = _get_stamp(os.path.join(self.path, entry))
+        if self._is_settled(stamp):
+            data['stamp'] = stamp
+            self.current[entry] = data
+            self.dirty = True
+
+    def save(self, names):
+        """
+        Write the index, if anything has changed since it was loaded.
+
+        :param names: The names of all ``.dist-info`` entries in the path entry.
+        """
+        if self.valid and not self.dirty and len(self.current) == len(self.entries):
+            return
+        stamp = self.stamp if self._is_settled(self.stamp) else None
+        data = {
+            'version': self.version,
+            'path': self.path,
+            'stamp': stamp,
+            'names': sorted(names),
+            'dists': self.current,
+        }
+        dn = os.path.dirname(self.filename)
+        try:
+            if not os.path.isdir(dn):
+                os.makedirs(dn)
+            fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=dn)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(data, f)
+                if os.name == 'nt' and os.path.exists(self.filename):  # pragma: no cover
+                    os.remove(self.filename)
+                os.rename(tmp, self.filename)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        except (IOError, OSError) as e:  # pragma: no cover
+            logger.warning('Unable to write distribution index %s: %s', self.filename, e)
 
 
 class DistributionPath(object):
@@ -74,7 +266,7 @@ class DistributionPath(object):
     Represents a set of distributions installed on a path (typically sys.path).
     """
 
-    def __init__(self, path=None, include_egg=False):
+    def __init__(self, path=None, include_egg=False, index_dir=None, lazy=False, max_workers=1):
         """
         Create an instance from a path, optionally including legacy (distutils/
         setuptools/distribute) distributions.
@@ -82,17 +274,34 @@ class DistributionPath(object):
                      sys.path is used.
         :param include_egg: If True, this instance will look for and return legacy
                             distributions as well as those based on PEP 376.
+        :param index_dir: If specified, the directory in which to keep an index
+                          of the distributions in each directory on the path,
+                          so that unchanged ones needn't have their metadata
+                          read again. If True, a default location below
+                          :func:`~distlib.util.get_cache_base` is used.
+        :param lazy: If True, the names and versions of ``.dist-info``
+                     distributions are taken from their directory names, and
+                     their metadata is only read when it's first needed.
+        :param max_workers: If greater than 1, the distributions on the path
+                            are found first, and then their metadata is read
+                            using a pool of this many threads. If ``None``, a
+                            default based on the number of CPUs is used.
         """
         if path is None:
             path = sys.path
         self.path = path
         self._include_dist = True
         self._include_egg = include_egg
+        self._index_dir = index_dir
+        self._lazy = lazy
+        self.max_workers = max_workers
 
-        self._cache = _Cache()
-        self._cache_egg = _Cache()
-        self._cache_enabled = True
         self._scheme = get_scheme('default')
+        self._cache = _Cache(self._scheme)
+        self._cache_egg = _Cache(self._scheme)
+        self._cache_enabled = True
+        self._exports = None  # built when needed
+        self._files = None  # built when needed
 
     def _get_cache_enabled(self):
         return self._cache_enabled
@@ -108,10 +317,33 @@ class DistributionPath(object):
         """
         self._cache.clear()
         self._cache_egg.clear()
+        self._exports = None
+        self._files = None
 
-    def _yield_distributions(self):
+    def _get_index_dir(self, path):
         """
-        Yield .dist-info and/or .egg(-info) distributions.
+        Return the directory holding the indexes for a path entry.
+        """
+        if self._index_dir is True:
+            self._index_dir = os.path.join(get_cache_base(), str('dist-index'))
+        return os.path.join(self._index_dir, path_to_cache_dir(path))
+
+    def _get_index(self, path, kind='dists'):
+        """
+        Return the :class:`_PathIndex` of a particular kind for a path entry,
+        or ``None`` if there isn't one.
+        """
+        result = None
+        if self._index_dir and self._include_dist and os.path.isdir(path):
+            result = _PathIndex(path, os.path.join(self._get_index_dir(path), '%s.json' % kind))
+        return result
+
+    def _find_candidates(self):
+        """
+        Find the distributions on the path, without reading their metadata.
+        This yields tuples of (path, kind, data) in path order, where kind is
+        one of 'indexed', 'dist', 'lazy', 'egg' or 'save' (the last being
+        where a path entry's index needs to be saved).
         """
         # We need to check if we've seen some resources already, because on
         # some Linux systems (e.g. some Debian/Ubuntu variants) there are
@@ -124,36 +356,133 @@ class DistributionPath(object):
             r = finder.find('')
             if not r or not r.is_container:
                 continue
-            rset = sorted(r.resources)
+            index = self._get_index(r.path)
+            entries = None
+            if index is not None and index.valid and not self._include_egg:
+                # nothing has been added to or removed from the directory
+                rset = index.names
+            else:
+                entries = finder.scan('')
+                rset = sorted(r.resources if entries is None else entries)
             for entry in rset:
-                r = finder.find(entry)
-                if not r or r.path in seen:
+                if index is not None and entry.endswith(DISTINFO_EXT):
+                    data = index.get(entry)
+                    if data is not None:
+                        if data['path'] not in seen:
+                            logger.debug('Found %s (indexed)', data['path'])
+                            seen.add(data['path'])
+                            yield data['path'], 'indexed', data
+                        continue
+                if entries is None:
+                    r = finder.find(entry)
+                    if not r:
+                        continue
+                    dist_path = r.path
+                else:
+                    # avoid resolving every entry, as finder.find() does
+                    e = entries[entry]
+                    dist_path = os.path.realpath(e.path) if e.is_symlink() else e.path
+                if dist_path in seen:
                     continue
-                try:
-                    if self._include_dist and entry.endswith(DISTINFO_EXT):
-                        possible_filenames = [METADATA_FILENAME, WHEEL_METADATA_FILENAME, LEGACY_METADATA_FILENAME]
-                        for metadata_filename in possible_filenames:
-                            metadata_path = posixpath.join(entry, metadata_filename)
-                            pydist = finder.find(metadata_path)
-                            if pydist:
-                                break
-                        else:
-                            continue
+                if self._include_dist and entry.endswith(DISTINFO_EXT):
+                    logger.debug('Found %s', dist_path)
+                    seen.add(dist_path)
+                    if self._lazy:
+                        yield dist_path, 'lazy', None
+                    else:
+                        yield dist_path, 'dist', (finder, entry, index)
+                elif self._include_egg and entry.endswith(('.egg-info', '.egg')):
+                    logger.debug('Found %s', dist_path)
+                    seen.add(dist_path)
+                    yield dist_path, 'egg', None
+            if index is not None:
+                yield path, 'save', (index, [entry for entry in rset if entry.endswith(DISTINFO_EXT)])
+
+    @staticmethod
+    def _read_metadata(finder, entry):
+        """
+        Read the metadata of a .dist-info entry, returning ``None`` if it has
+        no metadata file.
+        """
+        possible_filenames = [METADATA_FILENAME, WHEEL_METADATA_FILENAME, LEGACY_METADATA_FILENAME]
+        entries = finder.scan(entry)
+        if entries is not None:
+            # one scan of the directory, rather than a find() for each name
+            for metadata_filename in possible_filenames:
+                e = entries.get(metadata_filename)
+                if e is not None and e.is_file():
+                    stream = open(e.path, 'rb')
+                    break
+            else:
+                return None
+        else:
+            for metadata_filename in possible_filenames:
+                metadata_path = posixpath.join(entry, metadata_filename)
+                pydist = finder.find(metadata_path)
+                if pydist:
+                    break
+            else:
+                return None
+            stream = pydist.as_stream()
 
-                        with contextlib.closing(pydist.as_stream()) as stream:
-                            metadata = Metadata(fileobj=stream, scheme='legacy')
-                        logger.debug('Found %s', r.path)
-                        seen.add(r.path)
-                        yield new_dist_class(r.path, metadata=metadata, env=self)
-                    elif self._include_egg and entry.endswith(('.egg-info', '.egg')):
-                        logger.debug('Found %s', r.path)
-                        seen.add(r.path)
-                        yield old_dist_class(r.path, self)
-                except Exception as e:
-                    msg = 'Unable to read distribution at %s, perhaps due to bad metadata: %s'
-                    logger.warning(msg, r.path, e)
-                    import warnings
-                    warnings.warn(msg % (r.path, e), stacklevel=2)
+        with contextlib.closing(stream):
+            return Metadata(fileobj=stream, scheme='legacy')
+
+    def _load_candidate(self, candidate):
+        """
+        Read the metadata for a candidate from :meth:`_find_candidates`, if
+        needed, returning the candidate with the metadata and any exception
+        raised while reading it.
+        """
+        path, kind, data = candidate
+        metadata = exc = None
+        if kind == 'dist':
+            try:
+                metadata = self._read_metadata(*data[:2])
+            except Exception as e:
+                exc = e
+        return path, kind, data, metadata, exc
+
+    def _yield_distributions(self):
+        """
+        Yield .dist-info and/or .egg(-info) distributions.
+        """
+        candidates = self._find_candidates()
+        if self.max_workers is None or self.max_workers > 1:
+            # Find all the candidates first, then read their metadata using a
+            # pool of threads. The results are still processed in path order.
+            loaded = thread_map(self._load_candidate, list(candidates), self.max_workers)
+        else:
+            loaded = (self._load_candidate(c) for c in candidates)
+        for path, kind, data, metadata, exc in loaded:
+            try:
+                if exc is not None:
+                    raise exc
+                if kind == 'indexed':
+                    yield new_dist_class(path, metadata=_load_metadata(data['metadata']), env=self)
+                elif kind == 'dist':
+                    if metadata is not None:
+                        finder, entry, index = data
+                        if index is not None:
+                            index.put(entry, {
+                                'path': path,
+                                'name': metadata.name,
+                                'version': metadata.version,
+                                'metadata': _dump_metadata(metadata),
+                            })
+                        yield new_dist_class(path, metadata=metadata, env=self)
+                elif kind == 'lazy':
+                    yield new_dist_class(path, env=self, lazy=True)
+                elif kind == 'egg':
+                    yield old_dist_class(path, self)
+                else:
+                    index, names = data
+                    index.save(names)
+            except Exception as e:
+                msg = 'Unable to read distribution at %s, perhaps due to bad metadata: %s'
+                logger.warning(msg, path, e)
+                import warnings
+                warnings.warn(msg % (path, e), stacklevel=2)
 
     def _generate_cache(self):
         """
@@ -220,7 +549,8 @@ class DistributionPath(object):
 
     def get_distribution(self, name):
         """
-        Looks for a named distribution on the path.
+        Looks for a named distribution on the path. Names are compared in
+        their normalized form, as described in PEP 503.
 
         This function only returns the first result found, as no more than one
         value is expected. If nothing is found, ``None`` is returned.
@@ -229,25 +559,26 @@ class DistributionPath(object):
                 or ``None``
         """
         result = None
-        name = name.lower()
+        name = normalize_name(name)
         if not self._cache_enabled:
             for dist in self._yield_distributions():
-                if dist.key == name:
+                if normalize_name(dist.name) == name:
                     result = dist
                     break
         else:
             self._generate_cache()
 
-            if name in self._cache.name:
-                result = self._cache.name[name][0]
-            elif self._include_egg and name in self._cache_egg.name:
-                result = self._cache_egg.name[name][0]
+            if name in self._cache.normalized:
+                result = self._cache.normalized[name][0]
+            elif self._include_egg and name in self._cache_egg.normalized:
+                result = self._cache_egg.normalized[name][0]
         return result
 
     def provides_distribution(self, name, version=None):
         """
         Iterates over all distributions to find which distributions provide *name*.
-        If a *version* is provided, it will be used to filter the results.
+        If a *version* is provided, it will be used to filter the results. Names
+        are compared in their normalized form, as described in PEP 503.
 
         This function only returns the first result found, since no more than
         one values are expected. If the directory is not found, returns ``None``.
@@ -265,24 +596,32 @@ class DistributionPath(object):
             except ValueError:
                 raise DistlibException('invalid name or version: %r, %r' % (name, version))
 
-        for dist in self.get_distributions():
-            # We hit a problem on Travis where enum34 was installed and doesn't
-            # have a provides attribute ...
-            if not hasattr(dist, 'provides'):
-                logger.debug('No "provides": %s', dist)
-            else:
-                provided = dist.provides
+        if not self._cache_enabled:
+            key = normalize_name(name)
+            for dist in self.get_distributions():
+                # We hit a problem on Travis where enum34 was installed and doesn't
+                # have a provides attribute ...
+                if not hasattr(dist, 'provides'):
+                    logger.debug('No "provides": %s', dist)
+                else:
+                    provided = dist.provides
 
-                for p in provided:
-                    p_name, p_ver = parse_name_and_version(p)
-                    if matcher is None:
-                        if p_name == name:
-                            yield dist
-                            break
-                    else:
-                        if p_name == name and matcher.match(p_ver):
+                    for p in provided:
+                        p_name, p_ver = parse_name_and_version(p)
+                        if normalize_name(p_name) == key and (matcher is None or matcher.match(p_ver)):
                             yield dist
                             break
+        else:
+            self._generate_cache()
+            caches = [self._cache]
+            if self._include_egg:
+                caches.append(self._cache_egg)
+            found = set()
+            for cache in caches:
+                for dist, p_ver in cache.get_provided(name):
+                    if dist.path not in found and (matcher is None or matcher.match(p_ver)):
+                        found.add(dist.path)
+                        yield dist
 
     def get_file_path(self, name, relative_path):
         """
@@ -300,16 +639,191 @@ class DistributionPath(object):
         :param category: The category to search for entries.
         :param name: If specified, only entries with that name are returned.
         """
-        for dist in self.get_distributions():
-            r = dist.exports
-            if category in r:
-                d = r[category]
-                if name is not None:
-                    if name in d:
-                        yield d[name]
-                else:
-                    for v in d.values():
-                        yield v
+        if not self._cache_enabled:
+            for dist in self.get_distributions():
+                r = dist.exports
+                if category in r:
+                    d = r[category]
+                    if name is not None:
+                        if name in d:
+                            yield d[name]
+                    else:
+                        for v in d.values():
+                            yield v
+        else:
+            entries, names = self._get_exports_index().get(category, ((), {}))
+            if name is None:
+                for v in entries:
+                    yield v
+            else:
+                for v in names.get(name, ()):
+                    yield v
+
+    def _get_indexed(self, dist, kind, indexes):
+        """
+        Look up a distribution in the on-disk index of a particular kind for
+        its directory. Returns the index (or ``None`` if there isn't one), the
+        distribution's entry name in it and its indexed data (or ``None`` if
+        it isn't indexed, or has changed since it was).
+
+        :param indexes: A dictionary of the indexes already loaded, keyed by
+                        directory, to which any newly loaded one is added.
+        """
+        index = entry = data = None
+        if self._index_dir and isinstance(dist, InstalledDistribution):
+            dn, entry = os.path.split(dist.path)
+            if dn not in indexes:
+                indexes[dn] = self._get_index(dn, kind)
+            index = indexes[dn]
+            if index is not None:
+                data = index.get(entry)
+                if data is not None:
+                    data = data[kind]
+        return index, entry, data
+
+    @staticmethod
+    def _save_indexes(indexes):
+        for index in indexes.values():
+            if index is not None:
+                index.save(list(index.current))
+
+    def _get_exports(self, dist, indexes):
+        """
+        Get the exports of a distribution, from an on-disk index if possible.
+        """
+        index, entry, data = self._get_indexed(dist, 'exports', indexes)
+        if data is not None:
+            result = {}
+            for category, entries in data:
+                result[category] = d = {}
+                for name, prefix, suffix, flags in entries:
+                    d[name] = ExportEntry(name, prefix, suffix, flags)
+        else:
+            result = dist.exports
+            if index is not None:
+                exports = []
+                for category, d in result.items():
+                    exports.append([category, [[e.name, e.prefix, e.suffix, e.flags] for e in d.values()]])
+                index.put(entry, {'exports': exports})
+        return result
+
+    def _get_exports_index(self):
+        """
+        Return an index of the exported entries of all the distributions on
+        the path, which is built when first needed. It maps each category to a
+        tuple of a list of its entries (in the order the distributions were
+        found) and a dictionary mapping entry names to lists of entries.
+        """
+        if self._exports is None:
+            indexes = {}
+            result = {}
+            for dist in self.get_distributions():
+                for category, d in self._get_exports(dist, indexes).items():
+                    if category not in result:
+                        result[category] = ([], {})
+                    entries, names = result[category]
+                    for name, entry in d.items():
+                        entries.append(entry)
+                        names.setdefault(name, []).append(entry)
+            self._save_indexes(indexes)
+            self._exports = result
+        return self._exports
+
+    def _get_files(self, dist, indexes):
+        """
+        Get the files listed in a distribution's ``RECORD``, from an on-disk
+        index if possible, as a list of [directory, [names]] pairs.
+        """
+        index, entry, result = self._get_indexed(dist, 'files', indexes)
+        if result is None:
+            result = []
+            groups = {}
+            base = os.path.dirname(dist.path)
+            for path, _, _ in dist.list_installed_files():
+                dn, fn = os.path.split(os.path.normpath(os.path.join(base, path)))
+                if dn not in groups:
+                    groups[dn] = names = []
+                    result.append([dn, names])
+                groups[dn].append(fn)
+            if index is not None:
+                index.put(entry, {'files': result})
+        return result
+
+    def _get_file_index(self):
+        """
+        Return an index of the files listed in the ``RECORD`` files of the
+        installed distributions on the path, which is built when first needed
+        (if caching is enabled). It's a tuple of a dictionary mapping
+        directories to dictionaries mapping file names to the distribution
+        which owns them, and a dictionary mapping the paths of any files owned
+        by more than one distribution to a list of those distributions.
+        """
+        result = self._files
+        if result is None:
+            indexes = {}
+            owners = {}
+            duplicates = {}
+            strings = {}  # so that common file names are only stored once
+            for dist in self.get_distributions():
+                if not isinstance(dist, InstalledDistribution):
+                    continue
+                for dn, names in self._get_files(dist, indexes):
+                    d = owners.get(dn)
+                    if d is None:
+                        owners[dn] = d = {}
+                    for fn in names:
+                        fn = strings.setdefault(fn, fn)
+                        owner = d.setdefault(fn, dist)
+                        if owner is not dist:
+                            path = os.path.join(dn, fn)
+                            if path not in duplicates:
+                                duplicates[path] = [owner]
+                            if not any(o is dist for o in duplicates[path]):
+                                duplicates[path].append(dist)
+            self._save_indexes(indexes)
+            result = owners, duplicates
+            if self._cache_enabled:
+                self._files = result
+        return result
+
+    def get_file_owners(self, path):
+        """
+        Return the installed distributions whose ``RECORD`` lists a file.
+
+        :param path: The path of the file. It's made absolute and normalized,
+                     but symbolic links aren't resolved.
+        :return: A list of distributions, in the order they were found.
+        """
+        owners, duplicates = self._get_file_index()
+        path = os.path.normpath(os.path.abspath(path))
+        dn, fn = os.path.split(path)
+        d = owners.get(dn)
+        if d is None or fn not in d:
+            result = []
+        elif path in duplicates:
+            result = list(duplicates[path])
+        else:
+            result = [d[fn]]
+        return result
+
+    def get_file_owner(self, path):
+        """
+        Return the first installed distribution whose ``RECORD`` lists a file,
+        or ``None`` if there isn't one.
+
+        :param path: As for :meth:`get_file_owners`.
+        """
+        owners = self.get_file_owners(path)
+        return owners[0] if owners else None
+
+    def get_duplicate_files(self):
+        """
+        Return the files which are listed in the ``RECORD`` files of more than
+        one installed distribution.
+
+        :return: A dictionary mapping paths to lists of distributions.
+        """
+        return dict((k, list(v)) for k, v in self._get_file_index()[1].items())
 
 
 class Distribution(object):
@@ -507,6 +1021,15 @@ class BaseInstalledDistribution(Distribution):
                   followed by '='.
         :rtype: str
         """
+        h, prefix = self._get_hasher(hasher)
+        h.update(data)
+        return self._encode_hash(h, prefix)
+
+    def _get_hasher(self, hasher):
+        """
+        Return a new hash object for a hasher as passed to :meth:`get_hash`,
+        and the prefix to use for its digest.
+        """
         if hasher is None:
             hasher = self.hasher
         if hasher is None:
@@ -515,10 +1038,41 @@ class BaseInstalledDistribution(Distribution):
         else:
             hasher = getattr(hashlib, hasher)
             prefix = '%s=' % self.hasher
-        digest = hasher(data).digest()
-        digest = base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+        return hasher(), prefix
+
+    def _encode_hash(self, h, prefix):
+        digest = base64.urlsafe_b64encode(h.digest()).rstrip(b'=').decode('ascii')
         return '%s%s' % (prefix, digest)
 
+    def get_file_hash(self, path, hasher=None):
+        """
+        Get the hash of a file's contents, as for :meth:`get_hash`, reading
+        the file in chunks rather than all at once.
+
+        :param path: The path of the file to be hashed.
+        :param hasher: As for :meth:`get_hash`.
+        :returns: As for :meth:`get_hash`.
+        """
+        h, prefix = self._get_hasher(hasher)
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                h.update(chunk)
+        return self._encode_hash(h, prefix)
+
+
+class _DeferredMetadata(object):
+    """
+    Stands in for the metadata of a lazily created installed distribution
+    until it's needed, holding just the name and version.
+    """
+
+    def __init__(self, name, version):
+        self.name = name
+        self.version = version
+
 
 class InstalledDistribution(BaseInstalledDistribution):
     """
@@ -530,38 +1084,106 @@ class InstalledDistribution(BaseInstalledDistribution):
 
     hasher = 'sha256'
 
-    def __init__(self, path, metadata=None, env=None):
-        self.modules = []
-        self.finder = finder = resources.finder_for_path(path)
-        if finder is None:
-            raise ValueError('finder unavailable for %s' % path)
+    def __init__(self, path, metadata=None, env=None, lazy=False):
+        """
+        Initialise an instance.
+        :param path:     The path of the ``.dist-info`` directory.
+        :param metadata: The metadata, if already known.
+        :param env:      This is normally the :class:`DistributionPath`
+                         instance where this distribution was found.
+        :param lazy:     If True and no metadata is passed, the name and
+                         version are taken from the directory name, and the
+                         metadata is only read when it's first needed.
+        """
         if env and env._cache_enabled and path in env._cache.path:
-            metadata = env._cache.path[path].metadata
-        elif metadata is None:
-            r = finder.find(METADATA_FILENAME)
-            # Temporary - for Wheel 0.23 support
-            if r is None:
-                r = finder.find(WHEEL_METADATA_FILENAME)
-            # Temporary - for legacy support
-            if r is None:
-                r = finder.find(LEGACY_METADATA_FILENAME)
-            if r is None:
-                raise ValueError('no %s found in %s' % (METADATA_FILENAME, path))
-            with contextlib.closing(r.as_stream()) as stream:
-                metadata = Metadata(fileobj=stream, scheme='legacy')
+            metadata = env._cache.path[path]._metadata
+        elif metadata is None and lazy:
+            metadata = self._get_deferred_metadata(path)
+        lazy = isinstance(metadata, _DeferredMetadata)
+        if not lazy:
+            self.finder = finder = resources.finder_for_path(path)
+            if finder is None:
+                raise ValueError('finder unavailable for %s' % path)
+            if metadata is None:
+                metadata = self._read_metadata(path)
 
         super(InstalledDistribution, self).__init__(metadata, path, env)
 
         if env and env._cache_enabled:
             env._cache.add(self)
 
-        r = finder.find('REQUESTED')
-        self.requested = r is not None
-        p = os.path.join(path, 'top_level.txt')
+        if not lazy:
+            # read these now rather than when first needed
+            self.requested
+            self.modules
+
+    @staticmethod
+    def _get_deferred_metadata(path):
+        """
+        Get the name and version of a distribution from its ``.dist-info``
+        directory name, or return ``None`` if they can't be determined.
+        """
+        result = None
+        fn = os.path.basename(path)
+        if fn.endswith(DISTINFO_EXT):
+            name, sep, version = fn[:-len(DISTINFO_EXT)].partition('-')
+            if name and version and '-' not in version:
+                result = _DeferredMetadata(name, version)
+        return result
+
+    def _read_metadata(self, path):
+        finder = self.finder
+        r = finder.find(METADATA_FILENAME)
+        # Temporary - for Wheel 0.23 support
+        if r is None:
+            r = finder.find(WHEEL_METADATA_FILENAME)
+        # Temporary - for legacy support
+        if r is None:
+            r = finder.find(LEGACY_METADATA_FILENAME)
+        if r is None:
+            raise ValueError('no %s found in %s' % (METADATA_FILENAME, path))
+        with contextlib.closing(r.as_stream()) as stream:
+            return Metadata(fileobj=stream, scheme='legacy')
+
+    def _get_metadata(self):
+        result = self._metadata
+        if isinstance(result, _DeferredMetadata):
+            result = self._metadata = self._read_metadata(self.path)
+        return result
+
+    def _set_metadata(self, value):
+        self._metadata = value
+
+    metadata = property(_get_metadata, _set_metadata)
+
+    @property
+    def metadata_loaded(self):
+        """
+        Whether the metadata has been read, which it won't have been for a
+        lazily created instance until it's first needed.
+        """
+        return not isinstance(self._metadata, _DeferredMetadata)
+
+    @cached_property
+    def finder(self):
+        result = resources.finder_for_path(self.path)
+        if result is None:
+            raise ValueError('finder unavailable for %s' % self.path)
+        return result
+
+    @cached_property
+    def requested(self):
+        return self.finder.find('REQUESTED') is not None
+
+    @cached_property
+    def modules(self):
+        result = []
+        p = os.path.join(self.path, 'top_level.txt')
         if os.path.exists(p):
             with open(p, 'rb') as f:
                 data = f.read().decode('utf-8')
-            self.modules = data.splitlines()
+            result = data.splitlines()
+        return result
 
     def __repr__(self):
         return '<InstalledDistribution %r %s at %r>' % (self.name, self.version, self.path)
@@ -662,13 +1284,20 @@ class InstalledDistribution(BaseInstalledDistribution):
         for result in self._get_records():
             yield result
 
-    def write_installed_files(self, paths, prefix, dry_run=False):
+    def write_installed_files(self, paths, prefix, dry_run=False, digests=None):
         """
         Writes the ``RECORD`` file, using the ``paths`` iterable passed in. Any
         existing ``RECORD`` file is silently overwritten.
 
         prefix is used to determine when to write absolute paths.
+
+        If specified, digests is a mapping of paths to (hash, size) tuples for
+        files whose hashes are already known (e.g. because they were computed
+        while the files were being written). Those files aren't read again;
+        any others are read and hashed.
         """
+        if digests is None:
+            digests = {}
         prefix = os.path.join(prefix, '')
         base = os.path.dirname(self.path)
         base_under_prefix = base.startswith(prefix)
@@ -682,6 +1311,8 @@ class InstalledDistribution(BaseInstalledDistribution):
                 if os.path.isdir(path) or path.endswith(('.pyc', '.pyo')):
                     # do not put size and hash, as in PEP-376
                     hash_value = size = ''
+                elif path in digests:
+                    hash_value, size = digests[path]
                 else:
                     size = '%d' % os.path.getsize(path)
                     with open(path, 'rb') as fp:
@@ -696,7 +1327,52 @@ class InstalledDistribution(BaseInstalledDistribution):
             writer.writerow((record_path, '', ''))
         return record_path
 
-    def check_installed_files(self):
+    def _get_installed_files(self):
+        """
+        Return the (path, hash, size) entries in ``RECORD`` other than for
+        ``RECORD`` itself, with the paths made absolute.
+        """
+        result = []
+        base = os.path.dirname(self.path)
+        record_path = self.get_distinfo_file('RECORD')
+        for path, hash_value, size in self.list_installed_files():
+            if not os.path.isabs(path):
+                path = os.path.join(base, path)
+            if path != record_path:
+                result.append((path, hash_value, size))
+        return result
+
+    def _check_installed_file(self, path, hash_value, size, quick, snapshot):
+        """
+        Check an installed file, returning a mismatch tuple as described for
+        :meth:`check_installed_files`, or ``None`` if it's OK.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return path, 'exists', True, False
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        actual_size = str(st.st_size)
+        if size and actual_size != size:
+            return path, 'size', size, actual_size
+        if not hash_value:
+            return None
+        if snapshot is not None:
+            if tuple(snapshot.get(path, ())) == (st.st_mtime, st.st_size):
+                return None
+        elif quick:
+            return None
+        if '=' in hash_value:
+            hasher = hash_value.split('=', 1)[0]
+        else:
+            hasher = None
+        actual_hash = self.get_file_hash(path, hasher)
+        if actual_hash != hash_value:
+            return path, 'hash', hash_value, actual_hash
+        return None
+
+    def check_installed_files(self, quick=False, snapshot=None, max_workers=1):
         """
         Checks that the hashes and sizes of the files in ``RECORD`` are
         matched by the files themselves. Returns a (possibly empty) list of
@@ -704,32 +1380,42 @@ class InstalledDistribution(BaseInstalledDistribution):
         of the path, 'exists', 'size' or 'hash' according to what didn't match
         (existence is checked first, then size, then hash), the expected
         value and the actual value.
+
+        :param quick: If True, only existence and sizes are checked, unless a
+                      snapshot is specified.
+        :param snapshot: If specified, a mapping of paths to (mtime, size) as
+                         returned by :meth:`snapshot_installed_files`. Only
+                         files whose modification time or size don't match
+                         the snapshot have their hashes checked.
+        :param max_workers: If greater than 1, files are checked using a pool
+                            of this many threads.
         """
-        mismatches = []
-        base = os.path.dirname(self.path)
-        record_path = self.get_distinfo_file('RECORD')
-        for path, hash_value, size in self.list_installed_files():
-            if not os.path.isabs(path):
-                path = os.path.join(base, path)
-            if path == record_path:
-                continue
-            if not os.path.exists(path):
-                mismatches.append((path, 'exists', True, False))
-            elif os.path.isfile(path):
-                actual_size = str(os.path.getsize(path))
-                if size and actual_size != size:
-                    mismatches.append((path, 'size', size, actual_size))
-                elif hash_value:
-                    if '=' in hash_value:
-                        hasher = hash_value.split('=', 1)[0]
-                    else:
-                        hasher = None
 
-                    with open(path, 'rb') as f:
-                        actual_hash = self.get_hash(f.read(), hasher)
-                        if actual_hash != hash_value:
-                            mismatches.append((path, 'hash', hash_value, actual_hash))
-        return mismatches
+        def check(item):
+            path, hash_value, size = item
+            return self._check_installed_file(path, hash_value, size, quick, snapshot)
+
+        results = thread_map(check, self._get_installed_files(), max_workers)
+        return [r for r in results if r is not None]
+
+    def snapshot_installed_files(self):
+        """
+        Return a snapshot of the modification times and sizes of the files in
+        ``RECORD``, for passing to :meth:`check_installed_files`. This should
+        be taken when the files are known to be correct, e.g. just after
+        installation or after a full check. It can be stored as JSON.
+
+        :returns: A dictionary mapping paths to (mtime, size) tuples. Files
+                  which don't exist are omitted.
+        """
+        result = {}
+        for path, _, _ in self._get_installed_files():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            result[path] = (st.st_mtime, st.st_size)
+        return result
 
     @cached_property
     def shared_locations(self):
@@ -1081,23 +1767,206 @@ class DependencyGraph(object):
     distribution ``b`` means that ``a`` depends on ``b``. If any missing
     dependencies are found, they are stored in ``missing``, which is a
     dictionary that maps distributions to a list of requirements that were not
-    provided by any other distributions.
+    provided by any other distributions. Requirements should be added to it
+    using ``add_missing()``, which also indexes them by name.
+
+    The graph can be kept up to date as distributions are installed and
+    removed, using ``add_distribution(dist, link=True)`` and
+    ``remove_distribution(dist)``.
     """
 
-    def __init__(self):
-        self.adjacency_list = {}
+    def __init__(self, scheme='default'):
+        self.adjacency_list = OrderedDict()  # kept in the order distributions were added
         self.reverse_list = {}
         self.missing = {}
+        self.scheme = get_scheme(scheme)
+        self._provided = {}  # maps normalized names to lists of (version, dist) tuples
+        self._matchers = {}  # maps requirements to (normalized name, matcher) tuples
+        self._missing_by_name = {}  # maps normalized names to lists of dists in missing
+
+    def _add_provided(self, dist):
+        """
+        Add the names and versions provided by a distribution to the index of
+        providers, and return them as a list of (normalized name, version)
+        tuples, where the versions are parsed if possible.
+        """
+        result = []
+        # As for _Cache, allow for distributions without a provides attribute.
+        if not hasattr(dist, 'provides'):
+            logger.debug('No "provides": %s', dist)
+        else:
+            for p in dist.provides:
+                name, version = parse_name_and_version(p)
+                logger.debug('Add to provided: %s, %s, %s', name, version, dist)
+                try:
+                    version = self.scheme.matcher.version_class(version)
+                except UnsupportedVersionError:
+                    pass  # let the matcher complain, if it's used
+                name = normalize_name(name)
+                self._provided.setdefault(name, []).append((version, dist))
+                result.append((name, version))
+        return result
+
+    def _get_matcher(self, requirement):
+        """
+        Get the normalized name and a matcher for a requirement, made only
+        once for each requirement string.
+        """
+        result = self._matchers.get(requirement)
+        if result is None:
+            scheme = self.scheme
+            try:
+                matcher = scheme.matcher(requirement)
+            except UnsupportedVersionError:
+                # XXX compat-mode if cannot read the version
+                logger.warning('could not read version %r - using name only', requirement)
+                name = requirement.split()[0]
+                matcher = scheme.matcher(name)
+            result = normalize_name(matcher.key), matcher  # case-insensitive
+            self._matchers[requirement] = result
+        return result
+
+    @staticmethod
+    def _matches(matcher, version):
+        try:
+            result = matcher.match(version)
+        except UnsupportedVersionError:
+            result = False
+        return result
+
+    def _add_requirement(self, dist, requirement):
+        """
+        Add an edge from a distribution to the first distribution in the graph
+        which provides a requirement, or add the requirement to ``missing`` if
+        there's no such distribution.
+        """
+        name, matcher = self._get_matcher(requirement)
+        for version, provider in self._provided.get(name, ()):
+            if self._matches(matcher, version):
+                self.add_edge(dist, provider, requirement)
+                break
+        else:
+            self.add_missing(dist, requirement)
+
+    def _link(self, dist):
+        """
+        Add edges for all the requirements of a distribution.
+        """
+        requires = (dist.run_requires | dist.meta_requires | dist.build_requires | dist.dev_requires)
+        for req in requires:
+            self._add_requirement(dist, req)
 
-    def add_distribution(self, distribution):
+    def _check_member(self, dist):
+        if dist not in self.adjacency_list:
+            raise DistlibException('given distribution %r is not a member '
+                                   'of the graph' % dist.name)
+
+    def add_distribution(self, distribution, link=False):
         """Add the *distribution* to the graph.
 
         :type distribution: :class:`distutils2.database.InstalledDistribution`
                             or :class:`distutils2.database.EggInfoDistribution`
-        """
+        :param link: If true, edges are also added from the distribution to
+                     the distributions which provide its requirements (the
+                     requirements which aren't provided are added to
+                     ``missing``), and any ``missing`` requirements of other
+                     distributions which it provides are resolved to it.
+                     Otherwise, it's up to the caller to add edges.
+        """
+        if distribution in self.adjacency_list:
+            if link:
+                raise DistlibException('given distribution %r is already a '
+                                       'member of the graph' % distribution.name)
+            provided = None  # already indexed
+        else:
+            provided = self._add_provided(distribution)
         self.adjacency_list[distribution] = []
         self.reverse_list[distribution] = []
         # self.missing[distribution] = []
+        if link:
+            self._link(distribution)
+            if provided:
+                names = {}
+                for name, version in provided:
+                    names.setdefault(name, []).append(version)
+                # Only the distributions missing a requirement for one of the
+                # provided names need to be looked at.
+                for name, versions in names.items():
+                    dists = self._missing_by_name.pop(name, None)
+                    if dists:
+                        self._resolve_missing(distribution, name, versions, dists)
+
+    def _resolve_missing(self, distribution, name, versions, dists):
+        """
+        Resolve to a newly added distribution those ``missing`` requirements
+        of ``dists`` which are for ``name`` and are met by one of ``versions``.
+        """
+        waiting = []  # dists still missing a requirement for name
+        seen = set()
+        for dist in dists:
+            if id(dist) in seen:
+                continue
+            seen.add(id(dist))
+            reqs = self.missing.get(dist)
+            if not reqs:
+                continue
+            if dist is distribution:
+                waiting.append(dist)
+                continue
+            remaining = []
+            for req in reqs:
+                n, matcher = self._get_matcher(req)
+                if n == name and any(self._matches(matcher, v) for v in versions):
+                    logger.debug('%s requirement %r provided by %s', dist, req, distribution)
+                    self.add_edge(dist, distribution, req)
+                else:
+                    remaining.append(req)
+                    if n == name:
+                        waiting.append(dist)
+            if not remaining:
+                del self.missing[dist]
+            elif len(remaining) < len(reqs):
+                self.missing[dist] = remaining
+        if waiting:
+            self._missing_by_name[name] = waiting
+
+    def remove_distribution(self, distribution):
+        """Remove the *distribution* from the graph, with its edges and any
+        ``missing`` requirements it has. The requirements of other
+        distributions which it provided are resolved to other distributions
+        in the graph, if possible, and are otherwise added to ``missing``.
+
+        :type distribution: :class:`distutils2.database.InstalledDistribution`
+                            or :class:`distutils2.database.EggInfoDistribution`
+        """
+        self._check_member(distribution)
+        for name in set(normalize_name(parse_name_and_version(p)[0])
+                        for p in getattr(distribution, 'provides', ())):
+            providers = [t for t in self._provided.get(name, ()) if t[1] is not distribution]
+            if providers:
+                self._provided[name] = providers
+            else:
+                self._provided.pop(name, None)
+        for other, _ in self.adjacency_list.pop(distribution):
+            preds = self.reverse_list.get(other)
+            if preds and distribution in preds:
+                preds.remove(distribution)
+        for req in self.missing.pop(distribution, ()):
+            name = self._get_matcher(req)[0]
+            dists = self._missing_by_name.get(name)
+            if dists is not None:
+                dists[:] = [d for d in dists if d is not distribution]
+                if not dists:
+                    del self._missing_by_name[name]
+        for pred in self.reverse_list.pop(distribution):
+            if pred == distribution:
+                continue
+            adjs = self.adjacency_list[pred]
+            reqs = [label for other, label in adjs if other == distribution]
+            adjs[:] = [t for t in adjs if t[0] != distribution]
+            for req in reqs:
+                if req is not None:  # can't look for a provider without a requirement
+                    self._add_requirement(pred, req)
 
     def add_edge(self, x, y, label=None):
         """Add an edge from distribution *x* to distribution *y* with the given
@@ -1109,10 +1978,12 @@ class DependencyGraph(object):
                  :class:`distutils2.database.EggInfoDistribution`
         :type label: ``str`` or ``None``
         """
-        self.adjacency_list[x].append((y, label))
-        # multiple edges are allowed, so be careful
-        if x not in self.reverse_list[y]:
+        adjs = self.adjacency_list[x]
+        # multiple edges are allowed, so be careful. It's cheaper to look
+        # for an existing edge in x's list than for x in y's predecessors.
+        if all(other != y for other, _ in adjs):
             self.reverse_list[y].append(x)
+        adjs.append((y, label))
 
     def add_missing(self, distribution, requirement):
         """
@@ -1124,6 +1995,53 @@ class DependencyGraph(object):
         """
         logger.debug('%s missing %r', distribution, requirement)
         self.missing.setdefault(distribution, []).append(requirement)
+        name = self._get_matcher(requirement)[0]
+        self._missing_by_name.setdefault(name, []).append(distribution)
+
+    def get_dependent_dists(self, dist):
+        """Recursively generate a list of the distributions in the graph that
+        are dependent on *dist*.
+
+        :param dist: a distribution in the graph
+        """
+        self._check_member(dist)
+        dep = [dist]  # dependent distributions
+        seen = set(dep)  # already added to todo
+        todo = list(self.reverse_list[dist])  # list of nodes we should inspect
+        seen.update(todo)
+
+        while todo:
+            d = todo.pop()
+            dep.append(d)
+            for succ in self.reverse_list[d]:
+                if succ not in seen:
+                    seen.add(succ)
+                    todo.append(succ)
+
+        dep.pop(0)  # remove dist from dep, was there to prevent infinite loops
+        return dep
+
+    def get_required_dists(self, dist):
+        """Recursively generate a set of the distributions in the graph that
+        are required by *dist*.
+
+        :param dist: a distribution in the graph
+        """
+        self._check_member(dist)
+        req = set()  # required distributions
+        todo = list(self.adjacency_list[dist])  # list of nodes we should inspect
+        seen = set(t[0] for t in todo)  # already added to todo
+
+        while todo:
+            d = todo.pop()[0]
+            req.add(d)
+            pred_list = self.adjacency_list[d]
+            for pred in pred_list:
+                d = pred[0]
+                if d not in req and d not in seen:
+                    seen.add(d)
+                    todo.append(pred)
+        return req
 
     def _repr_dist(self, dist):
         return '%s %s' % (dist.name, dist.version)
@@ -1172,6 +2090,41 @@ class DependencyGraph(object):
             f.write('}\n')
         f.write('}\n')
 
+    def _get_levels(self):
+        """
+        Sort the graph into levels using Kahn's algorithm, counting the
+        outstanding dependencies of each distribution. Each level is a list
+        of the distributions whose dependencies are all in earlier levels, in
+        the order they were added to the graph.
+
+        :return: A tuple of the list of levels and a list of distributions
+                 which form (or depend on) a cycle.
+        """
+        order = {}
+        pending = {}  # number of edges to distributions not yet sorted
+        dependents = {}
+        for i, (k, v) in enumerate(self.adjacency_list.items()):
+            order[k] = i
+            pending[k] = len(v)
+            for d, _ in v:
+                dependents.setdefault(d, []).append(k)
+        levels = []
+        level = [k for k, n in pending.items() if n == 0]
+        while level:
+            level.sort(key=order.get)
+            levels.append(level)
+            next_level = []
+            for d in level:
+                del pending[d]
+                for k in dependents.get(d, ()):
+                    n = pending[k] - 1
+                    pending[k] = n
+                    if n == 0:
+                        next_level.append(k)
+            level = next_level
+        # What's left in pending (if anything) is a cycle.
+        return levels, sorted(pending, key=order.get)
+
     def topological_sort(self):
         """
         Perform a topological sort of the graph.
@@ -1181,26 +2134,24 @@ class DependencyGraph(object):
                  circular dependencies and so form a cycle.
         """
         result = []
-        # Make a shallow copy of the adjacency list
-        alist = {}
-        for k, v in self.adjacency_list.items():
-            alist[k] = v[:]
-        while True:
-            # See what we can remove in this run
-            to_remove = []
-            for k, v in list(alist.items())[:]:
-                if not v:
-                    to_remove.append(k)
-                    del alist[k]
-            if not to_remove:
-                # What's left in alist (if anything) is a cycle.
-                break
-            # Remove from the adjacency list of others
-            for k, v in alist.items():
-                alist[k] = [(d, r) for d, r in v if d not in to_remove]
-            logger.debug('Moving to result: %s', ['%s (%s)' % (d.name, d.version) for d in to_remove])
-            result.extend(to_remove)
-        return result, list(alist.keys())
+        levels, cycle = self._get_levels()
+        for level in levels:
+            logger.debug('Moving to result: %s', ['%s (%s)' % (d.name, d.version) for d in level])
+            result.extend(level)
+        return result, cycle
+
+    def topological_levels(self):
+        """
+        Perform a topological sort of the graph, grouping the distributions
+        into levels which can each be processed (e.g. installed) in parallel.
+        :return: A tuple, the first element of which is a list of sets of
+                 distributions, where every dependency of a distribution is
+                 in an earlier set, and the second element of which is a list
+                 of distributions that cannot be sorted because they have
+                 circular dependencies and so form a cycle.
+        """
+        levels, cycle = self._get_levels()
+        return [set(level) for level in levels], cycle
 
     def __repr__(self):
         """Representation of the graph"""
@@ -1218,103 +2169,56 @@ def make_graph(dists, scheme='default'):
                  :class:`distutils2.database.EggInfoDistribution` instances
     :rtype: a :class:`DependencyGraph` instance
     """
-    scheme = get_scheme(scheme)
-    graph = DependencyGraph()
-    provided = {}  # maps names to lists of (version, dist) tuples
+    graph = DependencyGraph(scheme)
 
     # first, build the graph and find out what's provided
     for dist in dists:
         graph.add_distribution(dist)
 
-        for p in dist.provides:
-            name, version = parse_name_and_version(p)
-            logger.debug('Add to provided: %s, %s, %s', name, version, dist)
-            provided.setdefault(name, []).append((version, dist))
-
     # now make the edges
     for dist in dists:
-        requires = (dist.run_requires | dist.meta_requires | dist.build_requires | dist.dev_requires)
-        for req in requires:
-            try:
-                matcher = scheme.matcher(req)
-            except UnsupportedVersionError:
-                # XXX compat-mode if cannot read the version
-                logger.warning('could not read version %r - using name only', req)
-                name = req.split()[0]
-                matcher = scheme.matcher(name)
+        graph._link(dist)
+    return graph
 
-            name = matcher.key  # case-insensitive
-
-            matched = False
-            if name in provided:
-                for version, provider in provided[name]:
-                    try:
-                        match = matcher.match(version)
-                    except UnsupportedVersionError:
-                        match = False
-
-                    if match:
-                        graph.add_edge(dist, provider, req)
-                        matched = True
-                        break
-            if not matched:
-                graph.add_missing(dist, req)
+
+def _get_graph(dists, dist, graph):
+    """
+    Return the graph to use for a query, making it from *dists* (after
+    checking that *dist* is in them) if one wasn't specified.
+    """
+    if graph is None:
+        if dist not in dists:
+            raise DistlibException('given distribution %r is not a member '
+                                   'of the list' % dist.name)
+        graph = make_graph(dists)
     return graph
 
 
-def get_dependent_dists(dists, dist):
+def get_dependent_dists(dists, dist, graph=None):
     """Recursively generate a list of distributions from *dists* that are
     dependent on *dist*.
 
     :param dists: a list of distributions
     :param dist: a distribution, member of *dists* for which we are interested
+    :param graph: a graph made from *dists* by :func:`make_graph`, which can
+                  be passed to avoid making the graph again for each query.
+                  If it's specified, *dists* isn't used.
     """
-    if dist not in dists:
-        raise DistlibException('given distribution %r is not a member '
-                               'of the list' % dist.name)
-    graph = make_graph(dists)
-
-    dep = [dist]  # dependent distributions
-    todo = graph.reverse_list[dist]  # list of nodes we should inspect
-
-    while todo:
-        d = todo.pop()
-        dep.append(d)
-        for succ in graph.reverse_list[d]:
-            if succ not in dep:
-                todo.append(succ)
-
-    dep.pop(0)  # remove dist from dep, was there to prevent infinite loops
-    return dep
+    return _get_graph(dists, dist, graph).get_dependent_dists(dist)
 
 
-def get_required_dists(dists, dist):
+def get_required_dists(dists, dist, graph=None):
     """Recursively generate a list of distributions from *dists* that are
     required by *dist*.
 
     :param dists: a list of distributions
     :param dist: a distribution, member of *dists* for which we are interested
                  in finding the dependencies.
+    :param graph: a graph made from *dists* by :func:`make_graph`, which can
+                  be passed to avoid making the graph again for each query.
+                  If it's specified, *dists* isn't used.
     """
-    if dist not in dists:
-        raise DistlibException('given distribution %r is not a member '
-                               'of the list' % dist.name)
-    graph = make_graph(dists)
-
-    req = set()  # required distributions
-    todo = graph.adjacency_list[dist]  # list of nodes we should inspect
-    seen = set(t[0] for t in todo)  # already added to todo
-
-    while todo:
-        d = todo.pop()[0]
-        req.add(d)
-        pred_list = graph.adjacency_list[d]
-        for pred in pred_list:
-            d = pred[0]
-            if d not in req and d not in seen:
-                seen.add(d)
-                todo.append(pred)
-    return req
+    return _get_graph(dists, dist, graph).get_required_dists(dist)
 
 
 def make_dist(name, version, **kwargs):
@@ -26,7 +26,7 @@ from .metadata import Metadata, MetadataInvalidError
 from .util import (cached_property, ensure_slash, split_filename, get_project_data, parse_requirement,
                    parse_name_and_version, ServerProxy, normalize_name)
 from .version import get_scheme, UnsupportedVersionError
-from .wheel import Wheel, is_compatible
+from .wheel import Wheel, is_compatible, get_wheel_rank
 
 logger = logging.getLogger(__name__)
 
@@ -193,11 +193,15 @@ class Locator(object):
         t = urlparse(url)
         basename = posixpath.basename(t.path)
         compatible = True
+        rank = 0
         is_wheel = basename.endswith('.whl')
         is_downloadable = basename.endswith(self.downloadable_extensions)
         if is_wheel:
-            compatible = is_compatible(Wheel(basename), self.wheel_tags)
-        return (t.scheme == 'https', 'pypi.org' in t.netloc, is_downloadable, is_wheel, compatible, basename)
+            rank = get_wheel_rank(Wheel(basename), self.wheel_tags)
+            compatible = rank is not None
+        # more specific compatible wheels (lower ranks) are preferred
+        return (t.scheme == 'https', 'pypi.org' in t.netloc, is_downloadable, is_wheel, compatible, -(rank or 0),
+                basename)
 
     def prefer_url(self, url1, url2):
         """
@@ -207,7 +211,8 @@ class Locator(object):
 
         The current implementation favours https:// URLs over http://, archives
         from PyPI over those from other locations, wheel compatibility (if a
-        wheel) and then the archive name.
+        wheel, preferring wheels with the most specific compatible tags) and
+        then the archive name.
         """
         result = url2
         if url1:
@@ -99,7 +99,7 @@ class Evaluator(object):
 _DIGITS = re.compile(r'\d+\.\d+')
 
 
-def default_context():
+def _make_default_context():
 
     def format_full_version(info):
         version = '%s.%s.%s' % (info.major, info.minor, info.micro)
@@ -135,13 +135,33 @@ def default_context():
     return result
 
 
-DEFAULT_CONTEXT = default_context()
-del default_context
+_default_context = None  # computed when needed
+
+
+def _get_default_context():
+    global _default_context
+
+    if _default_context is None:
+        _default_context = _make_default_context()
+    return _default_context
+
+
+def __getattr__(name):
+    # Compute DEFAULT_CONTEXT lazily (PEP 562), as doing so involves probing
+    # the platform.
+    if name == 'DEFAULT_CONTEXT':
+        return _get_default_context()
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+if sys.version_info[:2] < (3, 7):  # pragma: no cover
+    # No support for module __getattr__, so compute it now.
+    DEFAULT_CONTEXT = _get_default_context()
 
 evaluator = Evaluator()
 
 def interpret_parsed(expr, execution_context=None):
-    context = dict(DEFAULT_CONTEXT)
+    context = dict(_get_default_context())
     if execution_context:
         context.update(execution_context)
     return evaluator.evaluate(expr, context)
@@ -11,6 +11,7 @@ import io
 import logging
 import os
 import pkgutil
+import stat
 import sys
 import types
 import zipimport
@@ -22,6 +23,11 @@ logger = logging.getLogger(__name__)
 
 cache = None  # created when needed
 
+try:
+    from os import scandir
+except ImportError:  # pragma: no cover
+    scandir = None
+
 
 class ResourceCache(Cache):
 
@@ -116,6 +122,43 @@ class ResourceContainer(ResourceBase):
         return self.finder.get_resources(self)
 
 
+class _DirEntry(object):
+    """
+    A stand-in for ``os.DirEntry`` where ``os.scandir()`` isn't available.
+    Stat results are cached, as they are for ``os.DirEntry``.
+    """
+
+    def __init__(self, dirname, name):
+        self.name = name
+        self.path = os.path.join(dirname, name)
+        self._stat = None
+        self._lstat = None
+
+    def stat(self, follow_symlinks=True):
+        if not follow_symlinks:
+            if self._lstat is None:
+                self._lstat = os.lstat(self.path)
+            return self._lstat
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+    def _test(self, test, follow_symlinks=True):
+        try:
+            return test(self.stat(follow_symlinks).st_mode)
+        except OSError:
+            return False
+
+    def is_dir(self, follow_symlinks=True):
+        return self._test(stat.S_ISDIR, follow_symlinks)
+
+    def is_file(self, follow_symlinks=True):
+        return self._test(stat.S_ISREG, follow_symlinks)
+
+    def is_symlink(self):
+        return self._test(stat.S_ISLNK, False)
+
+
 class ResourceFinder(object):
     """
     Resource finder for file system resources.
@@ -190,12 +233,42 @@ class ResourceFinder(object):
     def get_size(self, resource):
         return os.path.getsize(resource.path)
 
-    def get_resources(self, resource):
+    def _allowed(self, name):
+        return name != '__pycache__' and not name.endswith(self.skipped_extensions)
 
-        def allowed(f):
-            return (f != '__pycache__' and not f.endswith(self.skipped_extensions))
+    def get_resources(self, resource):
+        return set([f for f in os.listdir(resource.path) if self._allowed(f)])
 
-        return set([f for f in os.listdir(resource.path) if allowed(f)])
+    def scan(self, resource_name=''):
+        """
+        List a container resource using a single directory scan.
+
+        :param resource_name: The name of the container resource.
+        :return: A dictionary mapping the names in the container (as returned
+                 by :attr:`Resource.resources`) to entries with ``name`` and
+                 ``path`` attributes and ``is_dir()``, ``is_file()``,
+                 ``is_symlink()`` and ``stat()`` methods, as for the entries
+                 returned by ``os.scandir()``. The results of these methods
+                 are cached, so they don't need further system calls. The
+                 ``path`` is in the resolved directory of the container, but
+                 is not itself resolved if the entry is a symbolic link.
+                 ``None`` is returned if the resource isn't a directory, or
+                 if this finder doesn't support scanning.
+        """
+        path = self._make_path(resource_name)
+        try:
+            if scandir is not None:
+                it = scandir(path)
+                try:
+                    result = dict((e.name, e) for e in it if self._allowed(e.name))
+                finally:
+                    if hasattr(it, 'close'):
+                        it.close()
+            else:  # pragma: no cover
+                result = dict((f, _DirEntry(path, f)) for f in os.listdir(path) if self._allowed(f))
+        except OSError:
+            result = None
+        return result
 
     def is_container(self, resource):
         return self._is_directory(resource.path)
@@ -275,6 +348,13 @@ class ZipResourceFinder(ResourceFinder):
         path = resource.path[self.prefix_len:]
         return self._files[path][3]
 
+    def scan(self, resource_name=''):
+        """
+        Scanning isn't supported for resources in .zip files, so this returns
+        ``None``.
+        """
+        return None
+
     def get_resources(self, resource):
         path = resource.path[self.prefix_len:]
         if path and path[-1] != os.sep:
@@ -33,7 +33,7 @@ import time
 from . import DistlibException
 from .compat import (string_types, text_type, shutil, raw_input, StringIO, cache_from_source, urlopen, urljoin, httplib,
                      xmlrpclib, HTTPHandler, BaseConfigurator, valid_ident, Container, configparser, URLError, ZipFile,
-                     fsdecode, unquote, urlparse)
+                     fsdecode, unquote, urlparse, reraise)
 
 logger = logging.getLogger(__name__)
 
@@ -456,6 +456,61 @@ class cached_property(object):
         return value
 
 
+def thread_map(func, items, max_workers=None):
+    """
+    Call ``func`` on each of ``items`` using a pool of threads, and return a
+    list of the results in the same order as ``items``.
+
+    :param func: A callable taking a single argument.
+    :param items: An iterable of arguments to pass to ``func``.
+    :param max_workers: The maximum number of threads to use. If ``None``, a
+                        default based on the number of CPUs is used. If less
+                        than 2, the calls are made serially in the calling
+                        thread.
+    :return: A list of the values returned by ``func``.
+
+    If any call raises an exception (including one such as ``SystemExit``,
+    which isn't derived from ``Exception``), no further items are started, and
+    the exception raised for the earliest such item is re-raised, with its
+    original traceback, once the running calls have completed.
+    """
+    items = list(items)
+    n = len(items)
+    if max_workers is None:
+        cpu_count = getattr(os, 'cpu_count', None)
+        max_workers = min(32, ((cpu_count and cpu_count()) or 1) + 4)
+    if max_workers < 2 or n < 2:
+        return [func(item) for item in items]
+    results = [None] * n
+    errors = [None] * n
+    failed = []
+    lock = threading.Lock()
+    indices = iter(range(n))
+
+    def worker():
+        while True:
+            with lock:
+                i = None if failed else next(indices, None)
+            if i is None:
+                break
+            try:
+                results[i] = func(items[i])
+            except BaseException:
+                errors[i] = sys.exc_info()
+                failed.append(i)
+
+    threads = [threading.Thread(target=worker) for _ in range(min(max_workers, n))]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    for t in threads:
+        t.join()
+    for e in errors:
+        if e is not None:
+            reraise(*e)
+    return results
+
+
 def convert_path(pathname):
     """Return 'pathname' as a name that will work on the native filesystem.
 
@@ -483,6 +538,32 @@ def convert_path(pathname):
     return os.path.join(*paths)
 
 
+FICLONE = 0x40049409  # from linux/fs.h
+
+
+def _clone_file(src, dst):
+    """
+    Try to make dst a copy-on-write clone of src. Return True if successful,
+    else False. Currently only supported on Linux filesystems which implement
+    the FICLONE ioctl (such as Btrfs and XFS).
+    """
+    result = False
+    if sys.platform.startswith('linux'):
+        try:
+            import fcntl
+        except ImportError:  # pragma: no cover
+            fcntl = None
+        if fcntl:
+            with open(src, 'rb') as fin:
+                with open(dst, 'wb') as fout:
+                    try:
+                        fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+                        result = True
+                    except (IOError, OSError):
+                        pass
+    return result
+
+
 class FileOperator(object):
 
     def __init__(self, dry_run=False):
@@ -550,6 +631,28 @@ class FileOperator(object):
                 outstream.close()
         self.record_as_written(outfile)
 
+    def link_file(self, infile, outfile):
+        """Make outfile a hard link to infile, respecting dry-run.
+
+        If a hard link can't be made (for example, because the files would be
+        on different filesystems), a copy-on-write clone is made where the
+        filesystem supports it, and failing that, the file is copied. Any
+        existing outfile is replaced. As the result may share its contents
+        with infile, outfile shouldn't be modified in place afterwards.
+        """
+        self.ensure_dir(os.path.dirname(outfile))
+        logger.info('Linking %s to %s', infile, outfile)
+        if not self.dry_run:
+            if os.path.islink(outfile) or os.path.exists(outfile):
+                os.remove(outfile)
+            try:
+                os.link(infile, outfile)
+            except (AttributeError, OSError):
+                if not _clone_file(infile, outfile):
+                    shutil.copyfile(infile, outfile)
+                shutil.copymode(infile, outfile)
+        self.record_as_written(outfile)
+
     def write_binary_file(self, path, data):
         self.ensure_dir(os.path.dirname(path))
         if not self.dry_run:
@@ -1675,8 +1778,12 @@ class CSVReader(CSVBase):
 
 class CSVWriter(CSVBase):
 
-    def __init__(self, fn, **kwargs):
-        self.stream = _csv_open(fn, 'w')
+    def __init__(self, fn=None, **kwargs):
+        if 'stream' in kwargs:
+            # should be a text stream on 3.x and a byte stream on 2.x
+            self.stream = kwargs['stream']
+        else:
+            self.stream = _csv_open(fn, 'w')
         self.writer = csv.writer(self.stream, **self.defaults)
 
     def writerow(self, row):
@@ -8,30 +8,42 @@ from __future__ import unicode_literals
 
 import base64
 import codecs
+import contextlib
 import datetime
+import errno
 from email import message_from_file
 import hashlib
+import io
 import json
 import logging
 import os
 import posixpath
 import re
 import shutil
+import struct
 import sys
 import tempfile
+import time
 import zipfile
+import zlib
+
+try:
+    import threading
+except ImportError:  # pragma: no cover
+    import dummy_threading as threading
 
 from . import __version__, DistlibException
-from .compat import sysconfig, ZipFile, fsdecode, text_type, filter
+from .compat import sysconfig, ZipFile, fsdecode, text_type, filter, Container, OrderedDict
 from .database import InstalledDistribution
 from .metadata import Metadata, WHEEL_METADATA_FILENAME, LEGACY_METADATA_FILENAME
 from .util import (FileOperator, convert_path, CSVReader, CSVWriter, Cache, cached_property, get_cache_base,
-                   read_exports, tempdir, get_platform, is_in_directory)
+                   read_exports, tempdir, get_platform, is_in_directory, thread_map)
 from .version import NormalizedVersion, UnsupportedVersionError
 
 logger = logging.getLogger(__name__)
 
 cache = None  # created when needed
+wheel_cache = None  # created when needed
 
 if hasattr(sys, 'pypy_version_info'):  # pragma: no cover
     IMP_PREFIX = 'pp'
@@ -100,6 +112,12 @@ SHEBANG_DETAIL_RE = re.compile(br'^(\s*#!("[^"]+"|\S+))\s+(.*)$')
 SHEBANG_PYTHON = b'#!python'
 SHEBANG_PYTHONW = b'#!pythonw'
 
+CHUNK_SIZE = 64 * 1024  # for reading files in chunks
+
+BATCH_SIZE = 64 * 1024 * 1024  # bytes of members compressed at a time in parallel
+
+_MISSING = object()  # for arguments which weren't specified
+
 if os.sep == '/':
     to_posix = lambda o: o
 else:
@@ -172,6 +190,427 @@ class Mounter(object):
 _hook = Mounter()
 
 
+def _no_such_resource(path):
+    return IOError(errno.ENOENT, 'No such resource in mounted wheels', path)
+
+
+class _WheelResource(object):
+    """
+    A file or directory in a wheel mounted with ``indexed=True``, which can
+    be traversed as for :mod:`importlib.resources`. It's read from the
+    archive which the finder keeps open.
+    """
+
+    def __init__(self, zf, at):
+        self.zf = zf
+        self.at = at  # archive path, without a trailing slash
+
+    def __repr__(self):
+        return '<%s %r>' % (self.__class__.__name__, self.at)
+
+    @property
+    def name(self):
+        return posixpath.basename(self.at)
+
+    def _members(self):
+        # the archive paths of the members under this one, relative to it
+        prefix = self.at + '/' if self.at else ''
+        n = len(prefix)
+        for arcname in self.zf.namelist():
+            if arcname.startswith(prefix) and len(arcname) > n:
+                yield arcname[n:]
+
+    def is_file(self):
+        try:
+            self.zf.getinfo(self.at)
+        except KeyError:
+            return False
+        return not self.at.endswith('/')
+
+    def is_dir(self):
+        for _ in self._members():
+            return True
+        return False
+
+    def iterdir(self):
+        seen = set()
+        for rp in self._members():
+            name = rp.split('/', 1)[0]
+            if name not in seen:
+                seen.add(name)
+                yield self.joinpath(name)
+
+    def joinpath(self, *descendants):
+        at = posixpath.join(self.at, *descendants) if descendants else self.at
+        return self.__class__(self.zf, posixpath.normpath(at).lstrip('/') if at else at)
+
+    __truediv__ = joinpath
+
+    def open(self, mode='r', *args, **kwargs):
+        if mode not in ('r', 'rb'):
+            raise ValueError('Resources can only be opened for reading: %r' % mode)
+        if not self.is_file():
+            raise _no_such_resource(self.at)
+        result = io.BytesIO(self.zf.read(self.at))
+        if mode == 'r':
+            result = io.TextIOWrapper(result, *args, **kwargs)
+        return result
+
+    def read_bytes(self):
+        with self.open('rb') as f:
+            return f.read()
+
+    def read_text(self, encoding=None):
+        with self.open('r', encoding=encoding) as f:
+            return f.read()
+
+
+class _WheelResourceReader(object):
+    """
+    A resource reader (as for :mod:`importlib.resources`) for a package in a
+    wheel mounted with ``indexed=True``.
+    """
+
+    def __init__(self, zf, prefix):
+        self.zf = zf
+        self.prefix = prefix  # archive path of the package's directory
+
+    def files(self):
+        return _WheelResource(self.zf, self.prefix)
+
+    def open_resource(self, resource):
+        return self.files().joinpath(resource).open('rb')
+
+    def resource_path(self, resource):
+        # There's no file on the filesystem, so importlib.resources falls
+        # back to extracting the resource to a temporary file.
+        raise _no_such_resource(resource)
+
+    def is_resource(self, name):
+        return self.files().joinpath(name).is_file()
+
+    def contents(self):
+        return [r.name for r in self.files().iterdir()]
+
+
+class _WheelFinder(object):
+    """
+    A meta path finder (and loader) for wheels mounted with ``indexed=True``.
+    It keeps a merged index of the modules in all of its wheels, built from
+    their central directories, so that finding a module (or failing to) takes
+    a single dictionary lookup, however many wheels are mounted.
+    """
+
+    def __init__(self):
+        self.wheels = {}  # pathname -> (zipfile, module index)
+        self.order = []  # pathnames, highest priority first
+        self.index = {}  # fullname -> (pathname, arcname or path, kind)
+
+    def add(self, pathname, zf, index, first=True):
+        self.wheels[pathname] = (zf, index)
+        if first:
+            self.order.insert(0, pathname)
+        else:
+            self.order.append(pathname)
+        self._reindex()
+
+    def remove(self, pathname):
+        zf, _ = self.wheels.pop(pathname)
+        self.order.remove(pathname)
+        self._reindex()
+        zf.close()
+
+    def _reindex(self):
+        index = {}
+        for pathname in self.order:
+            for name, (arcname, kind) in self.wheels[pathname][1].items():
+                index.setdefault(name, (pathname, arcname, kind))
+        self.index = index  # replaced, not updated, for the sake of threads
+
+    def find_spec(self, fullname, path=None, target=None):
+        entry = self.index.get(fullname)
+        if entry is None:
+            return None
+        pathname, arcname, kind = entry
+        if kind == 'extension':
+            return importlib.util.spec_from_file_location(fullname, arcname)
+        location = os.path.join(pathname, convert_path(arcname))
+        if kind == 'namespace':
+            spec = importlib.machinery.ModuleSpec(fullname, self, loader_state=entry, is_package=True)
+            spec.submodule_search_locations = [location]
+        else:
+            spec = importlib.machinery.ModuleSpec(fullname,
+                                                  self,
+                                                  origin=location,
+                                                  loader_state=entry,
+                                                  is_package=kind == 'package')
+            spec.has_location = True
+            if kind == 'package':
+                spec.submodule_search_locations = [os.path.dirname(location)]
+        return spec
+
+    def create_module(self, spec):
+        return None  # use the default module creation
+
+    def exec_module(self, module):
+        pathname, arcname, kind = module.__spec__.loader_state
+        if kind != 'namespace':
+            code = self.get_code(module.__name__)
+            exec(code, module.__dict__)
+
+    def _get_entry(self, fullname):
+        try:
+            return self.index[fullname]
+        except KeyError:
+            raise ImportError('No module named %r in mounted wheels' % fullname, name=fullname)
+
+    def is_package(self, fullname):
+        return self._get_entry(fullname)[2] in ('package', 'namespace')
+
+    def get_filename(self, fullname):
+        pathname, arcname, kind = self._get_entry(fullname)
+        return os.path.join(pathname, convert_path(arcname))
+
+    def get_source(self, fullname):
+        pathname, arcname, kind = self._get_entry(fullname)
+        if kind == 'namespace':
+            return ''
+        return importlib.util.decode_source(self.wheels[pathname][0].read(arcname))
+
+    def get_code(self, fullname):
+        source = self.get_source(fullname)
+        return compile(source, self.get_filename(fullname), 'exec', dont_inherit=True)
+
+    def get_data(self, path):
+        """
+        Return the contents of a file in a mounted wheel, given the path it
+        would have if the wheel were a directory (as for zipimport).
+        """
+        for pathname in self.order:
+            prefix = os.path.join(pathname, '')
+            if path.startswith(prefix):
+                arcname = path[len(prefix):].replace(os.sep, '/')
+                try:
+                    return self.wheels[pathname][0].read(arcname)
+                except KeyError:
+                    break
+        raise _no_such_resource(path)
+
+    def get_resource_reader(self, fullname):
+        pathname, arcname, kind = self._get_entry(fullname)
+        if kind == 'package':
+            prefix = posixpath.dirname(arcname)
+        elif kind == 'namespace':
+            prefix = arcname
+        else:
+            return None  # only packages have resources
+        return _WheelResourceReader(self.wheels[pathname][0], prefix)
+
+    def install(self, append=False):
+        """
+        Add the finder to ``sys.meta_path``, if it's not already there: at
+        the end if ``append`` is true, or else just after the builtin and
+        frozen module importers, so that mounted wheels can't shadow those.
+        """
+        meta_path = sys.meta_path
+        if self not in meta_path:
+            if append:
+                meta_path.append(self)
+            else:
+                pos = 0
+                for i, finder in enumerate(meta_path):
+                    if finder in (importlib.machinery.BuiltinImporter, importlib.machinery.FrozenImporter):
+                        pos = i + 1
+                meta_path.insert(pos, self)
+
+
+# Finders for wheels mounted with indexed=True, near the start and at the end
+# of sys.meta_path, according to whether they were mounted with append=True.
+_prepend_finder = _WheelFinder()
+_append_finder = _WheelFinder()
+
+
+class _DirectoryCache(object):
+    """
+    A cache of the parsed central directories (and RECORDs) of wheels, keyed
+    by path and validated against the modification time and size of the
+    file, so that opening the same wheel repeatedly doesn't parse its central
+    directory each time.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, path, stamp):
+        """
+        Return the entry for ``path`` if it's still valid, else ``None``.
+        """
+        with self.lock:
+            entry = self.entries.pop(path, None)
+            if entry is not None and entry.stamp == stamp:
+                self.entries[path] = entry  # most recently used
+                return entry
+        return None
+
+    def put(self, path, stamp, filelist, attrs):
+        """
+        Add an entry for ``path`` and return it, discarding the least recently
+        used entries if the cache is full.
+        """
+        entry = Container(stamp=stamp, filelist=filelist, attrs=attrs, records={})
+        with self.lock:
+            self.entries.pop(path, None)
+            self.entries[path] = entry
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return entry
+
+    def remove(self, path):
+        with self.lock:
+            self.entries.pop(os.path.abspath(path), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+directory_cache = _DirectoryCache()
+
+
+class _WheelZipFile(ZipFile):
+    """
+    A ZipFile which can also write members whose data has already been
+    compressed, so that compression can be done separately from writing.
+    When reading from a file, the parsed central directory is kept in (and
+    when still valid, taken from) ``directory_cache``.
+    """
+
+    stamp = None
+    cache_entry = None
+
+    def _RealGetContents(self):
+        path = self.filename
+        fileno = getattr(self.fp, 'fileno', None)
+        if self.mode != 'r' or not path or fileno is None:
+            super(_WheelZipFile, self)._RealGetContents()
+            return
+        path = os.path.abspath(path)
+        st = os.fstat(fileno())
+        self.stamp = (st.st_mtime, st.st_size)
+        entry = directory_cache.get(path, self.stamp)
+        if entry is not None:
+            self.filelist = list(entry.filelist)
+            self.NameToInfo = dict((zinfo.filename, zinfo) for zinfo in entry.filelist)
+            for k, v in entry.attrs.items():
+                setattr(self, k, v)
+        else:
+            super(_WheelZipFile, self)._RealGetContents()
+            attrs = dict((k, self.__dict__[k]) for k in ('start_dir', '_comment', 'comment') if k in self.__dict__)
+            entry = directory_cache.put(path, self.stamp, list(self.filelist), attrs)
+        self.cache_entry = entry
+
+    def _write_header(self, zinfo):
+        """
+        Write the local file header for a member whose data has already been
+        compressed. The ``CRC``, ``file_size`` and ``compress_size``
+        attributes of ``zinfo`` must already have been set.
+        """
+        zinfo.flag_bits = 0  # no data descriptor
+        if hasattr(self, 'start_dir'):
+            self.fp.seek(self.start_dir)
+        zinfo.header_offset = self.fp.tell()  # Python 2.7's _writecheck uses this
+        self._writecheck(zinfo)
+        self._didModify = True
+        zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+        self.fp.write(zinfo.FileHeader(zip64))
+
+    def _add_member(self, zinfo):
+        """
+        Record a member once its header and data have been written.
+        """
+        self.filelist.append(zinfo)
+        self.NameToInfo[zinfo.filename] = zinfo
+        if hasattr(self, 'start_dir'):
+            self.start_dir = self.fp.tell()
+
+    def write_raw(self, zinfo, data):
+        """
+        Write a member whose data has already been compressed according to
+        ``zinfo.compress_type``. The ``CRC`` and ``file_size`` attributes of
+        ``zinfo`` must already have been set.
+        """
+        zinfo.compress_size = len(data)
+        self._write_header(zinfo)
+        self.fp.write(data)
+        self._add_member(zinfo)
+
+    def get_raw_offset(self, zinfo):
+        """
+        Return the offset in the archive of the data for a member, as stored
+        (i.e. compressed).
+        """
+        self.fp.seek(zinfo.header_offset)
+        header = self.fp.read(zipfile.sizeFileHeader)
+        if len(header) != zipfile.sizeFileHeader or header[:4] != zipfile.stringFileHeader:
+            raise DistlibException('Bad local file header for %r' % zinfo.filename)
+        fheader = struct.unpack(zipfile.structFileHeader, header)
+        n = fheader[zipfile._FH_FILENAME_LENGTH] + fheader[zipfile._FH_EXTRA_FIELD_LENGTH]
+        return zinfo.header_offset + zipfile.sizeFileHeader + n
+
+    def copy_raw(self, source, zinfo):
+        """
+        Copy a member from another archive without decompressing and
+        recompressing it. The data is copied in chunks, so a large member
+        isn't read into memory all at once.
+
+        :param source: The :class:`_WheelZipFile` to copy the member from.
+        :param zinfo: The :class:`zipfile.ZipInfo` for the member in
+                      ``source``.
+        :return: The :class:`zipfile.ZipInfo` for the member in this archive.
+        """
+        result = zipfile.ZipInfo(zinfo.filename, zinfo.date_time)
+        for attr in ('compress_type', 'create_system', 'external_attr', 'CRC', 'file_size', 'compress_size'):
+            setattr(result, attr, getattr(zinfo, attr))
+        offset = source.get_raw_offset(zinfo)
+        self._write_header(result)
+        remaining = zinfo.compress_size
+        while remaining > 0:
+            source.fp.seek(offset)
+            chunk = source.fp.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise DistlibException('Truncated data for %r' % zinfo.filename)
+            self.fp.write(chunk)
+            offset += len(chunk)
+            remaining -= len(chunk)
+        self._add_member(result)
+        return result
+
+
+class _HashingReader(object):
+    """
+    A wrapper for a binary stream which passes all the data read from it to
+    one or more hashers, and counts its size.
+    """
+
+    def __init__(self, stream, hashers):
+        self.stream = stream
+        self.hashers = list(hashers)
+        self.size = 0
+
+    def read(self, n=-1):
+        data = self.stream.read(n)
+        for hasher in self.hashers:
+            hasher.update(data)
+        self.size += len(data)
+        return data
+
+    def drain(self):
+        while self.read(CHUNK_SIZE):
+            pass
+
+
 class Wheel(object):
     """
     Class to build and install from Wheel files (PEP 427).
@@ -179,6 +618,16 @@ class Wheel(object):
 
     wheel_version = (1, 1)
     hash_kind = 'sha256'
+    _shared = None
+
+    # The number of threads used to compress members when building or
+    # updating wheels. None means a default based on the number of CPUs.
+    max_workers = 1
+
+    # Members with these extensions are usually already compressed, so they
+    # are stored in built wheels rather than being compressed again.
+    stored_extensions = ('.bz2', '.gz', '.jar', '.jpeg', '.jpg', '.lzma', '.png', '.tgz', '.whl', '.xz', '.zip',
+                         '.zst')
 
     def __init__(self, filename=None, sign=False, verify=False):
         """
@@ -242,6 +691,57 @@ class Wheel(object):
         path = os.path.join(self.dirname, self.filename)
         return os.path.isfile(path)
 
+    def open(self):
+        """
+        Open a handle to the wheel's archive which is shared by subsequent
+        operations on the wheel, until :meth:`close` is called.
+        """
+        if self._shared is None:
+            pathname = os.path.join(self.dirname, self.filename)
+            self._shared = _WheelZipFile(pathname, 'r')
+        return self
+
+    def close(self):
+        """
+        Close any shared handle opened by :meth:`open`.
+        """
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open_archive(self):
+        """
+        Return the shared handle to the wheel's archive if there is one, and
+        it's still valid, else a new handle.
+        """
+        pathname = os.path.join(self.dirname, self.filename)
+        zf = self._shared
+        if zf is None:
+            return _WheelZipFile(pathname, 'r')
+        st = os.stat(pathname)
+        if zf.filename != pathname or zf.stamp != (st.st_mtime, st.st_size):
+            zf.close()
+            self._shared = zf = _WheelZipFile(pathname, 'r')
+        return zf
+
+    def _close_archive(self, zf):
+        if zf is not self._shared:
+            zf.close()
+
+    @contextlib.contextmanager
+    def _archive(self):
+        zf = self._open_archive()
+        try:
+            yield zf
+        finally:
+            self._close_archive(zf)
+
     @property
     def tags(self):
         for pyver in self.pyver:
@@ -251,11 +751,10 @@ class Wheel(object):
 
     @cached_property
     def metadata(self):
-        pathname = os.path.join(self.dirname, self.filename)
         name_ver = '%s-%s' % (self.name, self.version)
         info_dir = '%s.dist-info' % name_ver
         wrapper = codecs.getreader('utf-8')
-        with ZipFile(pathname, 'r') as zf:
+        with self._archive() as zf:
             self.get_wheel_metadata(zf)
             # wv = wheel_metadata['Wheel-Version'].split('.', 1)
             # file_version = tuple([int(i) for i in wv])
@@ -292,11 +791,80 @@ class Wheel(object):
 
     @cached_property
     def info(self):
-        pathname = os.path.join(self.dirname, self.filename)
-        with ZipFile(pathname, 'r') as zf:
+        with self._archive() as zf:
             result = self.get_wheel_metadata(zf)
         return result
 
+    def _read_headers(self, zf, arcname):
+        """
+        Read the headers (but not any body) of an RFC 822-style member of a
+        wheel. Values of headers which appear more than once are lists.
+        """
+        lines = []
+        with zf.open(arcname) as bf:
+            for line in codecs.getreader('utf-8')(bf):
+                if not line.strip():
+                    break
+                lines.append(line)
+        result = {}
+        for k, v in message_from_file(io.StringIO(''.join(lines))).items():
+            if k not in result:
+                result[k] = v
+            elif isinstance(result[k], list):
+                result[k].append(v)
+            else:
+                result[k] = [result[k], v]
+        return result
+
+    def inspect(self, fileobj=None):
+        """
+        Return a summary of a wheel's contents, reading only its central
+        directory and the headers of its WHEEL and METADATA files, rather than
+        the whole archive.
+
+        :param fileobj: If specified, a seekable binary file object to read
+                        the wheel from. Otherwise, the wheel is read from its
+                        location on disk.
+        :return: A dictionary which can be serialized as JSON, with keys
+                 ``'filename'``, ``'name'``, ``'version'``, ``'tags'``,
+                 ``'wheel'`` and ``'metadata'`` (the WHEEL and METADATA
+                 headers), ``'members'`` (a list of (name, size,
+                 compressed size) lists), ``'size'`` and ``'compressed_size'``
+                 (the totals over all members).
+        """
+        name_ver = '%s-%s' % (self.name, self.version)
+        info_dir = '%s.dist-info' % name_ver
+        if fileobj is None:
+            cm = self._archive()
+        else:
+            cm = contextlib.closing(_WheelZipFile(fileobj, 'r'))
+        with cm as zf:
+            members = []
+            size = compressed_size = 0
+            for zinfo in zf.infolist():
+                arcname = zinfo.filename
+                if not isinstance(arcname, text_type):
+                    arcname = arcname.decode('utf-8')
+                members.append([arcname, zinfo.file_size, zinfo.compress_size])
+                size += zinfo.file_size
+                compressed_size += zinfo.compress_size
+            wheel = self._read_headers(zf, posixpath.join(info_dir, 'WHEEL'))
+            try:
+                metadata = self._read_headers(zf, posixpath.join(info_dir, LEGACY_METADATA_FILENAME))
+            except KeyError:
+                metadata = {}
+        return {
+            'filename': self.filename,
+            'name': self.name,
+            'version': self.version,
+            'tags': ['-'.join(tag) for tag in self.tags],
+            'wheel': wheel,
+            'metadata': metadata,
+            'members': members,
+            'size': size,
+            'compressed_size': compressed_size,
+        }
+
     def process_shebang(self, data):
         m = SHEBANG_RE.match(data)
         if m:
@@ -327,16 +895,40 @@ class Wheel(object):
             data = SHEBANG_PYTHON + term + data
         return data
 
-    def get_hash(self, data, hash_kind=None):
-        if hash_kind is None:
-            hash_kind = self.hash_kind
+    def _get_hasher(self, hash_kind):
         try:
             hasher = getattr(hashlib, hash_kind)
         except AttributeError:
             raise DistlibException('Unsupported hash algorithm: %r' % hash_kind)
-        result = hasher(data).digest()
-        result = base64.urlsafe_b64encode(result).rstrip(b'=').decode('ascii')
-        return hash_kind, result
+        return hasher()
+
+    def _encode_digest(self, digest):
+        return base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+    def get_hash(self, data, hash_kind=None):
+        if hash_kind is None:
+            hash_kind = self.hash_kind
+        hasher = self._get_hasher(hash_kind)
+        hasher.update(data)
+        return hash_kind, self._encode_digest(hasher.digest())
+
+    def _read_record(self, zf, record_name):
+        """
+        Return the rows of a wheel's RECORD as a dictionary keyed by archive
+        path.
+        """
+        entry = zf.cache_entry if isinstance(zf, _WheelZipFile) else None
+        if entry is not None and record_name in entry.records:
+            return dict(entry.records[record_name])
+        records = {}
+        with zf.open(record_name) as bf:
+            with CSVReader(stream=bf) as reader:
+                for row in reader:
+                    p = row[0]
+                    records[p] = row
+        if entry is not None:
+            entry.records[record_name] = records
+        return dict(records)
 
     def write_record(self, records, record_path, archive_record_path):
         records = list(records)  # make a copy, as mutated
@@ -367,10 +959,177 @@ class Wheel(object):
                 logger.debug('Wrote %s to %s in wheel', p, ap)
                 zf.write(p, ap)
 
-    def build(self, paths, tags=None, wheel_version=None):
+    def _compress_member(self, ap, p, data, date_time, is_script=False, compresslevel=None):
+        """
+        Prepare a member for writing to a wheel, reading its contents just
+        once and passing them through both the hasher and the compressor.
+
+        :param ap: The archive path of the member.
+        :param p: The filesystem path to read the contents from, if ``data``
+                  is ``None``.
+        :param data: The contents of the member, or ``None`` if they're to be
+                     read from ``p``.
+        :param date_time: The timestamp to use if ``data`` is specified.
+        :param is_script: If true, the member's shebang line is processed
+                          (in memory) before the contents are used.
+        :param compresslevel: The zlib compression level to use.
+        :return: A tuple of the :class:`zipfile.ZipInfo` for the member, its
+                 compressed data and the digest for RECORD.
+        """
+        if data is None:
+            st = os.stat(p)
+            date_time = time.localtime(st.st_mtime)[:6]
+            mode = st.st_mode
+            if is_script:
+                with open(p, 'rb') as f:
+                    data = self.process_shebang(f.read())
+        else:
+            mode = 0o100644
+        zinfo = zipfile.ZipInfo(ap, date_time)
+        zinfo.external_attr = (mode & 0xFFFF) << 16
+        if ap.lower().endswith(self.stored_extensions):
+            zinfo.compress_type = zipfile.ZIP_STORED
+            compressor = None
+        else:
+            zinfo.compress_type = zipfile.ZIP_DEFLATED
+            if compresslevel is None:
+                compresslevel = zlib.Z_DEFAULT_COMPRESSION
+            compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -15)
+        hasher = self._get_hasher(self.hash_kind)
+        crc = size = 0
+        chunks = []
+
+        def process(chunk):
+            hasher.update(chunk)
+            chunks.append(compressor.compress(chunk) if compressor else chunk)
+            return zlib.crc32(chunk, crc), size + len(chunk)
+
+        if data is not None:
+            crc, size = process(data)
+        else:
+            with open(p, 'rb') as f:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    crc, size = process(chunk)
+        if compressor:
+            chunks.append(compressor.flush())
+        zinfo.CRC = crc & 0xFFFFFFFF
+        zinfo.file_size = size
+        digest = '%s=%s' % (self.hash_kind, self._encode_digest(hasher.digest()))
+        return zinfo, b''.join(chunks), digest
+
+    def _get_record_data(self, records):
+        if sys.version_info[0] < 3:
+            stream = io.BytesIO()
+        else:
+            stream = io.StringIO()
+        with CSVWriter(stream=stream) as writer:
+            for row in records:
+                writer.writerow(row)
+            result = stream.getvalue()
+        if not isinstance(result, bytes):
+            result = result.encode('utf-8')
+        return result
+
+    def _write_archive(self, pathname, members, record_ap, scripts=(), compresslevel=None, max_workers=1,
+                       source=None, copied=None):
+        """
+        Write a wheel, hashing each member while compressing it, and then add
+        a RECORD containing the computed hashes.
+
+        :param pathname: The path of the wheel to write.
+        :param members: A list of (archive_path, path, data) tuples, in the
+                        order in which they're to be written. If data is not
+                        ``None``, it's the contents of the member, which are
+                        otherwise read from the filesystem path.
+        :param record_ap: The archive path for RECORD.
+        :param scripts: Archive paths of scripts whose shebangs are to be
+                        processed.
+        :param compresslevel: The zlib compression level to use.
+        :param max_workers: The number of threads to use for compression, as
+                            for :func:`~distlib.util.thread_map`.
+        :param source: A :class:`_WheelZipFile` from which members can be
+                       copied.
+        :param copied: A dictionary mapping archive paths of members to be
+                       copied unchanged from ``source`` to tuples of their
+                       :class:`zipfile.ZipInfo` and RECORD row.
+        """
+        copied = copied or {}
+        # Members which don't come from files get the timestamp of the newest
+        # file, so that rebuilding from the same files gives the same result.
+        mtimes = [os.path.getmtime(p) for ap, p, data in members if data is None]
+        if mtimes:
+            date_time = time.localtime(max(mtimes))[:6]
+        else:
+            date_time = time.localtime()[:6]
+
+        def get_batches():
+            # Members are compressed (possibly in parallel, as zlib releases
+            # the GIL) a batch at a time, and are kept in memory until they're
+            # written. To limit memory use, a batch ends once its members'
+            # total size reaches BATCH_SIZE - or, when not using threads,
+            # after each member.
+            parallel = max_workers is None or max_workers > 1
+            batch = []
+            size = 0
+            for member in members:
+                ap, p, data = member
+                batch.append(member)
+                if ap not in copied:
+                    size += os.path.getsize(p) if data is None else len(data)
+                if not parallel or size >= BATCH_SIZE:
+                    yield batch
+                    batch = []
+                    size = 0
+            if batch:
+                yield batch
+
+        def compress(member):
+            ap, p, data = member
+            if ap in copied:
+                return None
+            return self._compress_member(ap, p, data, date_time, ap in scripts, compresslevel)
+
+        records = []
+        with _WheelZipFile(pathname, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for batch in get_batches():
+                # Members are written in their original order, so the result
+                # doesn't depend on the number of threads used.
+                results = thread_map(compress, batch, max_workers)
+                for (ap, p, data), result in zip(batch, results):
+                    if result is None:
+                        zinfo, row = copied[ap]
+                        logger.debug('Copied %s in wheel', ap)
+                        zf.copy_raw(source, zinfo)
+                        records.append(row)
+                        continue
+                    zinfo, raw, digest = result
+                    logger.debug('Wrote %s to %s in wheel', p, ap)
+                    zf.write_raw(zinfo, raw)
+                    records.append((ap, digest, zinfo.file_size))
+            records.append((record_ap, '', ''))
+            data = self._get_record_data(records)
+            zinfo, raw, _ = self._compress_member(record_ap, None, data, date_time, compresslevel=compresslevel)
+            zf.write_raw(zinfo, raw)
+
+    def build(self, paths, tags=None, wheel_version=None, compresslevel=None, max_workers=_MISSING):
         """
         Build a wheel from files in specified paths, and use any specified tags
         when determining the name of the wheel.
+
+        Each file is read just once, being hashed as it's compressed. Scripts
+        have their shebang lines processed in memory, and RECORD and WHEEL are
+        generated in memory, so the files in the specified paths aren't
+        changed. If specified, ``compresslevel`` is the zlib compression level
+        to use. Files whose extensions are in ``stored_extensions`` are usually
+        already compressed, so they're stored without compression.
+
+        Members can be compressed using a pool of ``max_workers`` threads; if
+        not specified, the ``max_workers`` attribute is used. As for
+        :func:`~distlib.util.thread_map`, ``None`` means a default based on the
+        number of CPUs. The result is the same however many threads are used.
         """
         if tags is None:
             tags = {}
@@ -398,6 +1157,7 @@ class Wheel(object):
         info_dir = '%s.dist-info' % name_ver
 
         archive_paths = []
+        scripts = set()
 
         # First, stuff which is not in site-packages
         for key in ('data', 'headers', 'scripts'):
@@ -410,13 +1170,9 @@ class Wheel(object):
                         p = fsdecode(os.path.join(root, fn))
                         rp = os.path.relpath(p, path)
                         ap = to_posix(os.path.join(data_dir, key, rp))
-                        archive_paths.append((ap, p))
+                        archive_paths.append((ap, p, None))
                         if key == 'scripts' and not p.endswith('.exe'):
-                            with open(p, 'rb') as f:
-                                data = f.read()
-                            data = self.process_shebang(data)
-                            with open(p, 'wb') as f:
-                                f.write(data)
+                            scripts.add(ap)
 
         # Now, stuff which is in site-packages, other than the
         # distinfo stuff.
@@ -440,7 +1196,7 @@ class Wheel(object):
                     continue
                 p = os.path.join(root, fn)
                 rp = to_posix(os.path.relpath(p, path))
-                archive_paths.append((rp, p))
+                archive_paths.append((rp, p, None))
 
         # Now distinfo. It may contain subdirectories (e.g. PEP 639)
         for root, _, files in os.walk(distinfo):
@@ -449,7 +1205,7 @@ class Wheel(object):
                     p = fsdecode(os.path.join(root, fn))
                     r = os.path.relpath(root, distinfo)
                     ap = to_posix(os.path.normpath(os.path.join(info_dir, r, fn)))
-                    archive_paths.append((ap, p))
+                    archive_paths.append((ap, p, None))
 
         wheel_metadata = [
             'Wheel-Version: %d.%d' % (wheel_version or self.wheel_version),
@@ -460,11 +1216,8 @@ class Wheel(object):
             wheel_metadata.append('Build: %s' % self.buildver)
         for pyver, abi, arch in self.tags:
             wheel_metadata.append('Tag: %s-%s-%s' % (pyver, abi, arch))
-        p = os.path.join(distinfo, 'WHEEL')
-        with open(p, 'w') as f:
-            f.write('\n'.join(wheel_metadata))
         ap = to_posix(os.path.join(info_dir, 'WHEEL'))
-        archive_paths.append((ap, p))
+        archive_paths.append((ap, None, '\n'.join(wheel_metadata).encode('utf-8')))
 
         # sort the entries by archive path. Not needed by any spec, but it
         # keeps the archive listing and RECORD tidier than they would otherwise
@@ -479,12 +1232,13 @@ class Wheel(object):
 
         archive_paths = sorted(archive_paths, key=sorter)
 
-        # Now, at last, RECORD.
+        # Now, ready to build the zip file. RECORD is added at the end.
         # Paths in here are archive paths - nothing else makes sense.
-        self.write_records((distinfo, info_dir), libdir, archive_paths)
-        # Now, ready to build the zip file
         pathname = os.path.join(self.dirname, self.filename)
-        self.build_zip(pathname, archive_paths)
+        record_ap = to_posix(os.path.join(info_dir, 'RECORD'))
+        if max_workers is _MISSING:
+            max_workers = self.max_workers
+        self._write_archive(pathname, archive_paths, record_ap, scripts, compresslevel, max_workers)
         return pathname
 
     def skip_entry(self, arcname):
@@ -514,233 +1268,225 @@ class Wheel(object):
         installed, and the headers, scripts, data and dist-info metadata are
         not written. If kwarg ``bytecode_hashed_invalidation`` is True, written
         bytecode will try to use file-hash based invalidation (PEP-552) on
-        supported interpreter versions (CPython 3.7+).
+        supported interpreter versions (CPython 3.7+). If kwarg ``link_cache``
+        is True, the wheel is unpacked into a cache keyed by the wheel's
+        SHA-256 digest (if not already there), and files are installed from
+        the cache as hard links, or as copy-on-write clones or copies where
+        hard links can't be made. Files which are generated or rewritten during
+        installation, such as scripts and the contents of .dist-info, are
+        written normally.
 
         The return value is a :class:`InstalledDistribution` instance unless
         ``options.lib_only`` is True, in which case the return value is ``None``.
         """
+        return install_wheels([self], paths, maker, **kwargs)[0]
 
-        dry_run = maker.dry_run
-        warner = kwargs.get('warner')
-        lib_only = kwargs.get('lib_only', False)
-        bc_hashed_invalidation = kwargs.get('bytecode_hashed_invalidation', False)
+    def _get_install_plan(self, zf, paths, lib_only=False, warner=None):
+        """
+        Work out where each member of the wheel will be installed, without
+        writing anything.
 
-        pathname = os.path.join(self.dirname, self.filename)
+        :return: A tuple of the parsed ``WHEEL`` metadata, the library
+                 directory and a list of ``(zinfo, row, outfile, is_script)``
+                 tuples, one for each member to be verified. The ``outfile``
+                 is ``None`` for members which are verified but not installed.
+        """
         name_ver = '%s-%s' % (self.name, self.version)
         data_dir = '%s.data' % name_ver
         info_dir = '%s.dist-info' % name_ver
 
-        metadata_name = posixpath.join(info_dir, LEGACY_METADATA_FILENAME)
         wheel_metadata_name = posixpath.join(info_dir, 'WHEEL')
         record_name = posixpath.join(info_dir, 'RECORD')
 
-        wrapper = codecs.getreader('utf-8')
+        with zf.open(wheel_metadata_name) as bwf:
+            wf = codecs.getreader('utf-8')(bwf)
+            message = message_from_file(wf)
+        wv = message['Wheel-Version'].split('.', 1)
+        file_version = tuple([int(i) for i in wv])
+        if (file_version != self.wheel_version) and warner:
+            warner(self.wheel_version, file_version)
 
-        with ZipFile(pathname, 'r') as zf:
-            with zf.open(wheel_metadata_name) as bwf:
-                wf = wrapper(bwf)
-                message = message_from_file(wf)
-            wv = message['Wheel-Version'].split('.', 1)
-            file_version = tuple([int(i) for i in wv])
-            if (file_version != self.wheel_version) and warner:
-                warner(self.wheel_version, file_version)
-
-            if message['Root-Is-Purelib'] == 'true':
-                libdir = paths['purelib']
-            else:
-                libdir = paths['platlib']
-
-            records = {}
-            with zf.open(record_name) as bf:
-                with CSVReader(stream=bf) as reader:
-                    for row in reader:
-                        p = row[0]
-                        records[p] = row
-
-            data_pfx = posixpath.join(data_dir, '')
-            info_pfx = posixpath.join(info_dir, '')
-            script_pfx = posixpath.join(data_dir, 'scripts', '')
-
-            # make a new instance rather than a copy of maker's,
-            # as we mutate it
-            fileop = FileOperator(dry_run=dry_run)
-            fileop.record = True  # so we can rollback if needed
-
-            bc = not sys.dont_write_bytecode  # Double negatives. Lovely!
-
-            outfiles = []  # for RECORD writing
-
-            # for script copying/shebang processing
-            workdir = tempfile.mkdtemp()
-            # set target dir later
-            # we default add_launchers to False, as the
-            # Python Launcher should be used instead
-            maker.source_dir = workdir
-            maker.target_dir = None
-            try:
-                for zinfo in zf.infolist():
-                    arcname = zinfo.filename
-                    if isinstance(arcname, text_type):
-                        u_arcname = arcname
-                    else:
-                        u_arcname = arcname.decode('utf-8')
-                    if self.skip_entry(u_arcname):
-                        continue
-                    row = records[u_arcname]
-                    if row[2] and str(zinfo.file_size) != row[2]:
-                        raise DistlibException('size mismatch for '
-                                               '%s' % u_arcname)
-                    if row[1]:
-                        kind, value = row[1].split('=', 1)
-                        with zf.open(arcname) as bf:
-                            data = bf.read()
-                        _, digest = self.get_hash(data, kind)
-                        if digest != value:
-                            raise DistlibException('digest mismatch for '
-                                                   '%s' % arcname)
-
-                    if lib_only and u_arcname.startswith((info_pfx, data_pfx)):
-                        logger.debug('lib_only: skipping %s', u_arcname)
-                        continue
-                    is_script = (u_arcname.startswith(script_pfx) and not u_arcname.endswith('.exe'))
+        if message['Root-Is-Purelib'] == 'true':
+            libdir = paths['purelib']
+        else:
+            libdir = paths['platlib']
 
-                    if u_arcname.startswith(data_pfx):
-                        _, where, rp = u_arcname.split('/', 2)
-                        base = paths[where]
-                        cp = convert_path(rp)
-                    else:
-                        # meant for site-packages.
-                        if u_arcname in (wheel_metadata_name, record_name):
-                            continue
-                        base = libdir
-                        cp = convert_path(u_arcname)
-                    # outfile = os.path.join(base, cp)
-                    outfile = os.path.abspath(os.path.join(base, cp))
-                    if not is_in_directory(outfile, base):
-                        raise DistlibException('Wheel member escapes installation directory: %r' % cp)
-                    if not is_script:
-                        with zf.open(arcname) as bf:
-                            fileop.copy_stream(bf, outfile)
-                        # Issue #147: permission bits aren't preserved. Using
-                        # zf.extract(zinfo, libdir) should have worked, but didn't,
-                        # see https://www.thetopsites.net/article/53834422.shtml
-                        # So ... manually preserve permission bits as given in zinfo
-                        if os.name == 'posix':
-                            # just set the normal permission bits
-                            os.chmod(outfile, (zinfo.external_attr >> 16) & 0x1FF)
-                        outfiles.append(outfile)
-                        # Double check the digest of the written file
-                        if not dry_run and row[1]:
-                            with open(outfile, 'rb') as bf:
-                                data = bf.read()
-                                _, newdigest = self.get_hash(data, kind)
-                                if newdigest != digest:
-                                    raise DistlibException('digest mismatch '
-                                                           'on write for '
-                                                           '%s' % outfile)
-                        if bc and outfile.endswith('.py'):
-                            try:
-                                pyc = fileop.byte_compile(outfile, hashed_invalidation=bc_hashed_invalidation)
-                                outfiles.append(pyc)
-                            except Exception:
-                                # Don't give up if byte-compilation fails,
-                                # but log it and perhaps warn the user
-                                logger.warning('Byte-compilation failed', exc_info=True)
-                    else:
-                        fn = os.path.basename(convert_path(arcname))
-                        workname = os.path.join(workdir, fn)
-                        with zf.open(arcname) as bf:
-                            fileop.copy_stream(bf, workname)
-
-                        dn, fn = os.path.split(outfile)
-                        maker.target_dir = dn
-                        filenames = maker.make(fn)
-                        fileop.set_executable_mode(filenames)
-                        outfiles.extend(filenames)
+        records = self._read_record(zf, record_name)
+
+        data_pfx = posixpath.join(data_dir, '')
+        info_pfx = posixpath.join(info_dir, '')
+        script_pfx = posixpath.join(data_dir, 'scripts', '')
 
-                if lib_only:
-                    logger.debug('lib_only: returning None')
-                    dist = None
+        entries = []
+        for zinfo in zf.infolist():
+            arcname = zinfo.filename
+            if isinstance(arcname, text_type):
+                u_arcname = arcname
+            else:
+                u_arcname = arcname.decode('utf-8')
+            if self.skip_entry(u_arcname):
+                continue
+            row = records[u_arcname]
+            if row[2] and str(zinfo.file_size) != row[2]:
+                raise DistlibException('size mismatch for '
+                                       '%s' % u_arcname)
+            outfile = None
+            is_script = False
+            if lib_only and u_arcname.startswith((info_pfx, data_pfx)):
+                logger.debug('lib_only: skipping %s', u_arcname)
+            elif u_arcname not in (wheel_metadata_name, record_name):
+                is_script = (u_arcname.startswith(script_pfx) and not u_arcname.endswith('.exe'))
+                if u_arcname.startswith(data_pfx):
+                    _, where, rp = u_arcname.split('/', 2)
+                    base = paths[where]
+                    cp = convert_path(rp)
                 else:
-                    # Generate scripts
-
-                    # Try to get pydist.json so we can see if there are
-                    # any commands to generate. If this fails (e.g. because
-                    # of a legacy wheel), log a warning but don't give up.
-                    commands = None
-                    file_version = self.info['Wheel-Version']
-                    if file_version == '1.0':
-                        # Use legacy info
-                        ep = posixpath.join(info_dir, 'entry_points.txt')
-                        try:
-                            with zf.open(ep) as bwf:
-                                epdata = read_exports(bwf)
-                            commands = {}
-                            for key in ('console', 'gui'):
-                                k = '%s_scripts' % key
-                                if k in epdata:
-                                    commands['wrap_%s' % key] = d = {}
-                                    for v in epdata[k].values():
-                                        s = '%s:%s' % (v.prefix, v.suffix)
-                                        if v.flags:
-                                            s += ' [%s]' % ','.join(v.flags)
-                                        d[v.name] = s
-                        except Exception:
-                            logger.warning('Unable to read legacy script '
-                                           'metadata, so cannot generate '
-                                           'scripts')
-                    else:
-                        try:
-                            with zf.open(metadata_name) as bwf:
-                                wf = wrapper(bwf)
-                                commands = json.load(wf).get('extensions')
-                                if commands:
-                                    commands = commands.get('python.commands')
-                        except Exception:
-                            logger.warning('Unable to read JSON metadata, so '
-                                           'cannot generate scripts')
+                    # meant for site-packages.
+                    base = libdir
+                    cp = convert_path(u_arcname)
+                outfile = os.path.abspath(os.path.join(base, cp))
+                if not is_in_directory(outfile, base):
+                    raise DistlibException('Wheel member escapes installation directory: %r' % cp)
+            entries.append((zinfo, row, outfile, is_script))
+        return message, libdir, entries
+
+    def _install_member(self, zf, zinfo, row, outfile, fileop, cache_dir=None):
+        """
+        Verify a wheel member against its RECORD entry and, unless ``outfile``
+        is ``None``, write it to ``outfile``. If ``cache_dir`` is specified, it
+        is a directory where the wheel has already been unpacked (and verified),
+        and ``outfile`` is linked to the unpacked file rather than extracted.
+
+        The member is read just once, being hashed as it's written. The return
+        value is a tuple of the hash and size of what was written, in the form
+        used in the RECORD of an installed distribution, so that the written
+        file doesn't need to be read again when RECORD is written. If they
+        aren't known, or ``outfile`` is ``None``, ``None`` is returned.
+        """
+        record_kind = InstalledDistribution.hasher
+        if cache_dir is not None and outfile is not None:
+            # Files in .dist-info (such as SHARED) may be rewritten after
+            # installation, so they mustn't share contents with the cache.
+            info_pfx = '%s-%s.dist-info/' % (self.name, self.version)
+            if not row[0].startswith(info_pfx):
+                fileop.link_file(os.path.join(cache_dir, convert_path(row[0])), outfile)
+                # The cached file was checked against RECORD when unpacked.
+                if row[1].startswith(record_kind + '=') and row[2]:
+                    return row[1], row[2]
+                return None
+        arcname = zinfo.filename
+        hashers = {}
+        if row[1]:
+            kind, value = row[1].split('=', 1)
+            hashers[kind] = self._get_hasher(kind)
+        if outfile is not None and record_kind not in hashers:
+            hashers[record_kind] = self._get_hasher(record_kind)
+        with zf.open(arcname) as bf:
+            reader = _HashingReader(bf, hashers.values())
+            if outfile is not None:
+                fileop.copy_stream(reader, outfile)
+            reader.drain()  # in case not all read, e.g. in dry-run mode
+        if row[1]:
+            digest = self._encode_digest(hashers[kind].digest())
+            if digest != value:
+                raise DistlibException('digest mismatch for '
+                                       '%s' % arcname)
+        result = None
+        if outfile is not None:
+            # Issue #147: permission bits aren't preserved. Using
+            # zf.extract(zinfo, libdir) should have worked, but didn't,
+            # see https://www.thetopsites.net/article/53834422.shtml
+            # So ... manually preserve permission bits as given in zinfo
+            if os.name == 'posix' and not fileop.dry_run:
+                # just set the normal permission bits
+                os.chmod(outfile, (zinfo.external_attr >> 16) & 0x1FF)
+            digest = self._encode_digest(hashers[record_kind].digest())
+            result = '%s=%s' % (record_kind, digest), '%d' % reader.size
+        return result
+
+    def _finish_install(self, zf, message, libdir, paths, maker, fileop, outfiles, digests=None):
+        """
+        Generate any scripts declared in the wheel's metadata, then write the
+        SHARED and RECORD files for the installed distribution. If specified,
+        ``digests`` maps installed files to their already-computed hashes and
+        sizes, which are used when writing RECORD.
+        """
+        dry_run = fileop.dry_run
+        name_ver = '%s-%s' % (self.name, self.version)
+        info_dir = '%s.dist-info' % name_ver
+        metadata_name = posixpath.join(info_dir, LEGACY_METADATA_FILENAME)
+
+        # Try to get pydist.json so we can see if there are
+        # any commands to generate. If this fails (e.g. because
+        # of a legacy wheel), log a warning but don't give up.
+        commands = None
+        file_version = message['Wheel-Version']
+        if file_version == '1.0':
+            # Use legacy info
+            ep = posixpath.join(info_dir, 'entry_points.txt')
+            try:
+                with zf.open(ep) as bwf:
+                    epdata = read_exports(bwf)
+                commands = {}
+                for key in ('console', 'gui'):
+                    k = '%s_scripts' % key
+                    if k in epdata:
+                        commands['wrap_%s' % key] = d = {}
+                        for v in epdata[k].values():
+                            s = '%s:%s' % (v.prefix, v.suffix)
+                            if v.flags:
+                                s += ' [%s]' % ','.join(v.flags)
+                            d[v.name] = s
+            except Exception:
+                logger.warning('Unable to read legacy script '
+                               'metadata, so cannot generate '
+                               'scripts')
+        else:
+            try:
+                with zf.open(metadata_name) as bwf:
+                    wf = codecs.getreader('utf-8')(bwf)
+                    commands = json.load(wf).get('extensions')
                     if commands:
-                        console_scripts = commands.get('wrap_console', {})
-                        gui_scripts = commands.get('wrap_gui', {})
-                        if console_scripts or gui_scripts:
-                            script_dir = paths.get('scripts', '')
-                            if not os.path.isdir(script_dir):
-                                raise ValueError('Valid script path not '
-                                                 'specified')
-                            maker.target_dir = script_dir
-                            for k, v in console_scripts.items():
-                                script = '%s = %s' % (k, v)
-                                filenames = maker.make(script)
-                                fileop.set_executable_mode(filenames)
-
-                            if gui_scripts:
-                                options = {'gui': True}
-                                for k, v in gui_scripts.items():
-                                    script = '%s = %s' % (k, v)
-                                    filenames = maker.make(script, options)
-                                    fileop.set_executable_mode(filenames)
-
-                    p = os.path.join(libdir, info_dir)
-                    dist = InstalledDistribution(p)
-
-                    # Write SHARED
-                    paths = dict(paths)  # don't change passed in dict
-                    del paths['purelib']
-                    del paths['platlib']
-                    paths['lib'] = libdir
-                    p = dist.write_shared_locations(paths, dry_run)
-                    if p:
-                        outfiles.append(p)
-
-                    # Write RECORD
-                    dist.write_installed_files(outfiles, paths['prefix'], dry_run)
-                return dist
-            except Exception:  # pragma: no cover
-                logger.exception('installation failed.')
-                fileop.rollback()
-                raise
-            finally:
-                shutil.rmtree(workdir)
+                        commands = commands.get('python.commands')
+            except Exception:
+                logger.warning('Unable to read JSON metadata, so '
+                               'cannot generate scripts')
+        if commands:
+            console_scripts = commands.get('wrap_console', {})
+            gui_scripts = commands.get('wrap_gui', {})
+            if console_scripts or gui_scripts:
+                script_dir = paths.get('scripts', '')
+                if not os.path.isdir(script_dir):
+                    raise ValueError('Valid script path not '
+                                     'specified')
+                maker.target_dir = script_dir
+                for k, v in console_scripts.items():
+                    script = '%s = %s' % (k, v)
+                    filenames = maker.make(script)
+                    fileop.set_executable_mode(filenames)
+
+                if gui_scripts:
+                    options = {'gui': True}
+                    for k, v in gui_scripts.items():
+                        script = '%s = %s' % (k, v)
+                        filenames = maker.make(script, options)
+                        fileop.set_executable_mode(filenames)
+
+        p = os.path.join(libdir, info_dir)
+        dist = InstalledDistribution(p)
+
+        # Write SHARED
+        paths = dict(paths)  # don't change passed in dict
+        del paths['purelib']
+        del paths['platlib']
+        paths['lib'] = libdir
+        p = dist.write_shared_locations(paths, dry_run)
+        if p:
+            outfiles.append(p)
+
+        # Write RECORD
+        dist.write_installed_files(outfiles, paths['prefix'], dry_run, digests)
+        return dist
 
     def _get_dylib_cache(self):
         global cache
@@ -750,46 +1496,172 @@ class Wheel(object):
             cache = Cache(base)
         return cache
 
-    def _get_extensions(self):
+    def _get_wheel_cache(self):
+        global wheel_cache
+        if wheel_cache is None:
+            # Use native string to avoid issues on 2.x: see Python #20140.
+            base = os.path.join(get_cache_base(), str('wheel-cache'))
+            wheel_cache = Cache(base)
+        return wheel_cache
+
+    def _unpack_to_cache(self, zf, entries):
+        """
+        Return the directory in the unpacked-wheel cache which holds the
+        contents of this wheel, unpacking (and verifying) the wheel there first
+        if needed. The cache is keyed by the SHA-256 digest of the wheel file,
+        so wheels with the same filename but different contents don't collide.
+
+        :param zf: The open wheel.
+        :param entries: The entries returned by :meth:`_get_install_plan`.
+        """
         pathname = os.path.join(self.dirname, self.filename)
+        hasher = hashlib.sha256()
+        with open(pathname, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        cache = self._get_wheel_cache()
+        result = os.path.join(cache.base, digest[:2], digest[2:])
+        if not os.path.isdir(result):
+            parent = os.path.dirname(result)
+            try:
+                os.makedirs(parent)
+            except OSError:
+                if not os.path.isdir(parent):
+                    raise
+            # Unpack to a temporary name and then rename, so that other
+            # processes never see a partially unpacked wheel.
+            workdir = tempfile.mkdtemp(prefix='.unpack-', dir=parent)
+            try:
+                fileop = FileOperator()
+                for zinfo, row, outfile, is_script in entries:
+                    dest = os.path.join(workdir, convert_path(row[0]))
+                    if not is_in_directory(dest, workdir):
+                        raise DistlibException('Wheel member escapes installation directory: %r' % row[0])
+                    self._install_member(zf, zinfo, row, dest, fileop)
+                try:
+                    os.rename(workdir, result)
+                except OSError:
+                    # Another process may have got there first.
+                    if not os.path.isdir(result):
+                        raise
+            finally:
+                if os.path.isdir(workdir):
+                    shutil.rmtree(workdir)
+        return result
+
+    def _extract_extension(self, zf, arcname, dest, kind=None, value=None):
+        """
+        Extract an extension to ``dest``, via a temporary file which is then
+        renamed, so that other processes never see a partially written file.
+        If ``kind`` is specified, the extension's digest is checked against
+        ``value`` before it's put in place.
+        """
+        dn = os.path.dirname(dest)
+        if not os.path.isdir(dn):
+            try:
+                os.makedirs(dn)
+            except OSError:  # pragma: no cover
+                if not os.path.isdir(dn):  # not just another process creating it
+                    raise
+        fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=dn)
+        try:
+            hasher = self._get_hasher(kind) if kind else None
+            with os.fdopen(fd, 'wb') as f:
+                with zf.open(arcname) as bf:
+                    while True:
+                        chunk = bf.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        if hasher:
+                            hasher.update(chunk)
+                        f.write(chunk)
+            if hasher and self._encode_digest(hasher.digest()) != value:
+                raise DistlibException('digest mismatch for %s' % arcname)
+            os.chmod(tmp, 0o755)
+            try:
+                os.rename(tmp, dest)
+            except OSError:  # pragma: no cover
+                # On Windows, rename fails if dest exists. If so, another
+                # process got there first (or it's the old file in use).
+                if not os.path.exists(dest):
+                    raise
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _get_extensions(self):
         name_ver = '%s-%s' % (self.name, self.version)
         info_dir = '%s.dist-info' % name_ver
         arcname = posixpath.join(info_dir, 'EXTENSIONS')
+        record_name = posixpath.join(info_dir, 'RECORD')
         wrapper = codecs.getreader('utf-8')
         result = []
-        with ZipFile(pathname, 'r') as zf:
+        with self._archive() as zf:
             try:
                 with zf.open(arcname) as bf:
                     wf = wrapper(bf)
                     extensions = json.load(wf)
                     cache = self._get_dylib_cache()
-                    prefix = cache.prefix_to_dir(self.filename, use_abspath=False)
-                    cache_base = os.path.join(cache.base, prefix)
-                    if not os.path.isdir(cache_base):
-                        os.makedirs(cache_base)
-                    for name, relpath in extensions.items():
+                    try:
+                        records = self._read_record(zf, record_name)
+                    except KeyError:
+                        records = {}
+                    for relpath in extensions.values():
                         # See verify()/update(): reject any '..' in the
-                        # directory portions of the entry, then confine the
-                        # resolved destination to the cache directory so a
+                        # directory portions of the entry, and below, confine
+                        # the resolved destination to the cache directory so a
                         # crafted EXTENSIONS entry cannot point _load_dynamic
                         # at a path outside the dylib cache.
                         if '..' in relpath.split('/'):
                             raise DistlibException('invalid extension entry '
                                                    'in wheel: %r' % relpath)
+                    # If all the extensions (including any libraries they
+                    # link to) have hashes in RECORD, the wheel's extensions
+                    # go in a directory keyed by those hashes, keeping their
+                    # relative layout (which $ORIGIN RPATHs may depend on).
+                    # Wheels with the same extensions share the directory,
+                    # and existing files must have the right contents, so
+                    # there's no need to look at the archive members.
+                    hashes = {}
+                    for relpath in extensions.values():
+                        row = records.get(relpath)
+                        if not row or len(row) < 2 or not re.match(r'^\w+=[\w-]+$', row[1]):
+                            hashes = None
+                            break
+                        hashes[relpath] = row[1]
+                    if hashes:
+                        hasher = hashlib.sha256()
+                        for relpath in sorted(hashes):
+                            hasher.update(('%s,%s\n' % (relpath, hashes[relpath])).encode('utf-8'))
+                        key = hasher.hexdigest()
+                        cache_base = os.path.join(cache.base, 'by-hash', key[:2], key[2:])
+                    else:
+                        prefix = cache.prefix_to_dir(self.filename, use_abspath=False)
+                        cache_base = os.path.join(cache.base, prefix)
+                    for name, relpath in extensions.items():
                         dest = os.path.join(cache_base, convert_path(relpath))
                         if not is_in_directory(dest, cache_base):
                             raise DistlibException('extension escapes dylib '
                                                    'cache: %r' % relpath)
-                        if not os.path.exists(dest):
-                            extract = True
+                        if hashes:
+                            if not os.path.exists(dest):
+                                kind, value = hashes[relpath].split('=', 1)
+                                self._extract_extension(zf, relpath, dest, kind, value)
                         else:
-                            file_time = os.stat(dest).st_mtime
-                            file_time = datetime.datetime.fromtimestamp(file_time)
-                            info = zf.getinfo(relpath)
-                            wheel_time = datetime.datetime(*info.date_time)
-                            extract = wheel_time > file_time
-                        if extract:
-                            zf.extract(relpath, cache_base)
+                            if not os.path.exists(dest):
+                                extract = True
+                            else:
+                                file_time = os.stat(dest).st_mtime
+                                file_time = datetime.datetime.fromtimestamp(file_time)
+                                info = zf.getinfo(relpath)
+                                wheel_time = datetime.datetime(*info.date_time)
+                                extract = wheel_time > file_time
+                            if extract:
+                                self._extract_extension(zf, relpath, dest)
                         result.append((name, dest))
             except KeyError:
                 pass
@@ -807,7 +1679,38 @@ class Wheel(object):
         """
         return True  # for now - metadata details TBD
 
-    def mount(self, append=False):
+    def _get_module_index(self, zf):
+        """
+        Return a dictionary mapping the names of the modules and packages in
+        a wheel to tuples of their archive paths and kinds ('module',
+        'package' or 'namespace', the archive path of a namespace package
+        being its directory).
+        """
+        index = {}
+        dirs = set()
+        for arcname in zf.namelist():
+            if not isinstance(arcname, text_type):
+                arcname = arcname.decode('utf-8')
+            if not arcname.endswith('.py'):
+                continue
+            parts = arcname[:-3].split('/')
+            if not all(part.isidentifier() for part in parts):
+                continue  # e.g. in .dist-info or .data
+            for i in range(1, len(parts)):
+                dirs.add('/'.join(parts[:i]))
+            if parts[-1] != '__init__':
+                index.setdefault('.'.join(parts), (arcname, 'module'))
+            elif len(parts) > 1:
+                # packages take precedence over modules of the same name
+                index['.'.join(parts[:-1])] = (arcname, 'package')
+        for d in dirs:
+            index.setdefault(d.replace('/', '.'), (d, 'namespace'))
+        return index
+
+    def _is_index_mounted(self, pathname):
+        return pathname in _prepend_finder.wheels or pathname in _append_finder.wheels
+
+    def mount(self, append=False, indexed=False):
         pathname = os.path.abspath(os.path.join(self.dirname, self.filename))
         if not self.is_compatible():
             msg = 'Wheel %s not compatible with this Python.' % pathname
@@ -815,8 +1718,22 @@ class Wheel(object):
         if not self.is_mountable():
             msg = 'Wheel %s is marked as not mountable.' % pathname
             raise DistlibException(msg)
-        if pathname in sys.path:
-            logger.debug('%s already in path', pathname)
+        if pathname in sys.path or self._is_index_mounted(pathname):
+            logger.debug('%s already mounted', pathname)
+        elif indexed and imp is None:
+            with self._archive() as zf:
+                index = self._get_module_index(zf)
+            for name, dest in self._get_extensions():
+                index[name] = (dest, 'extension')
+            # kept open for loading modules until unmounted
+            zf = _WheelZipFile(pathname, 'r')
+            if append:
+                finder = _append_finder
+                finder.add(pathname, zf, index, first=False)
+            else:
+                finder = _prepend_finder
+                finder.add(pathname, zf, index)
+            finder.install(append)
         else:
             if append:
                 sys.path.append(pathname)
@@ -830,6 +1747,12 @@ class Wheel(object):
 
     def unmount(self):
         pathname = os.path.abspath(os.path.join(self.dirname, self.filename))
+        for finder in (_prepend_finder, _append_finder):
+            if pathname in finder.wheels:
+                finder.remove(pathname)
+                if not finder.wheels and finder in sys.meta_path:
+                    sys.meta_path.remove(finder)
+                return
         if pathname not in sys.path:
             logger.debug('%s not in path', pathname)
         else:
@@ -840,8 +1763,43 @@ class Wheel(object):
                 if _hook in sys.meta_path:
                     sys.meta_path.remove(_hook)
 
-    def verify(self):
-        pathname = os.path.join(self.dirname, self.filename)
+    def _check_member(self, zf, arcname, kind=None, value=None):
+        """
+        Read a member of a wheel in chunks, which checks its CRC and, if
+        ``kind`` is specified, its digest against ``value``.
+        """
+        hasher = self._get_hasher(kind) if kind else None
+        try:
+            with zf.open(arcname) as bf:
+                while True:
+                    chunk = bf.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if hasher:
+                        hasher.update(chunk)
+        except zipfile.BadZipfile as e:
+            raise DistlibException('invalid data for %s: %s' % (arcname, e))
+        if hasher and self._encode_digest(hasher.digest()) != value:
+            raise DistlibException('digest mismatch for %s' % arcname)
+
+    def verify(self, level='hash', max_workers=1):
+        """
+        Verify the wheel's contents against its RECORD, raising a
+        :class:`DistlibException` if a problem is found.
+
+        :param level: How thoroughly to verify the wheel. With
+                      ``'structure'``, only the archive's central directory
+                      and RECORD are read, to check that entries have valid
+                      names, that every entry has a RECORD row (and vice
+                      versa) and that sizes match. With ``'crc'``, every
+                      entry is also read to check its CRC, and with
+                      ``'hash'`` (the default), its digest is also checked
+                      against RECORD.
+        :param max_workers: The number of threads to use to read entries, as
+                            for :func:`~distlib.util.thread_map`.
+        """
+        if level not in ('structure', 'crc', 'hash'):
+            raise DistlibException('Unknown verification level: %r' % level)
         name_ver = '%s-%s' % (self.name, self.version)
         # data_dir = '%s.data' % name_ver
         info_dir = '%s.dist-info' % name_ver
@@ -852,7 +1810,7 @@ class Wheel(object):
 
         wrapper = codecs.getreader('utf-8')
 
-        with ZipFile(pathname, 'r') as zf:
+        with self._archive() as zf:
             with zf.open(wheel_metadata_name) as bwf:
                 wf = wrapper(bwf)
                 message_from_file(wf)
@@ -860,19 +1818,17 @@ class Wheel(object):
             # file_version = tuple([int(i) for i in wv])
             # TODO version verification
 
-            records = {}
-            with zf.open(record_name) as bf:
-                with CSVReader(stream=bf) as reader:
-                    for row in reader:
-                        p = row[0]
-                        records[p] = row
+            records = self._read_record(zf, record_name)
 
+            to_check = []
+            seen = set()
             for zinfo in zf.infolist():
                 arcname = zinfo.filename
                 if isinstance(arcname, text_type):
                     u_arcname = arcname
                 else:
                     u_arcname = arcname.decode('utf-8')
+                seen.add(u_arcname)
                 # See issue #115: some wheels have .. in their entries, but
                 # in the filename ... e.g. __main__..py ! So the check is
                 # updated to look for .. in the directory portions
@@ -883,20 +1839,29 @@ class Wheel(object):
 
                 if self.skip_entry(u_arcname):
                     continue
-                row = records[u_arcname]
-                if row[2] and str(zinfo.file_size) != row[2]:
+                row = records.get(u_arcname)
+                if row is None:
+                    raise DistlibException('no RECORD entry for %s' % u_arcname)
+                if len(row) > 2 and row[2] and str(zinfo.file_size) != row[2]:
                     raise DistlibException('size mismatch for '
                                            '%s' % u_arcname)
-                if row[1]:
+                if level == 'hash' and len(row) > 1 and row[1]:
                     kind, value = row[1].split('=', 1)
-                    with zf.open(arcname) as bf:
-                        data = bf.read()
-                    _, digest = self.get_hash(data, kind)
-                    if digest != value:
-                        raise DistlibException('digest mismatch for '
-                                               '%s' % arcname)
+                    to_check.append((arcname, kind, value))
+                elif level != 'structure':
+                    to_check.append((arcname, None, None))
+            for u_arcname in records:
+                if u_arcname not in seen:
+                    raise DistlibException('RECORD entry for missing member '
+                                           '%s' % u_arcname)
 
-    def update(self, modifier, dest_dir=None, **kwargs):
+            def check(item):
+                arcname, kind, value = item
+                self._check_member(zf, arcname, kind, value)
+
+            thread_map(check, to_check, max_workers)
+
+    def update(self, modifier, dest_dir=None, copy_unchanged=False, **kwargs):
         """
         Update the contents of a wheel in a generic way. The modifier should
         be a callable which expects a dictionary argument: its keys are
@@ -911,6 +1876,15 @@ class Wheel(object):
 
         The modifier should return True if it updated the wheel, else False.
         This method returns the same value the modifier returns.
+
+        If ``copy_unchanged`` is true, entries which the modifier left alone
+        are copied to the new wheel in their compressed form, straight from
+        the original wheel, and their existing RECORD rows are reused. Only
+        modified or added entries are compressed and hashed. To tell which
+        entries were left alone, each extracted file is given its entry's
+        timestamp as its modification time, which a change to the file
+        replaces. Where that timestamp is too recent to be told apart from
+        the time of a change, the file is hashed and checked against RECORD.
         """
 
         def get_version(path_map, info_dir):
@@ -923,6 +1897,17 @@ class Wheel(object):
                 version = Metadata(path=path).version
             return version, path
 
+        def matches_record(path, row):
+            kind, value = row[1].split('=', 1)
+            hasher = self._get_hasher(kind)
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+            return self._encode_digest(hasher.digest()) == value
+
         def update_version(version, path):
             updated = None
             try:
@@ -949,8 +1934,12 @@ class Wheel(object):
         info_dir = '%s.dist-info' % name_ver
         record_name = posixpath.join(info_dir, 'RECORD')
         with tempdir() as workdir:
-            with ZipFile(pathname, 'r') as zf:
+            with self._archive() as zf:
                 path_map = {}
+                extracted = {}
+                # Timestamps later than this might not differ from the time
+                # of a change, given the granularity of some filesystems.
+                recent = time.time() - 2
                 for zinfo in zf.infolist():
                     arcname = zinfo.filename
                     if isinstance(arcname, text_type):
@@ -965,6 +1954,13 @@ class Wheel(object):
                     zf.extract(zinfo, workdir)
                     path = os.path.join(workdir, convert_path(u_arcname))
                     path_map[u_arcname] = path
+                    if copy_unchanged:
+                        mtime = time.mktime(zinfo.date_time + (0, 0, -1))
+                        os.utime(path, (mtime, mtime))
+                        st = os.stat(path)
+                        extracted[u_arcname] = (path, st.st_size, st.st_mtime, st.st_mtime > recent)
+                if copy_unchanged:
+                    records = self._read_record(zf, record_name)
 
             # Remember the version.
             original_version, _ = get_version(path_map, info_dir)
@@ -984,30 +1980,193 @@ class Wheel(object):
                     if not os.path.isdir(dest_dir):
                         raise DistlibException('Not a directory: %r' % dest_dir)
                     newpath = os.path.join(dest_dir, self.filename)
-                archive_paths = list(path_map.items())
-                distinfo = os.path.join(workdir, info_dir)
-                info = distinfo, info_dir
-                self.write_records(info, workdir, archive_paths)
-                self.build_zip(newpath, archive_paths)
+                archive_paths = [(ap, p, None) for ap, p in path_map.items()]
+                if not copy_unchanged:
+                    self._write_archive(newpath, archive_paths, record_name, max_workers=self.max_workers)
+                else:
+                    with self._archive() as zf:
+                        copied = {}
+                        for ap, p in path_map.items():
+                            if ap not in extracted or ap not in records:
+                                continue
+                            row = records[ap]
+                            if len(row) < 3 or not row[1] or not os.path.exists(p):
+                                continue
+                            xpath, size, mtime, check = extracted[ap]
+                            st = os.stat(p)
+                            if (p, st.st_size, st.st_mtime) != (xpath, size, mtime):
+                                continue
+                            if check and not matches_record(p, row):
+                                continue
+                            copied[ap] = (zf.getinfo(ap), row)
+                        self._write_archive(newpath,
+                                            archive_paths,
+                                            record_name,
+                                            max_workers=self.max_workers,
+                                            source=zf,
+                                            copied=copied)
                 if dest_dir is None:
                     shutil.copyfile(newpath, pathname)
+                    directory_cache.remove(pathname)
         return modified
 
 
+def install_wheels(wheels, paths, maker, **kwargs):
+    """
+    Install a number of wheels to the specified paths as a single operation.
+    The wheels are all opened and the locations of their files worked out
+    before anything is written, so that a file which would be installed by
+    more than one of the wheels can be reported without changing anything.
+    The wheels are then extracted in parallel, any bytecode is compiled once
+    all files are in place, and the metadata for each installed distribution
+    is written. If anything fails, all files written for all of the wheels are
+    removed.
+
+    The ``paths``, ``maker`` and keyword arguments are as for
+    :meth:`Wheel.install`, with the addition of kwarg ``max_workers``, which is
+    passed to :func:`~distlib.util.thread_map` to limit the number of wheels
+    extracted concurrently.
+
+    If kwarg ``link_cache`` is True, each wheel is unpacked once into a cache
+    shared between installations (see :meth:`Wheel.install`), and files are
+    installed from there as hard links or copy-on-write clones where possible.
+
+    The return value is a list with an entry for each wheel, in the order
+    passed in. Each entry is the corresponding :class:`InstalledDistribution`
+    instance, or ``None`` if ``lib_only`` is True.
+    """
+    dry_run = maker.dry_run
+    warner = kwargs.get('warner')
+    lib_only = kwargs.get('lib_only', False)
+    bc_hashed_invalidation = kwargs.get('bytecode_hashed_invalidation', False)
+    max_workers = kwargs.get('max_workers')
+    link_cache = kwargs.get('link_cache', False) and not dry_run
+
+    # make a new instance rather than a copy of maker's,
+    # as we mutate it
+    fileop = FileOperator(dry_run=dry_run)
+    fileop.record = True  # so we can rollback if needed
+
+    bc = not sys.dont_write_bytecode  # Double negatives. Lovely!
+
+    plans = []
+    owners = {}  # maps output files to the wheels which provide them
+
+    # for script copying/shebang processing
+    workdir = tempfile.mkdtemp()
+    # set target dir later
+    # we default add_launchers to False, as the
+    # Python Launcher should be used instead
+    maker.source_dir = workdir
+    maker.target_dir = None
+    try:
+        for wheel in wheels:
+            zf = wheel._open_archive()
+            plan = Container(wheel=wheel, zf=zf, outfiles=[], to_compile=[], digests={})
+            plans.append(plan)
+            # each wheel gets its own file operator, as they're extracted
+            # in parallel.
+            plan.fileop = FileOperator(dry_run=dry_run)
+            plan.fileop.record = True
+            plan.message, plan.libdir, plan.entries = wheel._get_install_plan(zf, paths, lib_only, warner)
+            for zinfo, row, outfile, is_script in plan.entries:
+                if outfile is None:
+                    continue
+                other = owners.setdefault(outfile, wheel)
+                if other is not wheel:
+                    raise DistlibException('%s would be installed by both %s and %s' %
+                                           (outfile, other.filename, wheel.filename))
+                if not is_script:
+                    # create directories up front, so that the threads
+                    # extracting the wheels don't race to create them.
+                    fileop.ensure_dir(os.path.dirname(outfile))
+
+        def extract(plan):
+            if not link_cache:
+                cache_dir = None
+            else:
+                cache_dir = plan.wheel._unpack_to_cache(plan.zf, plan.entries)
+            for zinfo, row, outfile, is_script in plan.entries:
+                if is_script:
+                    outfile = None  # handled below, using the maker
+                digest = plan.wheel._install_member(plan.zf, zinfo, row, outfile, plan.fileop, cache_dir)
+                if outfile is not None:
+                    plan.outfiles.append(outfile)
+                    if digest:
+                        plan.digests[outfile] = digest
+                    if bc and outfile.endswith('.py'):
+                        plan.to_compile.append(outfile)
+
+        thread_map(extract, plans, max_workers)
+
+        for plan in plans:
+            for zinfo, row, outfile, is_script in plan.entries:
+                if is_script:
+                    fn = os.path.basename(convert_path(zinfo.filename))
+                    workname = os.path.join(workdir, fn)
+                    with plan.zf.open(zinfo.filename) as bf:
+                        fileop.copy_stream(bf, workname)
+
+                    dn, fn = os.path.split(outfile)
+                    maker.target_dir = dn
+                    filenames = maker.make(fn)
+                    fileop.set_executable_mode(filenames)
+                    plan.outfiles.extend(filenames)
+
+        for plan in plans:
+            for outfile in plan.to_compile:
+                try:
+                    pyc = fileop.byte_compile(outfile, hashed_invalidation=bc_hashed_invalidation)
+                    plan.outfiles.append(pyc)
+                except Exception:
+                    # Don't give up if byte-compilation fails,
+                    # but log it and perhaps warn the user
+                    logger.warning('Byte-compilation failed', exc_info=True)
+
+        result = []
+        for plan in plans:
+            if lib_only:
+                logger.debug('lib_only: returning None')
+                dist = None
+            else:
+                dist = plan.wheel._finish_install(plan.zf, plan.message, plan.libdir, paths, maker, fileop,
+                                                  plan.outfiles, plan.digests)
+            result.append(dist)
+        return result
+    except BaseException:
+        logger.exception('installation failed.')
+        for plan in plans:
+            plan.fileop.rollback()
+        fileop.rollback()
+        raise
+    finally:
+        for plan in plans:
+            plan.wheel._close_archive(plan.zf)
+        shutil.rmtree(workdir)
+
+
+_glibc_version = None  # computed when needed
+
+
 def _get_glibc_version():
-    import platform
-    ver = platform.libc_ver()
-    result = []
-    if ver[0] == 'glibc':
-        for s in ver[1].split('.'):
-            result.append(int(s) if s.isdigit() else 0)
-        result = tuple(result)
-    return result
+    global _glibc_version
+
+    if _glibc_version is None:
+        import platform
+        ver = platform.libc_ver()
+        result = []
+        if ver[0] == 'glibc':
+            for s in ver[1].split('.'):
+                result.append(int(s) if s.isdigit() else 0)
+            result = tuple(result)
+        _glibc_version = result
+    return _glibc_version
 
 
-def compatible_tags():
+def _compatible_tags():
     """
-    Return (pyver, abi, arch) tuples compatible with this Python.
+    Return (pyver, abi, arch) tuples compatible with this Python, most
+    specific first.
     """
 
     class _Version:
@@ -1034,6 +2193,18 @@ def compatible_tags():
     result = []
 
     arches = [ARCH]
+    # The manylinux platforms compatible with this glibc (PEP 600), newest
+    # first, with the legacy aliases (PEPs 513, 571 and 599) after the
+    # versions they stand for. They're preferred to plain linux_<arch>.
+    manylinux = []
+    if sys.platform.startswith('linux'):
+        parts = _get_glibc_version()
+        if len(parts) >= 2 and parts[0] == 2:
+            aliases = {17: 'manylinux2014', 12: 'manylinux2010', 5: 'manylinux1'}
+            for minor in range(parts[1], 4, -1):
+                manylinux.append('manylinux_2_%s' % minor)
+                if minor in aliases:
+                    manylinux.append(aliases[minor])
     if sys.platform == 'darwin':
         m = re.match(r'(\w+)_(\d+)_(\d+)_(\w+)$', ARCH)
         if m:
@@ -1072,20 +2243,11 @@ def compatible_tags():
 
         for abi in add_abis:
             for arch in arches:
+                if abi != 'none' and arch.startswith('linux_'):
+                    base_arch = arch[len('linux_'):]
+                    for plat in manylinux:
+                        result.append((''.join((IMP_PREFIX, version)), abi, '%s_%s' % (plat, base_arch)))
                 result.append((''.join((IMP_PREFIX, version)), abi, arch))
-                # manylinux
-                if abi != 'none' and sys.platform.startswith('linux'):
-                    arch = arch.replace('linux_', '')
-                    parts = _get_glibc_version()
-                    if len(parts) == 2:
-                        if parts >= (2, 5):
-                            result.append((''.join((IMP_PREFIX, version)), abi, 'manylinux1_%s' % arch))
-                        if parts >= (2, 12):
-                            result.append((''.join((IMP_PREFIX, version)), abi, 'manylinux2010_%s' % arch))
-                        if parts >= (2, 17):
-                            result.append((''.join((IMP_PREFIX, version)), abi, 'manylinux2014_%s' % arch))
-                        result.append((''.join(
-                            (IMP_PREFIX, version)), abi, 'manylinux_%s_%s_%s' % (parts[0], parts[1], arch)))
 
     # where no ABI / arch dependency, but IMP_PREFIX dependency
     for i, version_object in enumerate(versions):
@@ -1101,12 +2263,104 @@ def compatible_tags():
         if i == 0:
             result.append((''.join(('py', version[0])), 'none', 'any'))
 
-    return set(result)
+    # remove duplicates, keeping the first (most specific) occurrence
+    seen = set()
+    return [tag for tag in result if not (tag in seen or seen.add(tag))]
 
 
-COMPATIBLE_TAGS = compatible_tags()
+_compatible = None  # computed when needed
+
+
+def _get_compatible():
+    """
+    Return the set of tags compatible with this Python and the dictionary
+    of their ranks, computing them on first use.
+    """
+    global _compatible
+
+    if _compatible is None:
+        tags = _compatible_tags()
+        _compatible = (set(tags), dict((tag, i) for i, tag in enumerate(tags)))
+    return _compatible
 
-del compatible_tags
+
+def __getattr__(name):
+    # Compute COMPATIBLE_TAGS and COMPATIBLE_TAG_RANKS lazily (PEP 562), as
+    # doing so involves probing the platform.
+    if name == 'COMPATIBLE_TAGS':
+        return _get_compatible()[0]
+    if name == 'COMPATIBLE_TAG_RANKS':
+        return _get_compatible()[1]
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+if sys.version_info[:2] < (3, 7):  # pragma: no cover
+    # No support for module __getattr__, so compute them now.
+    COMPATIBLE_TAGS, COMPATIBLE_TAG_RANKS = _get_compatible()
+
+
+def _get_tag_ranks(tags):
+    """
+    Return a dictionary mapping tags to their ranks (lower is better). If
+    ``tags`` is a sequence, the first tag is the best; in a set, all tags are
+    considered equally good.
+    """
+    if tags is None:
+        result = _get_compatible()[1]
+    elif isinstance(tags, dict):
+        result = tags
+    elif isinstance(tags, (set, frozenset)):
+        result = dict.fromkeys(tags, 0)
+    else:
+        result = {}
+        for i, tag in enumerate(tags):
+            result.setdefault(tuple(tag), i)
+    return result
+
+
+def _get_rank(wheel, ranks):
+    result = None
+    for tag in wheel.tags:
+        rank = ranks.get(tag)
+        if rank is not None and (result is None or rank < result):
+            result = rank
+    return result
+
+
+def get_wheel_rank(wheel, tags=None):
+    """
+    Return the rank of the most preferred of a wheel's tags (lower is better),
+    or ``None`` if the wheel isn't compatible with any of the tags.
+
+    :param wheel: A :class:`Wheel` instance or a wheel filename.
+    :param tags: The compatible tags, defaulting to those for this Python.
+    """
+    if not isinstance(wheel, Wheel):
+        wheel = Wheel(wheel)  # assume it's a filename
+    return _get_rank(wheel, _get_tag_ranks(tags))
+
+
+def select_best_wheel(filenames, tags=None):
+    """
+    Return the filename of the most specific wheel compatible with the given
+    tags, or ``None`` if none of them is compatible. Of equally ranked wheels,
+    the first is returned. Filenames which aren't valid wheel filenames are
+    ignored.
+
+    :param filenames: An iterable of wheel filenames.
+    :param tags: The compatible tags, defaulting to those for this Python.
+    """
+    ranks = _get_tag_ranks(tags)
+    result = best = None
+    for fn in filenames:
+        try:
+            wheel = Wheel(fn)
+        except DistlibException:
+            continue
+        rank = _get_rank(wheel, ranks)
+        if rank is not None and (best is None or rank < best):
+            result, best = fn, rank
+    return result
 
 
 def is_compatible(wheel, tags=None):
@@ -1114,7 +2368,7 @@ def is_compatible(wheel, tags=None):
         wheel = Wheel(wheel)  # assume it's a filename
     result = False
     if tags is None:
-        tags = COMPATIBLE_TAGS
+        tags = _get_compatible()[0]
     for ver, abi, arch in tags:
         if ver in wheel.pyver and abi in wheel.abi and arch in wheel.arch:
             result = True
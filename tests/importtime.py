@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2026 Vinay Sajip.
+# Licensed to the Python Software Foundation under a contributor agreement.
+# See LICENSE.txt and CONTRIBUTORS.txt.
+#
+"""
+Record how long it takes to import each public distlib module, as reported
+by ``python -X importtime`` (Python 3.7 and later), and optionally compare
+the results with those of an earlier run to catch import-time regressions.
+
+Usage: python tests/importtime.py [-n RUNS] [-o OUTPUT] [-b BASELINE]
+
+The results are written as JSON to OUTPUT (by default, to a file in the
+``tests/run`` directory). If a BASELINE file from an earlier run is given,
+modules which now take more than 50% (and more than a millisecond) longer
+to import than in the baseline are reported, and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+
+MODULES = ('distlib', 'distlib.database', 'distlib.index', 'distlib.locators', 'distlib.manifest',
+           'distlib.markers', 'distlib.metadata', 'distlib.resources', 'distlib.scripts', 'distlib.util',
+           'distlib.version', 'distlib.wheel')
+
+
+def import_time(module):
+    """
+    Import a module in a fresh interpreter, and return a dictionary mapping
+    the names of distlib modules imported as a result to their cumulative
+    import times in microseconds.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.dirname(HERE)
+    cmd = [sys.executable, '-X', 'importtime', '-c', 'import %s' % module]
+    p = subprocess.Popen(cmd, stderr=subprocess.PIPE, env=env)
+    _, stderr = p.communicate()
+    if p.returncode:
+        raise ValueError('Failed to import %s: %s' % (module, stderr.decode('utf-8')))
+    result = {}
+    for line in stderr.decode('utf-8').splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:'):
+            continue
+        parts = line[12:].split('|')
+        name = parts[2].strip()
+        if name.split('.')[0] == 'distlib':
+            try:
+                result[name] = int(parts[1])
+            except ValueError:  # the header line
+                pass
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record import times of distlib modules.')
+    parser.add_argument('-n', '--runs', type=int, default=5, help='Number of runs to take the best of')
+    parser.add_argument('-o', '--output', help='File to write the results to')
+    parser.add_argument('-b', '--baseline', help='Earlier results to compare against')
+    options = parser.parse_args()
+    if sys.version_info[:2] < (3, 7):
+        parser.error('-X importtime requires Python 3.7 or later')
+    results = {}
+    for module in MODULES:
+        times = [import_time(module) for _ in range(options.runs)]
+        results[module] = {
+            'total': min(t[module] for t in times),
+            'imported': sorted(times[0]),
+        }
+    output = options.output
+    if not output:
+        rundir = os.path.join(HERE, 'run')
+        if not os.path.isdir(rundir):
+            os.mkdir(rundir)
+        output = os.path.join(rundir, 'importtime_%d.%d.json' % sys.version_info[:2])
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    for module in MODULES:
+        r = results[module]
+        print('%-20s %8d us  (%d distlib modules)' % (module, r['total'], len(r['imported'])))
+    status = 0
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+        for module in MODULES:
+            if module not in baseline:
+                continue
+            old, new = baseline[module]['total'], results[module]['total']
+            if new > old * 1.5 and new - old > 1000:
+                print('Regression: %s took %d us, compared with %d us' % (module, new, old))
+                status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,6 +7,7 @@ from __future__ import unicode_literals
 
 import base64
 import io
+import json
 import os
 import hashlib
 import logging
@@ -15,6 +16,7 @@ import re
 import shutil
 import sys
 import tempfile
+import time
 
 from compat import unittest
 
@@ -22,8 +24,9 @@ from distlib import DistlibException
 from distlib.compat import text_type, StringIO
 from distlib.metadata import Metadata, METADATA_FILENAME, LEGACY_METADATA_FILENAME
 from distlib.database import (InstalledDistribution, EggInfoDistribution, BaseInstalledDistribution, EXPORTS_FILENAME,
-                              DistributionPath, make_graph, get_required_dists, get_dependent_dists)
-from distlib.util import get_resources_dests, CSVReader, read_exports
+                              DistributionPath, DependencyGraph, make_graph, make_dist, get_required_dists,
+                              get_dependent_dists)
+from distlib.util import get_resources_dests, CSVReader, read_exports, normalize_name
 
 from test_util import GlobTestCaseBase
 from support import LoggingCatcher, requires_zlib, DistlibTestCase
@@ -285,6 +288,113 @@ class TestDistribution(CommonDistributionTests, DistlibTestCase):
             with open(bad_file_name, 'wb') as f:
                 f.write(data)
 
+    def test_check_installed_files_modes(self):
+        distinfo_dir = os.path.join(self.fake_dists_path, 'choxie-2.0.0.9.dist-info')
+        dist = self.cls(distinfo_dir)
+        files = [f for f in dist._get_installed_files() if f[-1] not in ('', '0')]
+        self.assertTrue(len(files) > 2)
+        for path, hash_value, size in files:
+            self.assertEqual(dist.get_file_hash(path, 'sha256'), hash_value)
+        snapshot = dist.snapshot_installed_files()
+        self.assertEqual(sorted(snapshot), sorted(f[0] for f in dist._get_installed_files()))
+        self.assertEqual(json.loads(json.dumps(snapshot))[files[0][0]], list(snapshot[files[0][0]]))
+
+        # change the contents of one file, keeping its size and mtime
+        path, hash_value, size = files[0]
+        st = os.stat(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        bad_data = bytes(bytearray(reversed(data)))
+        with open(path, 'wb') as f:
+            f.write(bad_data)
+        os.utime(path, (st.st_atime, st.st_mtime))
+        bad_hash = dist.get_hash(bad_data)
+        # truncate another
+        other = files[1][0]
+        with open(other, 'rb') as f:
+            other_data = f.read()
+        with open(other, 'wb') as f:
+            f.write(other_data[:-1])
+        # and remove a third
+        removed = files[2][0]
+        os.remove(removed)
+        expected = [
+            (path, 'hash', hash_value, bad_hash),
+            (other, 'size', files[1][2], str(len(other_data) - 1)),
+            (removed, 'exists', True, False),
+        ]
+        expected = [m for f in dist._get_installed_files() for m in expected if m[0] == f[0]]
+        self.assertEqual(dist.check_installed_files(), expected)
+        self.assertEqual(dist.check_installed_files(max_workers=4), expected)
+        quick = [m for m in expected if m[1] != 'hash']
+        self.assertEqual(dist.check_installed_files(quick=True), quick)
+        # with a snapshot, only files which don't match it are hashed
+        self.assertEqual(dist.check_installed_files(snapshot=snapshot), quick)
+        self.assertEqual(dist.check_installed_files(quick=True, snapshot={}), expected)
+        os.utime(path, (st.st_atime, st.st_mtime + 1))
+        self.assertEqual(dist.check_installed_files(snapshot=snapshot, max_workers=4), expected)
+
+    def test_file_owners(self):
+        path = self.fake_dists_path
+        d = DistributionPath([path])
+        for distinfo_dir in self.dirs:
+            dist = self.cls(distinfo_dir)
+            for fn, _, _ in dist.list_installed_files():
+                fn = os.path.join(path, fn)
+                self.assertEqual([o.path for o in d.get_file_owners(fn)], [distinfo_dir])
+                self.assertEqual(d.get_file_owner(fn).path, distinfo_dir)
+        self.assertEqual(d.get_file_owners(os.path.join(path, 'nonexistent')), [])
+        self.assertIsNone(d.get_file_owner(os.path.join(path, 'nonexistent', 'file')))
+        self.assertEqual(d.get_duplicate_files(), {})
+        self.assertIsNotNone(d._files)
+
+        # make another distribution claim one of choxie's files
+        choxie = os.path.join(path, 'choxie-2.0.0.9.dist-info')
+        grammar = os.path.join(path, 'grammar-1.0a4.dist-info')
+        shared = os.path.join(path, 'choxie-2.0.0.9', 'truffles.py')
+        self.assertTrue(os.path.exists(shared))
+        with open(os.path.join(grammar, 'RECORD'), 'a') as f:
+            f.write('%s,,\n' % shared)
+        past = time.time() - 60
+        for p in self.dirs + [path]:
+            os.utime(p, (past, past))
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir)
+        for i in range(2):
+            d = DistributionPath([path], index_dir=index_dir)
+            self.assertEqual([o.path for o in d.get_file_owners(shared)], [choxie, grammar])
+            other = os.path.join(shared, os.pardir, 'truffles.py')
+            self.assertEqual([o.path for o in d.get_file_owners(other)], [choxie, grammar])
+            self.assertEqual(d.get_file_owner(shared).path, choxie)
+            dups = d.get_duplicate_files()
+            self.assertEqual(list(dups), [shared])
+            self.assertEqual([o.path for o in dups[shared]], [choxie, grammar])
+            self.assertTrue(os.path.exists(os.path.join(index_dir, os.listdir(index_dir)[0], 'files.json')))
+            if i == 0:
+                # the second time round, the RECORD files aren't read
+                for distinfo_dir in self.dirs:
+                    record = os.path.join(distinfo_dir, 'RECORD')
+                    os.rename(record, record + '.bak')
+                    os.utime(distinfo_dir, (past, past))
+                os.utime(path, (past, past))
+
+    def test_write_installed_files_digests(self):
+        distinfo_dir = os.path.join(self.fake_dists_path, 'choxie-2.0.0.9.dist-info')
+        dist = self.cls(distinfo_dir)
+        prefix = self.fake_dists_path
+        paths = [os.path.join(distinfo_dir, p) for p in ('INSTALLER', 'REQUESTED')]
+        # A precomputed digest is written as is, without reading the file
+        digests = {paths[0]: ('sha256=precomputed', '1234')}
+        dist.write_installed_files(paths, prefix, digests=digests)
+        records = dict((p, (h, s)) for p, h, s in dist.list_installed_files())
+        base = os.path.dirname(distinfo_dir)
+        installer = os.path.relpath(paths[0], base)
+        requested = os.path.relpath(paths[1], base)
+        self.assertEqual(records[installer], ('sha256=precomputed', '1234'))
+        with open(paths[1], 'rb') as f:
+            expected = dist.get_hash(f.read())
+        self.assertEqual(records[requested][0], expected)
+
 
 class TestEggInfoDistribution(CommonDistributionTests, LoggingCatcher, DistlibTestCase):
 
@@ -438,6 +548,156 @@ class TestDatabase(LoggingCatcher, FakeDistsMixin, DistlibTestCase):
             self.assertIsInstance(dist, EggInfoDistribution)
             self.assertEqual(dist.name, name)
 
+    def test_index(self):
+        # Test the on-disk index of installed distributions.
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir)
+        path = self.fake_dists_path
+        past = time.time() - 60
+
+        def set_stamps(when):
+            for fn in os.listdir(path):
+                if fn.endswith('.dist-info'):
+                    os.utime(os.path.join(path, fn), (when, when))
+            os.utime(path, (when, when))
+
+        def get_dists():
+            d = DistributionPath([path], index_dir=index_dir)
+            return dict((dist.name, dist) for dist in d.get_distributions())
+
+        set_stamps(past)
+        dists = get_dists()
+        expected = ['babar', 'choxie', 'grammar', 'towel-stuff']
+        self.assertEqual(sorted(dists), expected)
+        metadata = dists['grammar'].metadata.todict()
+        fn = os.path.join(index_dir, os.listdir(index_dir)[0], 'dists.json')
+        with open(fn) as f:
+            data = json.load(f)
+        self.assertEqual(sorted(v['name'] for v in data['dists'].values()), expected)
+
+        # Changing a file doesn't change the directory stamps, so the
+        # indexed metadata is still used.
+        dn = os.path.join(path, 'grammar-1.0a4.dist-info')
+        mfn = os.path.join(dn, 'pydist.json')
+        with open(mfn) as f:
+            data = f.read()
+        with open(mfn, 'w') as f:
+            f.write(data.replace('1.0a4', '1.0a5'))
+        dists = get_dists()
+        self.assertEqual(dists['grammar'].version, '1.0a4')
+        self.assertEqual([str(r) for r in dists['grammar'].run_requires], ['truffles (>=1.2)'])
+        self.assertEqual(dists['grammar'].metadata.todict(), metadata)
+
+        # Once the path entry has changed, only the .dist-info directories
+        # which have changed are read again.
+        mfn = os.path.join(path, 'choxie-2.0.0.9.dist-info', 'pydist.json')
+        with open(mfn) as f:
+            data = f.read()
+        with open(mfn, 'w') as f:
+            f.write(data.replace('with a kick', 'with a twist'))
+        os.utime(dn, (past + 1, past + 1))
+        os.utime(path, (past + 1, past + 1))
+        dists = get_dists()
+        self.assertEqual(dists['grammar'].version, '1.0a5')
+        self.assertEqual(dists['choxie'].metadata.summary, 'Chocolate with a kick!')
+
+        # as is a changed path entry.
+        shutil.rmtree(os.path.join(path, 'babar-0.1.dist-info'))
+        set_stamps(past + 2)
+        dists = get_dists()
+        self.assertEqual(sorted(dists), ['choxie', 'grammar', 'towel-stuff'])
+
+        # Without an index, the metadata is read as usual.
+        d = DistributionPath([path])
+        self.assertEqual(d.get_distribution('grammar').version, '1.0a5')
+
+    def test_lazy(self):
+        # Test lazily created distributions.
+        for enabled in (True, False):
+            d = DistributionPath([self.fake_dists_path], lazy=True)
+            d.cache_enabled = enabled
+            dists = dict((dist.name, dist) for dist in d.get_distributions())
+            self.assertEqual(sorted(dists), ['babar', 'choxie', 'grammar', 'towel_stuff'])
+            dist = dists['towel_stuff']
+            self.assertIsInstance(dist, InstalledDistribution)
+            self.assertEqual(dist.version, '0.1')
+            self.assertFalse(dist.metadata_loaded)
+            self.assertNotIn('finder', dist.__dict__)
+            self.assertTrue(dist.requested)
+            self.assertFalse(dist.metadata_loaded)
+            self.assertEqual(dist.metadata.name, 'towel-stuff')
+            self.assertTrue(dist.metadata_loaded)
+            self.assertIn('towel-stuff (0.1)', dist.provides)
+
+            for name in ('towel-stuff', 'Towel_Stuff', 'towel.stuff'):
+                dist = d.get_distribution(name)
+                self.assertIsNotNone(dist)
+                self.assertEqual(dist.version, '0.1')
+            self.assertIsNone(d.get_distribution('towel'))
+
+        dist = DistributionPath([self.fake_dists_path]).get_distribution('towel-stuff')
+        self.assertTrue(dist.metadata_loaded)
+        self.assertEqual(dist.name, 'towel-stuff')
+
+    def test_parallel(self):
+        # Test reading metadata using a pool of threads.
+        other = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other)
+        shutil.copytree(os.path.join(self.fake_dists_path, 'grammar-1.0a4.dist-info'),
+                        os.path.join(other, 'grammar-1.0a4.dist-info'))
+        path = [other, self.fake_dists_path, other]
+        for include_egg in (False, True):
+            expected = DistributionPath(path, include_egg=include_egg)
+            expected = [dist.path for dist in expected.get_distributions()]
+            for max_workers in (4, None):
+                d = DistributionPath(path, include_egg=include_egg, max_workers=max_workers)
+                self.assertEqual([dist.path for dist in d.get_distributions()], expected)
+        self.assertEqual(len(expected), 12)
+        # the first occurrence of a name wins
+        self.assertEqual(d.get_distribution('grammar').path, os.path.join(os.path.realpath(other),
+                                                                          'grammar-1.0a4.dist-info'))
+
+    @unittest.skipUnless(hasattr(os, 'symlink'), 'requires symbolic links')
+    def test_symlinked_dists(self):
+        # Test that a distribution aliased by a symbolic link is only found once.
+        other = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other)
+        dist_path = os.path.join(self.fake_dists_path, 'babar-0.1.dist-info')
+        os.symlink(dist_path, os.path.join(other, 'babar-0.1.dist-info'))
+        d = DistributionPath([other, self.fake_dists_path])
+        dists = [dist for dist in d.get_distributions() if dist.name == 'babar']
+        self.assertEqual([dist.path for dist in dists], [dist_path])
+
+    def test_normalized_names(self):
+        # Test that names are compared in their normalized forms.
+        for enabled in (True, False):
+            for lazy in (False, True):
+                d = DistributionPath(include_egg=True, lazy=lazy)
+                d.cache_enabled = enabled
+                for name in ('towel-stuff', 'Towel_Stuff', 'towel.stuff', 'TOWEL--STUFF'):
+                    dist = d.get_distribution(name)
+                    self.assertIsNotNone(dist)
+                    self.assertEqual(dist.version, '0.1')
+                self.assertEqual(d.get_distribution('Coconuts_Aster').name, 'coconuts-aster')
+                for name in ('truffles', 'Truffles', 'TRUFFLES'):
+                    dists = [normalize_name(dist.name) for dist in d.provides_distribution(name, '>=1.0')]
+                    self.assertEqual(sorted(dists), ['bacon', 'cheese', 'choxie', 'towel-stuff', 'truffles'])
+
+    def test_provided_index(self):
+        # Test that the index of provided names is kept up to date.
+        d = DistributionPath(include_egg=True)
+        self.assertEqual([dist.name for dist in d.provides_distribution('grammar')], ['grammar'])
+        self.assertEqual(d._cache.get_provided('towel-stuff')[0][1], d._scheme.matcher.version_class('0.1'))
+        dist = d.get_distribution('grammar')
+        dist.metadata.provides = ['extra-thing (1.0)']
+        d._cache.path.pop(dist.path)
+        other = InstalledDistribution(dist.path, metadata=dist.metadata)
+        other.path = dist.path + '-copy'
+        d._cache.add(other)
+        self.assertEqual([dist.path for dist in d.provides_distribution('Extra_Thing', '1.0')], [other.path])
+        d.clear_cache()
+        self.assertEqual(list(d.provides_distribution('extra-thing')), [])
+
     @requires_zlib
     def test_provides(self):
         # Test for looking up distributions by what they provide
@@ -601,6 +861,50 @@ class TestDatabase(LoggingCatcher, FakeDistsMixin, DistlibTestCase):
             expected.remove(t)
         self.assertFalse(expected)  # nothing left
 
+    def test_exports_index(self):
+        # Test the index of exported entries, and its on-disk form.
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir)
+        path = self.fake_dists_path
+        past = time.time() - 60
+        dn = os.path.join(path, 'babar-0.1.dist-info')
+        for when, p in ((past, dn), (past, path)):
+            os.utime(p, (when, when))
+
+        def get_entries(d, category, name=None):
+            return sorted((e.name, e.prefix, e.suffix, tuple(e.flags)) for e in d.get_exported_entries(category, name))
+
+        d = DistributionPath([path], index_dir=index_dir)
+        expected = get_entries(d, 'bar.baz')
+        self.assertEqual(len(expected), 4)
+        self.assertIsNotNone(d._exports)
+        nd = DistributionPath([path])
+        nd.cache_enabled = False
+        self.assertEqual(get_entries(nd, 'bar.baz'), expected)
+        self.assertEqual(get_entries(d, 'foo', 'bar'), get_entries(nd, 'foo', 'bar'))
+        self.assertEqual(get_entries(d, 'foo', 'nonexistent'), [])
+        self.assertEqual(get_entries(d, 'nonexistent'), [])
+        fn = os.path.join(index_dir, os.listdir(index_dir)[0], 'exports.json')
+        self.assertTrue(os.path.exists(fn))
+
+        # Changing the exports in place doesn't change the directory stamps,
+        # so the indexed exports are still used ...
+        fn = os.path.join(dn, EXPORTS_FILENAME)
+        with open(fn) as f:
+            data = f.read()
+        with open(fn, 'w') as f:
+            f.write(data.replace('baz.foo:bazbar', 'baz.foo:bazbaz'))
+        d = DistributionPath([path], index_dir=index_dir)
+        self.assertEqual(get_entries(d, 'bar.baz'), expected)
+        # ... until the directories have changed.
+        for when, p in ((past + 1, dn), (past + 1, path)):
+            os.utime(p, (when, when))
+        d = DistributionPath([path], index_dir=index_dir)
+        self.assertIn(('foofoo', 'baz.foo', 'bazbaz', ()), get_entries(d, 'bar.baz'))
+        self.assertEqual(get_entries(d, 'bar.baz'), get_entries(nd, 'bar.baz'))
+        d.clear_cache()
+        self.assertIsNone(d._exports)
+
     def test_modules(self):
         dp = DistributionPath(include_egg=True)
         dist = dp.get_distribution('banana')
@@ -1012,6 +1316,150 @@ class DepGraphTestCase(LoggingCatcher, DistlibTestCase):
 
         self.checkLists(matches, expected)
 
+    def test_topological_sort(self):
+        graph = DependencyGraph()
+        a, b, c, d, e, f, g = [make_dist(name, '1.0') for name in 'abcdefg']
+        for dist in (a, b, c, d, e, f, g):
+            graph.add_distribution(dist)
+        graph.add_edge(a, b)
+        graph.add_edge(a, c)
+        graph.add_edge(a, c, 'c (>=1.0)')  # multiple edges are allowed
+        graph.add_edge(b, c)
+        graph.add_edge(e, f)
+        graph.add_edge(f, e)
+        graph.add_edge(g, e)  # depends on a cycle, so can't be sorted
+        slist, cycle = graph.topological_sort()
+        self.assertEqual(slist, [c, d, b, a])
+        self.assertEqual(cycle, [e, f, g])
+        levels, cycle = graph.topological_levels()
+        self.assertEqual(levels, [set([c, d]), set([b]), set([a])])
+        self.assertEqual(cycle, [e, f, g])
+        # the graph isn't changed by sorting
+        self.assertEqual(len(graph.adjacency_list[a]), 3)
+        self.assertEqual(graph.reverse_list[c], [a, b])
+
+        # a long chain
+        graph = DependencyGraph()
+        dists = [make_dist('dist%d' % i, '1.0') for i in range(1000)]
+        for i, dist in enumerate(dists):
+            graph.add_distribution(dist)
+            if i:
+                graph.add_edge(dist, dists[i - 1])
+        slist, cycle = graph.topological_sort()
+        self.assertEqual(slist, dists)
+        self.assertEqual(cycle, [])
+        levels, cycle = graph.topological_levels()
+        self.assertEqual(levels, [set([dist]) for dist in dists])
+
+    def test_make_graph_indexed(self):
+        a = make_dist('A', '1.0')
+        a.metadata.run_requires = [{'requires': ['b.c (>=1.0)', 'D_E', 'missing']}]
+        b = make_dist('b-c', '1.1')
+        b.metadata.run_requires = [{'requires': ['d-e (<2.0)']}]
+        d = make_dist('D.E', '1.0')
+        e = make_dist('e', '2.0')
+        e.metadata.run_requires = [{'requires': ['b.c (>=1.0)', 'd-e (>2.0)']}]
+        dists = [a, b, d, e]
+        graph = make_graph(dists)
+        self.assertEqual(set(graph.adjacency_list[a]), set([(b, 'b.c (>=1.0)'), (d, 'D_E')]))
+        self.assertEqual(graph.adjacency_list[b], [(d, 'd-e (<2.0)')])
+        self.assertEqual(graph.adjacency_list[e], [(b, 'b.c (>=1.0)')])
+        self.assertEqual(graph.missing, {a: ['missing'], e: ['d-e (>2.0)']})
+
+        # the same graph can be used for several queries
+        for i in range(2):
+            deps = get_dependent_dists(None, d, graph=graph)
+            self.assertEqual(set(deps), set([a, b, e]))
+            self.assertEqual(len(deps), 3)
+            self.assertEqual(get_required_dists(None, a, graph=graph), set([b, d]))
+            self.assertEqual(get_required_dists(dists, e, graph=graph), set([b, d]))
+        self.assertEqual(graph.reverse_list[d], [a, b])  # in the order the dists were given
+        self.assertEqual(len(graph.adjacency_list[a]), 2)
+        self.assertRaises(DistlibException, get_dependent_dists, dists, make_dist('f', '1.0'), graph=graph)
+
+    def test_incremental_graph(self):
+        a = make_dist('a', '1.0')
+        a.metadata.run_requires = [{'requires': ['b (>=1.0)', 'c']}]
+        b = make_dist('b', '1.0')
+        b.metadata.run_requires = [{'requires': ['c (<2.0)']}]
+        c1 = make_dist('c', '1.0')
+        c2 = make_dist('c', '2.0')
+
+        def missing(graph):
+            return dict((k, set(v)) for k, v in graph.missing.items())
+
+        graph = DependencyGraph()
+        graph.add_distribution(a, link=True)
+        self.assertEqual(missing(graph), {a: set(['b (>=1.0)', 'c'])})
+        graph.add_distribution(b, link=True)
+        self.assertEqual(graph.adjacency_list[a], [(b, 'b (>=1.0)')])
+        self.assertEqual(missing(graph), {a: set(['c']), b: set(['c (<2.0)'])})
+        graph.add_distribution(c2, link=True)
+        self.assertEqual(set(graph.adjacency_list[a]), set([(b, 'b (>=1.0)'), (c2, 'c')]))
+        self.assertEqual(missing(graph), {b: set(['c (<2.0)'])})
+        graph.add_distribution(c1, link=True)
+        self.assertEqual(graph.adjacency_list[b], [(c1, 'c (<2.0)')])
+        self.assertEqual(graph.missing, {})
+        self.assertEqual(set(graph.get_dependent_dists(c1)), set([a, b]))
+        self.assertEqual(graph.get_dependent_dists(c2), [a])
+        self.assertEqual(graph.get_required_dists(a), set([b, c1, c2]))
+        self.assertRaises(DistlibException, graph.add_distribution, c1, link=True)
+
+        # removing c2 resolves a's requirement to c1 ...
+        graph.remove_distribution(c2)
+        self.assertNotIn(c2, graph.adjacency_list)
+        self.assertNotIn(c2, graph.reverse_list)
+        self.assertEqual(set(graph.adjacency_list[a]), set([(b, 'b (>=1.0)'), (c1, 'c')]))
+        self.assertEqual(set(graph.reverse_list[c1]), set([a, b]))
+        self.assertEqual(graph.missing, {})
+        # ... and removing c1 makes the requirements missing again
+        graph.remove_distribution(c1)
+        self.assertEqual(graph.adjacency_list[a], [(b, 'b (>=1.0)')])
+        self.assertEqual(graph.adjacency_list[b], [])
+        self.assertEqual(missing(graph), {a: set(['c']), b: set(['c (<2.0)'])})
+        self.assertEqual(graph.get_required_dists(a), set([b]))
+        self.assertRaises(DistlibException, graph.remove_distribution, c1)
+        self.assertRaises(DistlibException, graph.get_dependent_dists, c1)
+        graph.remove_distribution(a)
+        self.assertEqual(graph.reverse_list[b], [])
+        self.assertEqual(missing(graph), {b: set(['c (<2.0)'])})
+        self.assertEqual(graph.topological_sort(), ([b], []))
+
+    def test_incremental_graph_random(self):
+        # an incrementally maintained graph should match one made from scratch
+        rnd = random.Random(0)
+        dists = []
+        for i in range(30):
+            dist = make_dist('dist%d' % i, '1.%d' % (i % 3))
+            reqs = ['dist%d (>=1.%d)' % (rnd.randrange(30), rnd.randrange(3)) for _ in range(rnd.randrange(4))]
+            dist.metadata.run_requires = [{'requires': reqs}] if reqs else []
+            dists.append(dist)
+
+        def summary(graph):
+            result = {}
+            for dist, adjs in graph.adjacency_list.items():
+                result[dist.name] = (sorted((o.name, label) for o, label in adjs),
+                                     sorted(d.name for d in graph.reverse_list[dist]),
+                                     sorted(graph.missing.get(dist, [])))
+            return result
+
+        graph = DependencyGraph()
+        present = []
+        for i in range(200):
+            if present and rnd.random() < 0.4:
+                dist = present.pop(rnd.randrange(len(present)))
+                graph.remove_distribution(dist)
+            else:
+                dist = rnd.choice(dists)
+                if dist in present:
+                    continue
+                present.append(dist)
+                graph.add_distribution(dist, link=True)
+            self.assertEqual(summary(graph), summary(make_graph(present)))
+            # the index of missing requirements by name has no stale entries
+            for indexed in graph._missing_by_name.values():
+                self.assertTrue(all(d in graph.missing for d in indexed))
+
     @requires_zlib
     def test_repr(self):
         dists = self.get_dists(self.DISTROS_DIST + self.DISTROS_EGG + self.BAD_EGGS, True)
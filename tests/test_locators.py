@@ -355,6 +355,16 @@ class LocatorTestCase(DistlibTestCase):
         for url1, url2 in cases:
             self.assertEqual(default_locator.prefer_url(url1, url2), url1)
 
+    def test_wheel_url_preference(self):
+        locator = SimpleScrapingLocator('https://pypi.org/simple/')
+        locator.wheel_tags = [('cp311', 'cp311', 'manylinux_2_28_x86_64'), ('cp311', 'cp311', 'manylinux1_x86_64')]
+        url1 = 'https://netloc/foo-1.0-cp311-cp311-manylinux_2_28_x86_64.whl'
+        url2 = 'https://netloc/foo-1.0-cp311-cp311-manylinux1_x86_64.whl'
+        url3 = 'https://netloc/foo-1.0-cp311-cp311-win_amd64.whl'
+        self.assertEqual(locator.prefer_url(url1, url2), url1)
+        self.assertEqual(locator.prefer_url(url2, url1), url1)
+        self.assertEqual(locator.prefer_url(url3, url2), url2)
+
     @unittest.skipIf('SKIP_ONLINE' in os.environ, 'Skipping online test')
     @unittest.skipUnless(ssl, 'SSL required for this test.')
     def test_prereleases(self):
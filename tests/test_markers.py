@@ -5,8 +5,9 @@
 #
 """Tests for distlib.markers."""
 import os
-import sys
 import platform
+import subprocess
+import sys
 
 from compat import unittest
 from support import DistlibTestCase
@@ -18,6 +19,15 @@ from distlib.util import in_venv
 
 class MarkersTestCase(DistlibTestCase):
 
+    @unittest.skipIf(sys.version_info[:2] < (3, 7), 'module __getattr__ requires Python >= 3.7')
+    def test_lazy_default_context(self):
+        code = ('import distlib.markers as m; a = m._default_context is None; ctx = m.DEFAULT_CONTEXT; '
+                'print(a, ctx is m._default_context, ctx["sys_platform"] == m.sys.platform)')
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output([sys.executable, '-c', code], env=env)
+        self.assertEqual(output.split(), [b'True', b'True', b'True'])
+
     def test_interpret(self):
         sys_platform = sys.platform
         version = sys.version.split()[0]
@@ -8,13 +8,14 @@ from __future__ import unicode_literals
 
 from operator import attrgetter
 import os
+import posixpath
 import sys
 
 from compat import unittest
 from support import DistlibTestCase, in_github_workflow
 
 from distlib import DistlibException
-from distlib.resources import finder, finder_for_path, ResourceCache
+from distlib.resources import finder, finder_for_path, ResourceCache, _DirEntry
 from distlib.util import get_cache_base
 
 HERE = os.path.abspath(os.path.dirname(__file__))
@@ -89,6 +90,10 @@ class ZipResourceTestCase(DistlibTestCase):
         expected = set(('foo_resource.bin', 'bar', '__init__.py'))
         self.assertEqual(r.resources, expected)
 
+    def test_scan(self):
+        f = finder('foo')
+        self.assertIsNone(f.scan(''))
+
     def test_dir_in_zip(self):
         sys.path[0] = '%s/lib' % os.path.join(HERE, 'bar.zip')
         f = finder('barbar')
@@ -201,6 +206,39 @@ class FileResourceTestCase(DistlibTestCase):
         expected = set(('foo_resource.bin', 'bar', '__init__.py', 'nested'))
         self.assertEqual(r.resources, expected)
 
+    def test_scan(self):
+        f = finder('foofoo')
+        for name in ('', 'bar', 'nested'):
+            entries = f.scan(name)
+            self.assertEqual(set(entries), f.find(name).resources)
+            for k, e in entries.items():
+                self.assertEqual(e.name, k)
+                r = f.find(posixpath.join(name, k))
+                self.assertEqual(e.path, r.path)
+                self.assertEqual(e.is_dir(), r.is_container)
+                self.assertEqual(e.is_file(), not r.is_container)
+                self.assertFalse(e.is_symlink())
+                if e.is_file():
+                    self.assertEqual(e.stat().st_size, r.size)
+        self.assertIsNone(f.scan('foo_resource.bin'))
+        self.assertIsNone(f.scan('no_such_resource'))
+
+    def test_dir_entry(self):
+        # the stand-in used when os.scandir() isn't available
+        d = os.path.join(HERE, 'foofoo')
+        for name in os.listdir(d):
+            e = _DirEntry(d, name)
+            p = os.path.join(d, name)
+            self.assertEqual(e.path, p)
+            self.assertEqual(e.is_dir(), os.path.isdir(p))
+            self.assertEqual(e.is_file(), os.path.isfile(p))
+            self.assertFalse(e.is_symlink())
+            self.assertEqual(e.stat().st_size, os.stat(p).st_size)
+        e = _DirEntry(d, 'no_such_resource')
+        self.assertFalse(e.is_dir())
+        self.assertFalse(e.is_file())
+        self.assertRaises(OSError, e.stat)
+
     @unittest.skipIf(IN_GITHUB_WORKFLOW, 'This test is end-of-line dependent')
     def test_nested(self):
         f = finder('foofoo')
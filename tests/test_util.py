@@ -9,6 +9,7 @@ from itertools import islice
 import os
 import re
 import shutil
+import subprocess
 try:
     import ssl
 except ImportError:
@@ -17,6 +18,7 @@ import sys
 import tempfile
 import textwrap
 import time
+import traceback
 
 from compat import unittest
 from support import TempdirManager, DistlibTestCase, in_github_workflow
@@ -26,7 +28,7 @@ from distlib.compat import cache_from_source
 from distlib.util import (get_export_entry, ExportEntry, resolve, get_cache_base, path_to_cache_dir, zip_dir,
                           parse_credentials, ensure_slash, split_filename, EventMixin, Sequencer, unarchive, Progress,
                           iglob, RICH_GLOB, parse_requirement, get_extras, Configurator, read_exports, write_exports,
-                          FileOperator, is_string_sequence, get_package_data, convert_path)
+                          FileOperator, is_string_sequence, get_package_data, convert_path, thread_map)
 
 HERE = os.path.dirname(os.path.abspath(__file__))
 IN_GITHUB_WORKFLOW = in_github_workflow()
@@ -47,6 +49,17 @@ class UtilTestCase(DistlibTestCase):
         self.assertEqual(entry.suffix, suffix)
         self.assertEqual(entry.flags, flags)
 
+    @unittest.skipIf(sys.version_info[:2] < (3, 7), 'module __getattr__ requires Python >= 3.7')
+    def test_lazy_submodules(self):
+        code = ('import sys, distlib; a = "distlib.wheel" in sys.modules; w = distlib.wheel; '
+                'print(a, w is sys.modules["distlib.wheel"], "wheel" in dir(distlib))')
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.path.dirname(HERE)
+        output = subprocess.check_output([sys.executable, '-c', code], env=env)
+        self.assertEqual(output.split(), [b'False', b'True', b'True'])
+        import distlib
+        self.assertRaises(AttributeError, getattr, distlib, 'nonexistent')
+
     def test_export_entry(self):
         self.assertIsNone(get_export_entry('foo.py'))
         self.assertIsNone(get_export_entry('foo.py='))
@@ -511,6 +524,36 @@ class UtilTestCase(DistlibTestCase):
         data = zip_dir(d)
         self.assertIsInstance(data, BytesIO)
 
+    def test_thread_map(self):
+        items = list(range(20))
+        expected = [i * i for i in items]
+        for workers in (None, 0, 1, 4):
+            self.assertEqual(thread_map(lambda i: i * i, items, workers), expected)
+        self.assertEqual(thread_map(len, [], 4), [])
+
+        def func(i):
+            if i == 3:
+                raise ValueError('bad item: %d' % i)
+            return i
+
+        self.assertRaises(ValueError, thread_map, func, items, 4)
+        self.assertRaises(ValueError, thread_map, func, items, 1)
+
+        # exceptions not derived from Exception are re-raised too, with the
+        # traceback from the worker thread
+        def func(i):
+            if i == 3:
+                raise SystemExit('bad item: %d' % i)
+            return i
+
+        try:
+            thread_map(func, items, 2)
+        except SystemExit:
+            tb = sys.exc_info()[2]
+        else:  # pragma: no cover
+            self.fail('SystemExit not raised')
+        self.assertIn('func', [entry[2] for entry in traceback.extract_tb(tb)])
+
     def test_configurator(self):
         d = {
             'a': 1,
@@ -736,6 +779,24 @@ class FileOpsTestCase(DistlibTestCase):
             os.symlink(linkpath, dstpath)
             self.assertRaises(ValueError, self.fileop.copy_file, srcpath, dstpath)
 
+    def test_link_file(self):
+        srcpath = os.path.join(self.workdir, 'file1')
+        self.fileop.write_text_file(srcpath, 'test', 'utf-8')
+        dstpath = os.path.join(self.workdir, 'subdir', 'file2')
+        self.fileop.link_file(srcpath, dstpath)
+        with open(dstpath) as f:
+            self.assertEqual(f.read(), 'test')
+        if hasattr(os, 'link'):
+            self.assertTrue(os.path.samefile(srcpath, dstpath))
+        # an existing file is replaced
+        otherpath = os.path.join(self.workdir, 'file3')
+        self.fileop.write_text_file(otherpath, 'other', 'utf-8')
+        self.fileop.link_file(otherpath, dstpath)
+        with open(dstpath) as f:
+            self.assertEqual(f.read(), 'other')
+        with open(srcpath) as f:
+            self.assertEqual(f.read(), 'test')
+
     def test_commit(self):
         # will assert if record isn't set
         self.assertRaises(AssertionError, self.fileop.commit)
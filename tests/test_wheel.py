@@ -7,12 +7,16 @@
 from __future__ import unicode_literals
 
 import io
+import json
 import os
+import random
 import re
 import shutil
 import subprocess
 import sys
 import tempfile
+import time
+import zipfile
 
 from compat import unittest
 from support import DistlibTestCase
@@ -23,9 +27,10 @@ from distlib.database import DistributionPath
 from distlib.manifest import Manifest
 from distlib.metadata import Metadata, METADATA_FILENAME, LEGACY_METADATA_FILENAME
 from distlib.scripts import ScriptMaker
-from distlib.util import get_executable
-from distlib.wheel import (Wheel, PYVER, IMPVER, ARCH, ABI, COMPATIBLE_TAGS, IMP_PREFIX, VER_SUFFIX,
-                           is_compatible, _get_glibc_version)
+from distlib.util import get_executable, convert_path, Cache
+from distlib.wheel import (Wheel, PYVER, IMPVER, ARCH, ABI, COMPATIBLE_TAGS, COMPATIBLE_TAG_RANKS, IMP_PREFIX,
+                           VER_SUFFIX, is_compatible, get_wheel_rank, select_best_wheel, install_wheels,
+                           directory_cache, _get_glibc_version, _WheelZipFile, CHUNK_SIZE)
 
 try:
     with open(os.devnull, 'wb') as junk:
@@ -183,7 +188,8 @@ class WheelTestCase(DistlibTestCase):
             arch = ARCH.replace('linux_', '')
             parts = _get_glibc_version()
             if len(parts) == 2:
-                self.assertTrue(filter(lambda o: o[-1] == 'manylinux_%s_%s_%s' % (parts[0], parts[1], arch), tags))
+                for minor in range(parts[1], 4, -1):
+                    self.assertTrue(filter(lambda o: o[-1] == 'manylinux_%s_%s_%s' % (parts[0], minor, arch), tags))
                 if parts >= (2, 17):
                     self.assertTrue(filter(lambda o: o[-1] == 'manylinux2014_%s' % arch, tags))
                 if parts >= (2, 12):
@@ -191,6 +197,78 @@ class WheelTestCase(DistlibTestCase):
                 if parts >= (2, 5):
                     self.assertTrue(filter(lambda o: o[-1] == 'manylinux1_%s' % arch, tags))
 
+    @unittest.skipIf(sys.version_info[:2] < (3, 7), 'module __getattr__ requires Python >= 3.7')
+    def test_lazy_compatible_tags(self):
+        code = ('import distlib.wheel as w; a = w._compatible is None; tags = w.COMPATIBLE_TAGS; '
+                'print(a, w._compatible is not None, tags is w.COMPATIBLE_TAGS)')
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.path.dirname(HERE)
+        output = subprocess.check_output([sys.executable, '-c', code], env=env)
+        self.assertEqual(output.split(), [b'True', b'True', b'True'])
+        self.assertIs(_get_glibc_version(), _get_glibc_version())
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), 'manylinux tags are only used on Linux')
+    def test_manylinux_tags(self):
+        import distlib.wheel
+
+        saved = distlib.wheel._glibc_version
+        self.addCleanup(setattr, distlib.wheel, '_glibc_version', saved)
+        distlib.wheel._glibc_version = (2, 28)
+        tags = distlib.wheel._compatible_tags()
+        arch = ARCH.replace('linux_', '')
+        platforms = [t[2] for t in tags if t[:2] == (IMPVER, ABI)]
+        expected = ['manylinux_2_%d_%s' % (minor, arch) for minor in range(28, 4, -1)]
+        expected.insert(expected.index('manylinux_2_17_%s' % arch) + 1, 'manylinux2014_%s' % arch)
+        expected.insert(expected.index('manylinux_2_12_%s' % arch) + 1, 'manylinux2010_%s' % arch)
+        expected.append('manylinux1_%s' % arch)
+        expected.append(ARCH)
+        self.assertEqual(platforms, expected)
+        fns = [
+            'foo-1.0-%s-%s-%s.whl' % (IMPVER, ABI, ARCH),
+            'foo-1.0-%s-%s-manylinux1_%s.whl' % (IMPVER, ABI, arch),
+            'foo-1.0-%s-%s-manylinux_2_28_%s.whl' % (IMPVER, ABI, arch),
+            'foo-1.0-%s-%s-manylinux_2_29_%s.whl' % (IMPVER, ABI, arch),
+        ]
+        self.assertTrue(is_compatible(fns[2], tags))
+        self.assertFalse(is_compatible(fns[3], tags))
+        self.assertIsNone(get_wheel_rank(fns[3], tags))
+        self.assertEqual(select_best_wheel(fns, tags), fns[2])
+        self.assertEqual(select_best_wheel(fns[:2], tags), fns[1])
+        # an older glibc gets fewer tags
+        distlib.wheel._glibc_version = (2, 12)
+        tags = distlib.wheel._compatible_tags()
+        self.assertFalse(is_compatible(fns[2], tags))
+        self.assertIsNone(select_best_wheel(fns[2:], tags))
+        self.assertNotIn((IMPVER, ABI, 'manylinux2014_%s' % arch), tags)
+        self.assertIn((IMPVER, ABI, 'manylinux2010_%s' % arch), tags)
+
+    def test_select_best_wheel(self):
+        ranks = COMPATIBLE_TAG_RANKS
+        self.assertEqual(set(ranks), COMPATIBLE_TAGS)
+        self.assertEqual(sorted(ranks.values()), list(range(len(ranks))))
+        self.assertLess(ranks[(IMPVER, 'none', 'any')], ranks[(PYVER, 'none', 'any')])
+        fn = 'dummy-0.1-%s-none-any.whl' % PYVER
+        self.assertEqual(get_wheel_rank(fn), ranks[(PYVER, 'none', 'any')])
+        self.assertIsNone(get_wheel_rank('dummy-0.1-py1-none-any.whl'))
+        fns = ['dummy-0.1-py1-none-any.whl', 'not-a-wheel.zip', fn, 'dummy-0.1-%s-none-any.whl' % IMPVER]
+        self.assertEqual(select_best_wheel(fns), fns[3])
+        self.assertIsNone(select_best_wheel(fns[:2]))
+        tags = [('cp311', 'cp311', 'manylinux_2_28_x86_64'), ('cp311', 'cp311', 'manylinux1_x86_64'),
+                ('py3', 'none', 'any')]
+        fns = [
+            'foo-1.0-py3-none-any.whl', 'foo-1.0-cp311-cp311-manylinux1_x86_64.whl',
+            'foo-1.0-cp311-cp311-manylinux_2_17_x86_64.manylinux_2_28_x86_64.whl',
+            'foo-1.0-cp311-cp311-win_amd64.whl'
+        ]
+        self.assertEqual(select_best_wheel(fns, tags), fns[2])
+        self.assertEqual(select_best_wheel(fns[:2], tags), fns[1])
+        self.assertEqual(select_best_wheel(reversed(fns[:2]), tags), fns[1])
+        # all tags in a set are equally good, so the first compatible wins
+        self.assertEqual(select_best_wheel(fns, set(tags)), fns[0])
+        # ranks can be given directly
+        ranks = {('py3', 'none', 'any'): 0, ('cp311', 'cp311', 'manylinux1_x86_64'): 1}
+        self.assertEqual(select_best_wheel(fns, ranks), fns[0])
+
     def test_is_compatible(self):
         fn = os.path.join(HERE, 'dummy-0.1-py27-none-any.whl')
         if PYVER in ('py27', 'py30', 'py31'):
@@ -353,8 +431,9 @@ class WheelTestCase(DistlibTestCase):
                     if 'manylinux1_' in arch:
                         self.assertTrue(parts >= (2, 5))
                     if 'manylinux_' in arch:
-                        s = 'manylinux_%s_%s_' % parts
-                        self.assertIn(s, arch)
+                        major, minor = arch.split('_')[1:3]
+                        self.assertEqual(int(major), parts[0])
+                        self.assertLessEqual(int(minor), parts[1])
 
     def test_is_compatible_limited_abi(self):
         major_version = sys.version_info.major
@@ -665,6 +744,92 @@ class WheelTestCase(DistlibTestCase):
         w.unmount()
         self.assertNotIn(fn, sys.path)
 
+    @unittest.skipIf(sys.version_info[0] < 3, 'indexed mounting requires Python 3')
+    def test_mount_indexed(self):
+        import distlib.wheel
+        import importlib.machinery
+        import pkgutil
+
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        files = {
+            'idxpkg/__init__.py': 'from .mod import VALUE\n',
+            'idxpkg/mod.py': '# -*- coding: utf-8 -*-\nVALUE = "\u00e9"\n',
+            'idxns/sub/leaf.py': 'LEAF = 1\n',
+            'idxtop.py': 'WHICH = "first"\n',
+            'idxpkg/data.txt': 'some data\n',
+            'idxpkg/sub/nested.txt': 'nested data\n',
+        }
+        w1 = self.make_wheel(workdir, 'first', '1.0', files)
+        w2 = self.make_wheel(workdir, 'second', '1.0', {'idxtop.py': 'WHICH = "second"\n'})
+        names = ('idxpkg', 'idxpkg.mod', 'idxns', 'idxns.sub', 'idxns.sub.leaf', 'idxtop')
+
+        def cleanup():
+            for name in names:
+                sys.modules.pop(name, None)
+
+        self.addCleanup(cleanup)
+        path = list(sys.path)
+        w1.mount(indexed=True)
+        w2.mount(indexed=True)
+        try:
+            finder = distlib.wheel._prepend_finder
+            # after the builtin and frozen importers, so they can't be shadowed
+            pos = sys.meta_path.index(finder)
+            self.assertLess(sys.meta_path.index(importlib.machinery.BuiltinImporter), pos)
+            self.assertLess(sys.meta_path.index(importlib.machinery.FrozenImporter), pos)
+            self.assertEqual(sys.path, path)
+            import idxpkg
+            import idxns.sub.leaf
+            import idxtop
+            self.assertEqual(idxpkg.VALUE, '\u00e9')
+            self.assertIs(idxpkg.__loader__, finder)
+            self.assertTrue(idxpkg.__file__.endswith(os.path.join('idxpkg', '__init__.py')))
+            self.assertEqual(idxns.sub.leaf.LEAF, 1)
+            # the most recently mounted wheel takes precedence
+            self.assertEqual(idxtop.WHICH, 'second')
+            self.assertIn('VALUE', finder.get_source('idxpkg.mod'))
+            self.assertIsNone(finder.find_spec('idxnonexistent'))
+            # resources can be read from the wheel
+            self.assertEqual(pkgutil.get_data('idxpkg', 'data.txt'), b'some data\n')
+            self.assertEqual(pkgutil.get_data('idxpkg', 'sub/nested.txt'), b'nested data\n')
+            self.assertRaises(IOError, pkgutil.get_data, 'idxpkg', 'nonexistent.txt')
+            if sys.version_info[:2] >= (3, 10):  # files() ignores resource readers in 3.9
+                import importlib.resources
+
+                files = importlib.resources.files('idxpkg')
+                self.assertEqual(files.joinpath('data.txt').read_text(), 'some data\n')
+                self.assertEqual((files / 'sub' / 'nested.txt').read_bytes(), b'nested data\n')
+                self.assertTrue((files / 'sub').is_dir())
+                self.assertEqual(sorted(r.name for r in files.iterdir()), ['__init__.py', 'data.txt', 'mod.py', 'sub'])
+                with importlib.resources.as_file(files / 'data.txt') as p:
+                    with open(p) as f:
+                        self.assertEqual(f.read(), 'some data\n')
+            elif sys.version_info[:2] >= (3, 7):  # pragma: no cover
+                import importlib.resources
+
+                self.assertEqual(importlib.resources.read_text('idxpkg', 'data.txt'), 'some data\n')
+                self.assertTrue(importlib.resources.is_resource('idxpkg', 'data.txt'))
+            reader = finder.get_resource_reader('idxpkg')
+            self.assertTrue(reader.is_resource('data.txt'))
+            self.assertFalse(reader.is_resource('sub'))
+            self.assertEqual(sorted(reader.contents()), ['__init__.py', 'data.txt', 'mod.py', 'sub'])
+            with reader.open_resource('data.txt') as f:
+                self.assertEqual(f.read(), b'some data\n')
+            self.assertIsNone(finder.get_resource_reader('idxtop'))
+            # mounting again is a no-op
+            w1.mount(indexed=True)
+            self.assertEqual(finder.order, [
+                os.path.join(w2.dirname, w2.filename),
+                os.path.join(w1.dirname, w1.filename),
+            ])
+        finally:
+            w2.unmount()
+            w1.unmount()
+        self.assertNotIn(finder, sys.meta_path)
+        cleanup()
+        self.assertRaises(ImportError, __import__, 'idxtop')
+
     def test_mount_extensions(self):
         if PYVER == 'py27':
             fn = 'minimext-0.1-cp27-none-linux_x86_64.whl'
@@ -734,6 +899,49 @@ class WheelTestCase(DistlibTestCase):
             shutil.rmtree(workdir)
 
 
+    def test_extension_cache(self):
+        import distlib.wheel
+
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        cachedir = os.path.join(workdir, 'cache')
+        os.mkdir(cachedir)
+        os.chmod(cachedir, 0o700)
+        saved = distlib.wheel.cache
+        distlib.wheel.cache = Cache(cachedir)
+        self.addCleanup(setattr, distlib.wheel, 'cache', saved)
+        results = []
+        for name, version in (('foo', '1.0'), ('foo', '1.1'), ('bar', '1.0')):
+            extensions = {'%s._ext' % name: '%s/_ext.so' % name, 'libx': '%s.libs/libx.so' % name}
+            files = {
+                '%s/_ext.so' % name: 'not really a shared library',
+                '%s.libs/libx.so' % name: 'not really a bundled library',
+                '%s-%s.dist-info/EXTENSIONS' % (name, version): json.dumps(extensions),
+            }
+            w = self.make_wheel(workdir, name, version, files)
+            extensions = dict(w._get_extensions())
+            self.assertEqual(sorted(extensions), ['%s._ext' % name, 'libx'])
+            dest = extensions['%s._ext' % name]
+            with open(dest) as f:
+                self.assertEqual(f.read(), 'not really a shared library')
+            # The extensions keep their relative layout
+            base = os.path.dirname(os.path.dirname(dest))
+            self.assertEqual(dest, os.path.join(base, name, '_ext.so'))
+            self.assertEqual(extensions['libx'], os.path.join(base, '%s.libs' % name, 'libx.so'))
+            results.append(extensions)
+        # Keyed by the extensions' hashes, so shared between wheels with the
+        # same extensions, but not with others
+        self.assertEqual(results[0], results[1])
+        self.assertNotEqual(results[0]['libx'], results[2]['libx'])
+        self.assertTrue(results[0]['libx'].startswith(os.path.join(cachedir, 'by-hash', '')))
+
+        # Cache hits don't extract anything
+        def fail(*args):
+            raise AssertionError('unexpected extraction')
+
+        w._extract_extension = fail
+        self.assertEqual(dict(w._get_extensions()), results[2])
+
     def test_local_version(self):
         w = Wheel('dummy-0.1_1.2')
         self.assertEqual(w.filename, 'dummy-0.1_1.2-%s'
@@ -810,6 +1018,506 @@ class WheelTestCase(DistlibTestCase):
             raise unittest.SkipTest('Test not supported by pip version')
         self.do_build_and_install('Babel == 0.9.6')
 
+    def make_wheel(self, workdir, name, version, files):
+        # Build a pure wheel containing the specified files, which should be
+        # a dictionary mapping paths relative to purelib to their contents.
+        srcdir = os.path.join(workdir, '%s-src' % name)
+        purelib = os.path.join(srcdir, 'purelib')
+        distinfo = os.path.join(purelib, '%s-%s.dist-info' % (name, version))
+        os.makedirs(distinfo)
+        md = Metadata()
+        md.name = name
+        md.version = version
+        md.summary = 'Test wheel'
+        md.write(path=os.path.join(distinfo, LEGACY_METADATA_FILENAME), legacy=True)
+        for rp, data in files.items():
+            fn = os.path.join(purelib, convert_path(rp))
+            dn = os.path.dirname(fn)
+            if not os.path.isdir(dn):
+                os.makedirs(dn)
+            with open(fn, 'wb') as f:
+                f.write(data.encode('utf-8'))
+        w = Wheel('%s-%s' % (name, version))
+        w.dirname = workdir
+        return Wheel(w.build({'prefix': srcdir, 'purelib': purelib}))
+
+    def get_install_paths(self, dstdir):
+        paths = {'prefix': dstdir}
+        for key in ('purelib', 'platlib', 'headers', 'scripts', 'data'):
+            paths[key] = os.path.join(dstdir, key)
+        return paths
+
+    def test_install_wheels(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        wheels = [
+            self.make_wheel(workdir, 'foo', '1.0', {'foo/__init__.py': 'x = 1\n'}),
+            self.make_wheel(workdir, 'bar', '2.0', {'bar.py': 'y = 2\n', 'bar_data/d.txt': 'data'}),
+        ]
+        dstdir = os.path.join(workdir, 'dst')
+        paths = self.get_install_paths(dstdir)
+        maker = ScriptMaker(None, None)
+        dists = install_wheels(wheels, paths, maker, max_workers=2)
+        self.assertEqual([(d.name, d.version) for d in dists], [('foo', '1.0'), ('bar', '2.0')])
+        purelib = paths['purelib']
+        for rp in ('foo/__init__.py', 'bar.py', 'bar_data/d.txt'):
+            self.assertTrue(os.path.isfile(os.path.join(purelib, convert_path(rp))))
+        dp = DistributionPath([purelib])
+        for dist in dists:
+            idist = dp.get_distribution(dist.name)
+            self.assertIsNotNone(idist)
+            self.assertEqual(idist.check_installed_files(), [])
+        # lib_only returns None for each wheel
+        dstdir = os.path.join(workdir, 'dst2')
+        paths = self.get_install_paths(dstdir)
+        self.assertEqual(install_wheels(wheels, paths, maker, lib_only=True), [None, None])
+
+    def test_install_wheels_conflict(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        wheels = [
+            self.make_wheel(workdir, 'foo', '1.0', {'foo/__init__.py': 'x = 1\n', 'common.py': ''}),
+            self.make_wheel(workdir, 'bar', '2.0', {'bar.py': 'y = 2\n', 'common.py': ''}),
+        ]
+        dstdir = os.path.join(workdir, 'dst')
+        paths = self.get_install_paths(dstdir)
+        maker = ScriptMaker(None, None)
+        with self.assertRaises(DistlibException) as ctx:
+            install_wheels(wheels, paths, maker)
+        self.assertIn('would be installed by both', str(ctx.exception))
+        self.assertFalse(os.path.exists(paths['purelib']))
+
+    def test_install_wheels_rollback(self):
+        # If extraction fails partway, nothing from any of the wheels remains.
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        foo = self.make_wheel(workdir, 'foo', '1.0', {'foo/__init__.py': 'x = 1\n', 'foo/sub/mod.py': 'y = 2\n'})
+        bar = self.make_wheel(workdir, 'bar', '2.0', {'bar/__init__.py': '', 'bar/zzz.py': 'z = 3\n'})
+        # change a member of bar after its RECORD was written, so that its
+        # digest doesn't match
+        pn = os.path.join(bar.dirname, bar.filename)
+        with ZipFile(pn, 'r') as zf:
+            members = [(zinfo, zf.read(zinfo.filename)) for zinfo in zf.infolist()]
+        with ZipFile(pn, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for zinfo, data in members:
+                if zinfo.filename == 'bar/zzz.py':
+                    data = b'z = 4\n'
+                zf.writestr(zinfo, data)
+        dstdir = os.path.join(workdir, 'dst')
+        paths = self.get_install_paths(dstdir)
+        maker = ScriptMaker(None, None)
+        for max_workers in (1, 2):
+            with self.assertRaises(DistlibException) as ctx:
+                install_wheels([foo, bar], paths, maker, max_workers=max_workers)
+            self.assertIn('digest mismatch', str(ctx.exception))
+            self.assertFalse(os.path.exists(paths['purelib']))
+        # the same happens for exceptions not derived from Exception
+        members = []
+
+        def install_member(zf, zinfo, *args):
+            members.append(zinfo.filename)
+            if len(members) > 1:
+                raise KeyboardInterrupt
+            return Wheel._install_member(foo, zf, zinfo, *args)
+
+        foo._install_member = install_member
+        self.assertRaises(KeyboardInterrupt, install_wheels, [foo], paths, maker)
+        self.assertFalse(os.path.exists(paths['purelib']))
+
+    def test_install_link_cache(self):
+        import distlib.wheel
+
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        cachedir = os.path.join(workdir, 'cache')
+        os.mkdir(cachedir)
+        os.chmod(cachedir, 0o700)
+        saved = distlib.wheel.wheel_cache
+        distlib.wheel.wheel_cache = Cache(cachedir)
+        self.addCleanup(setattr, distlib.wheel, 'wheel_cache', saved)
+        w = self.make_wheel(workdir, 'foo', '1.0', {'foo/__init__.py': 'x = 1\n'})
+        maker = ScriptMaker(None, None)
+        installed = []
+        for dn in ('dst1', 'dst2'):
+            paths = self.get_install_paths(os.path.join(workdir, dn))
+            dist = w.install(paths, maker, link_cache=True)
+            self.assertEqual(dist.check_installed_files(), [])
+            installed.append(os.path.join(paths['purelib'], 'foo', '__init__.py'))
+        # One unpacked copy of the wheel in the cache
+        entries = [fn for fn in os.listdir(cachedir) if not fn.startswith('.')]
+        self.assertEqual(len(entries), 1)
+        s1, s2 = [os.stat(p) for p in installed]
+        if hasattr(os, 'link'):
+            self.assertEqual(s1.st_ino, s2.st_ino)
+        with open(installed[1]) as f:
+            self.assertEqual(f.read(), 'x = 1\n')
+        # .dist-info is never shared with the cache
+        paths = self.get_install_paths(os.path.join(workdir, 'dst1'))
+        p = os.path.join(paths['purelib'], 'foo-1.0.dist-info', LEGACY_METADATA_FILENAME)
+        self.assertEqual(os.stat(p).st_nlink, 1)
+
+    def test_build_single_pass(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        srcdir = os.path.join(workdir, 'src')
+        purelib = os.path.join(srcdir, 'purelib')
+        scripts = os.path.join(srcdir, 'scripts')
+        distinfo = os.path.join(purelib, 'dummy-0.1.dist-info')
+        os.makedirs(distinfo)
+        os.makedirs(scripts)
+        md = Metadata()
+        md.name = 'dummy'
+        md.version = '0.1'
+        md.summary = 'Test wheel'
+        md.write(path=os.path.join(distinfo, LEGACY_METADATA_FILENAME), legacy=True)
+        script = os.path.join(scripts, 'foo')
+        with open(script, 'w') as f:
+            f.write('#!python\nprint("foo")\n')
+        text = 'Lorem ipsum dolor sit amet. ' * 1000
+        with open(os.path.join(purelib, 'dummy.py'), 'w') as f:
+            f.write('x = %r\n' % text)
+        with open(os.path.join(purelib, 'dummy.gz'), 'wb') as f:
+            f.write(b'not really gzipped')
+        before = set(os.listdir(distinfo))
+        paths = {'prefix': srcdir, 'purelib': purelib, 'scripts': scripts}
+        sizes = []
+        for level in (0, 9):
+            w = Wheel('dummy-0.1')
+            w.dirname = os.path.join(workdir, 'level%d' % level)
+            os.mkdir(w.dirname)
+            pn = w.build(paths, compresslevel=level)
+            Wheel(pn).verify()
+            with ZipFile(pn, 'r') as zf:
+                info = zf.getinfo('dummy.py')
+                sizes.append(info.compress_size)
+                self.assertEqual(zf.getinfo('dummy.gz').compress_type, zipfile.ZIP_STORED)
+                data = zf.read('dummy-0.1.data/scripts/foo')
+                self.assertTrue(data.startswith(b'#!python\n'))
+                names = zf.namelist()
+                self.assertEqual(names[-1], 'dummy-0.1.dist-info/RECORD')
+        self.assertGreater(sizes[0], sizes[1])
+        # The source tree isn't changed by building
+        self.assertEqual(set(os.listdir(distinfo)), before)
+        with open(script) as f:
+            self.assertEqual(f.read(), '#!python\nprint("foo")\n')
+
+    def test_build_parallel(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        files = {}
+        for i in range(20):
+            files['foo/mod%d.py' % i] = 'x = %r\n' % ('%d' % i * 1000)
+        w = self.make_wheel(workdir, 'foo', '1.0', files)
+        pn = os.path.join(w.dirname, w.filename)
+        with open(pn, 'rb') as f:
+            serial = f.read()
+        srcdir = os.path.join(workdir, 'foo-src')
+        paths = {'prefix': srcdir, 'purelib': os.path.join(srcdir, 'purelib')}
+        w = Wheel('foo-1.0')
+        w.dirname = os.path.join(workdir, 'parallel')
+        os.mkdir(w.dirname)
+        pn = w.build(paths, max_workers=4)
+        with open(pn, 'rb') as f:
+            self.assertEqual(f.read(), serial)
+        # None means a default based on the number of CPUs, even though the
+        # attribute says otherwise
+        import distlib.wheel
+
+        w.max_workers = 1
+        saved = distlib.wheel.thread_map
+        self.addCleanup(setattr, distlib.wheel, 'thread_map', saved)
+        calls = []
+
+        def recording_map(func, items, max_workers=None):
+            calls.append(max_workers)
+            return saved(func, items, max_workers)
+
+        distlib.wheel.thread_map = recording_map
+        pn = w.build(paths, max_workers=None)
+        self.assertEqual(calls, [None])
+        del calls[:]
+        with open(pn, 'rb') as f:
+            self.assertEqual(f.read(), serial)
+        # Updating in parallel also works
+        w = Wheel(pn)
+        w.max_workers = 4
+
+        def modifier(path_map):
+            with open(path_map['foo/mod0.py'], 'w') as f:
+                f.write('x = 0\n')
+            return True
+
+        self.assertTrue(w.update(modifier))
+        w.verify()
+        with ZipFile(pn, 'r') as zf:
+            self.assertEqual(zf.read('foo/mod0.py'), b'x = 0\n')
+            self.assertEqual(zf.read('foo/mod1.py'), ('x = %r\n' % ('1' * 1000)).encode('ascii'))
+
+    def test_build_parallel_batches(self):
+        # Members are compressed in batches limited by their total size, and
+        # the result is the same as when compressing serially.
+        import distlib.wheel
+
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        rnd = random.Random(0)
+        files = {}
+        for i in range(10):
+            files['foo/mod%d.py' % i] = 'x = %d\n' % i
+        for i in range(3):
+            # mostly incompressible, so the compressed data is large too
+            files['foo/data%d.txt' % i] = ''.join('%08x' % rnd.getrandbits(32) for _ in range(16 * 1024))
+        saved_size = distlib.wheel.BATCH_SIZE
+        self.addCleanup(setattr, distlib.wheel, 'BATCH_SIZE', saved_size)
+        distlib.wheel.BATCH_SIZE = 256 * 1024
+        w = self.make_wheel(workdir, 'foo', '1.0', files)
+        pn = os.path.join(w.dirname, w.filename)
+        with open(pn, 'rb') as f:
+            serial = f.read()
+        saved_map = distlib.wheel.thread_map
+        self.addCleanup(setattr, distlib.wheel, 'thread_map', saved_map)
+        batches = []
+
+        def recording_map(func, items, max_workers=None):
+            batches.append(len(items))
+            return saved_map(func, items, max_workers)
+
+        distlib.wheel.thread_map = recording_map
+        srcdir = os.path.join(workdir, 'foo-src')
+        w = Wheel('foo-1.0')
+        w.dirname = os.path.join(workdir, 'parallel')
+        os.mkdir(w.dirname)
+        pn = w.build({'prefix': srcdir, 'purelib': os.path.join(srcdir, 'purelib')}, max_workers=4)
+        with open(pn, 'rb') as f:
+            self.assertEqual(f.read(), serial)
+        # two of the 128KB data files fill the first batch, and the rest of
+        # the members (including METADATA and WHEEL) go in a second one
+        self.assertEqual(batches, [2, len(files)])
+
+    def test_update_copy_unchanged(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        files = {'foo/__init__.py': 'x = 1\n', 'foo/bar.py': 'y = 2\n'}
+        w = self.make_wheel(workdir, 'foo', '1.0', files)
+        pn = os.path.join(w.dirname, w.filename)
+        with ZipFile(pn, 'r') as zf:
+            before = zf.getinfo('foo/bar.py')
+        compressed = []
+
+        class TestWheel(Wheel):
+
+            def _compress_member(self, ap, *args, **kwargs):
+                compressed.append(ap)
+                return super(TestWheel, self)._compress_member(ap, *args, **kwargs)
+
+        def modifier(path_map):
+            with open(path_map['foo/__init__.py'], 'w') as f:
+                f.write('x = 3\n')
+            p = os.path.join(os.path.dirname(path_map['foo/__init__.py']), 'new.py')
+            with open(p, 'w') as f:
+                f.write('z = 4\n')
+            path_map['foo/new.py'] = p
+            return True
+
+        w = TestWheel(pn)
+        self.assertTrue(w.update(modifier, copy_unchanged=True))
+        # The version is bumped, so METADATA changes too
+        self.assertEqual(sorted(compressed), [
+            'foo-1.0.dist-info/METADATA', 'foo-1.0.dist-info/RECORD', 'foo/__init__.py', 'foo/new.py'
+        ])
+        w.verify()
+        with ZipFile(pn, 'r') as zf:
+            after = zf.getinfo('foo/bar.py')
+            self.assertEqual(zf.read('foo/bar.py'), b'y = 2\n')
+            self.assertEqual(zf.read('foo/__init__.py'), b'x = 3\n')
+            self.assertEqual(zf.read('foo/new.py'), b'z = 4\n')
+        for attr in ('date_time', 'CRC', 'compress_size', 'external_attr'):
+            self.assertEqual(getattr(after, attr), getattr(before, attr))
+        self.assertEqual(Wheel(pn).metadata.version, '1.0+1')
+
+        # Rewriting a file without changing its size is noticed, both when the
+        # wheel's timestamps are recent (so that files are hashed) and when
+        # they're old (so that modification times are enough).
+        def rewriter(path_map):
+            p = path_map['foo/bar.py']
+            st = os.stat(p)
+            with open(p, 'w') as f:
+                f.write('y = 5\n')
+            if recent:
+                # as on a filesystem with coarse timestamps
+                os.utime(p, (st.st_atime, st.st_mtime))
+            return True
+
+        srcdir = os.path.join(workdir, 'foo-src')
+        for recent in (True, False):
+            if not recent:
+                past = time.time() - 3600
+                for root, dirs, files in os.walk(srcdir):
+                    for fn in files:
+                        os.utime(os.path.join(root, fn), (past, past))
+            w = Wheel('foo-1.0')
+            w.dirname = workdir
+            pn = w.build({'prefix': srcdir, 'purelib': os.path.join(srcdir, 'purelib')})
+            del compressed[:]
+            w = TestWheel(pn)
+            self.assertTrue(w.update(rewriter, copy_unchanged=True))
+            self.assertIn('foo/bar.py', compressed)
+            self.assertNotIn('foo/__init__.py', compressed)
+            w.verify()
+            with ZipFile(pn, 'r') as zf:
+                self.assertEqual(zf.read('foo/bar.py'), b'y = 5\n')
+
+    def test_copy_raw(self):
+        # Members are copied between archives in chunks, not all at once.
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        rnd = random.Random(0)
+        data = ''.join('%08x' % rnd.getrandbits(32) for _ in range(32 * 1024))
+        w = self.make_wheel(workdir, 'foo', '1.0', {'foo/data.txt': data, 'foo/__init__.py': ''})
+        pn = os.path.join(w.dirname, w.filename)
+        copy = os.path.join(workdir, 'copy.zip')
+        reads = []
+
+        class RecordingFile(object):
+            def __init__(self, f):
+                self.f = f
+
+            def read(self, n=-1):
+                reads.append(n)
+                return self.f.read(n)
+
+            def __getattr__(self, name):
+                return getattr(self.f, name)
+
+        with _WheelZipFile(pn, 'r') as source:
+            infos = source.infolist()
+            self.assertTrue(source.getinfo('foo/data.txt').compress_size > 2 * CHUNK_SIZE)
+            with _WheelZipFile(copy, 'w') as dest:
+                source.fp = RecordingFile(source.fp)
+                try:
+                    for zinfo in infos:
+                        dest.copy_raw(source, zinfo)
+                finally:
+                    source.fp = source.fp.f
+        self.assertTrue(reads)
+        self.assertTrue(all(0 <= n <= CHUNK_SIZE for n in reads))
+        with ZipFile(pn, 'r') as zf1:
+            with ZipFile(copy, 'r') as zf2:
+                self.assertEqual(zf2.namelist(), zf1.namelist())
+                for zinfo in infos:
+                    self.assertEqual(zf2.read(zinfo.filename), zf1.read(zinfo.filename))
+                    self.assertEqual(zf2.getinfo(zinfo.filename).CRC, zinfo.CRC)
+
+    def test_directory_cache(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        w = self.make_wheel(workdir, 'foo', '1.0', {'foo/__init__.py': 'x = 1\n'})
+        pn = os.path.join(w.dirname, w.filename)
+        directory_cache.clear()
+        with w:
+            zf = w._shared
+            self.assertEqual(w.metadata.name, 'foo')
+            self.assertEqual(w.info['Root-Is-Purelib'], 'true')
+            w.verify()
+            self.assertIs(w._shared, zf)
+        self.assertIsNone(w._shared)
+        entry = zf.cache_entry
+        self.assertIn('foo-1.0.dist-info/RECORD', entry.records)
+        # A new handle reuses the parsed central directory
+        w = Wheel(pn)
+        with w._archive() as zf:
+            self.assertIs(zf.cache_entry, entry)
+            self.assertEqual(zf.read('foo/__init__.py'), b'x = 1\n')
+
+        def modifier(path_map):
+            with open(path_map['foo/__init__.py'], 'w') as f:
+                f.write('x = 2 # changed\n')
+            return True
+
+        # Changing the wheel invalidates the cached entry, even for a shared
+        # handle which is already open
+        with w:
+            self.assertTrue(w.update(modifier))
+            w.verify()
+            zf = w._open_archive()
+            self.assertIsNot(zf.cache_entry, entry)
+            self.assertEqual(zf.read('foo/__init__.py'), b'x = 2 # changed\n')
+
+    def test_inspect(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        w = self.make_wheel(workdir, 'foo', '1.0', {'foo/__init__.py': 'x = 1\n' * 100})
+        pn = os.path.join(w.dirname, w.filename)
+        result = w.inspect()
+        self.assertEqual(result['filename'], w.filename)
+        self.assertEqual(result['tags'], ['%s-none-any' % PYVER])
+        self.assertEqual(result['wheel']['Root-Is-Purelib'], 'true')
+        self.assertEqual(result['metadata']['Name'], 'foo')
+        self.assertEqual(result['metadata']['Summary'], 'Test wheel')
+        names = [m[0] for m in result['members']]
+        self.assertEqual(names[0], 'foo/__init__.py')
+        self.assertIn('foo-1.0.dist-info/RECORD', names)
+        self.assertEqual(result['members'][0][1], 600)
+        self.assertLess(result['members'][0][2], 600)
+        self.assertEqual(result['size'], sum(m[1] for m in result['members']))
+        # The result is serializable, and the same when read from a file object
+        json.dumps(result)
+        with open(pn, 'rb') as f:
+            data = f.read()
+        self.assertEqual(Wheel(w.filename).inspect(io.BytesIO(data)), result)
+
+    def test_verify_levels(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        files = {'foo/__init__.py': 'x = 1\n', 'foo/data.gz': 'not really gzipped'}
+        w = self.make_wheel(workdir, 'foo', '1.0', files)
+        pn = os.path.join(w.dirname, w.filename)
+        for level in ('structure', 'crc', 'hash'):
+            w.verify(level)
+        w.verify(max_workers=4)
+        self.assertRaises(DistlibException, w.verify, 'bogus')
+        with open(pn, 'rb') as f:
+            original = f.read()
+
+        def check(data, failing_levels):
+            with open(pn, 'wb') as f:
+                f.write(data)
+            w = Wheel(pn)
+            for level in ('structure', 'crc', 'hash'):
+                if level in failing_levels:
+                    self.assertRaises(DistlibException, w.verify, level)
+                else:
+                    w.verify(level)
+
+        # Corrupt the (stored) data, so the CRC is wrong
+        check(original.replace(b'not really gzipped', b'not really gzipper'), ('crc', 'hash'))
+
+        # Change an entry, so only its digest is wrong
+        def rewrite(modify):
+            buf = io.BytesIO()
+            with ZipFile(io.BytesIO(original), 'r') as src:
+                with ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as dst:
+                    for zinfo in src.infolist():
+                        data = modify(zinfo.filename, src.read(zinfo))
+                        if data is not None:
+                            dst.writestr(zinfo, data)
+            return buf.getvalue()
+
+        data = rewrite(lambda name, data: b'x = 2\n' if name == 'foo/__init__.py' else data)
+        check(data, ('hash', ))
+        # Remove an entry, so a RECORD row has no entry
+        data = rewrite(lambda name, data: None if name == 'foo/data.gz' else data)
+        check(data, ('structure', 'crc', 'hash'))
+
+        # Remove a RECORD row, so an entry has no row
+        def remove_row(name, data):
+            if name.endswith('RECORD'):
+                lines = data.splitlines(True)
+                data = b''.join(line for line in lines if not line.startswith(b'foo/data.gz'))
+            return data
+
+        check(rewrite(remove_row), ('structure', 'crc', 'hash'))
+
     def test_path_doesnt_escape(self):
         workdir = tempfile.mkdtemp(prefix='distlib-test-')
         self.addCleanup(shutil.rmtree, workdir)